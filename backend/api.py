@@ -1,78 +1,332 @@
 from contextlib import asynccontextmanager
-from typing import List, Dict, Tuple, Deque
+from typing import Callable, List, Dict, Optional, Tuple
 
-from fastapi import FastAPI, Query
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+import asyncio
+
+from fastapi import Body, FastAPI, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from lib.amm import compute_slippage_summary
-from lib.yield_curve import build_usdc_yield_curve
-from lib.defillama import fetch_current_prices, fetch_stablecoin_prices, fetch_usdc_lending_anchors
-from lib.peg import PegDataStore, start_price_background_updater
+import numpy as np
+
+from backend.assets import IMMUTABLE, REVALIDATE, AssetStore
+from backend.responses import COLUMNS_MEDIA_TYPE, VersionedResponseCache, columns_dtype, dumps, encode_columns
+from lib.amm import (
+    CURVE_CONSTANT_PRODUCT,
+    CURVES,
+    cached_slippage_grid,
+    compute_slippage_summary,
+    grid_cache_stats,
+    optimal_split,
+)
+from lib.cache import StaleWhileRevalidateCache
+from lib.history import DEFAULT_CAPACITY, DOWNSAMPLERS, HistoryStore
+from lib.tickstore import TickStore
+from lib.stream import PegBroadcaster, row_filter
+from lib.yield_curve import CURVE_METHODS, CURVE_MONOTONE_CUBIC, build_usdc_yield_curve, fit_curve
+from lib.defillama import (
+    aclose_clients,
+    afetch_current_prices,
+    afetch_stablecoin_ids,
+    afetch_usdc_lending_anchors,
+    register_coingecko_ids,
+)
+from lib.ingest import PriceIngestor, default_sources
+from lib.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, Family
+from lib.peg import PegDataStore
+from lib.pegstats import RollingPegStats
+from lib.profiler import SamplingProfiler
+from lib.replay import MAX_SPEED, MIN_SPEED, ReplayManager, collect, depeg_scenario, recorded_ticks
+from lib.scheduler import Scheduler
+from lib.shm import SharedHistory, SharedMarket, WriterLease
 import json
+import os
 from pathlib import Path
-from collections import defaultdict, deque
-from datetime import datetime, timezone, timedelta
-import threading
 import time
 import math
 
 
-SYMBOLS: List[str] = ["USDC", "USDT", "DAI"]
-VENUES: List[str] = ["Binance", "Curve"]
+SYMBOLS: List[str] = ["USDC", "USDT", "DAI"]  # dashboard defaults; STORE.symbols grows with discovery
+MAX_TRACKED_SYMBOLS = 500
+VENUES: List[str] = ["Binance", "Curve"]  # synthetic random-walk venues
+
+# Live upstream feeds, fetched concurrently; each one shows up as its own venue
+INGEST: PriceIngestor = PriceIngestor(default_sources(), list(SYMBOLS))
 
-# In-memory live store + short history for sparklines
+# Multi-worker deployments (main.py web --workers N): market state lives in a
+# shared-memory file that one elected worker ingests into and the others follow.
+SHARED_STATE_PATH = os.environ.get("WEAL_SHARED_STATE")
+SHARED: SharedMarket | None = SharedMarket.attach(Path(SHARED_STATE_PATH)) if SHARED_STATE_PATH else None
+WRITER_LEASE: WriterLease | None = WriterLease(Path(SHARED_STATE_PATH + ".lock")) if SHARED_STATE_PATH else None
+SHARED_POLL_SECONDS = 0.1
+ELECTION_SECONDS = 2.0
+
+# In-memory live store + ring-buffer tick history per (venue, symbol)
 STORE: PegDataStore = PegDataStore(SYMBOLS, VENUES)
-HISTORY: Dict[Tuple[str, str], Deque[Dict[str, object]]] = defaultdict(lambda: deque(maxlen=120))  # ~6 minutes @ 3s
+# Dashboard symbols keep 2 days of 1s ticks per series; the ~2000 discovered
+# series keep about an hour at the 3s tick, so memory stays bounded (~60 MB)
+# however many symbols discovery finds. Shared rings are sized by main.py.
+DISCOVERED_HISTORY_CAPACITY = 1200
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    # Re-anchor synthetic prices to live DefiLlama on startup (best-effort)
+def _history_capacity(key: Tuple[str, str]) -> int:
+    return DEFAULT_CAPACITY if key[1] in SYMBOLS else DISCOVERED_HISTORY_CAPACITY
+
+
+HISTORY: HistoryStore | SharedHistory = (
+    HistoryStore(capacity_for=_history_capacity) if SHARED is None else SharedHistory(SHARED)
+)
+# Rolling per-series stats (EWMA, z-score, max deviation, off-peg time) and
+# threshold alerts, fed from the history rings on every tick. Replay sessions
+# only count toward cross-venue spreads among their own venues.
+PEG_STATS = RollingPegStats(
+    spread_group=lambda venue: venue.split("/", 1)[0] if ReplayManager.is_replay_venue(venue) else ""
+)
+# Durable tick log (hourly segments, 7-day retention) so history survives restarts;
+# only the dashboard symbols are persisted
+TICKS: TickStore = TickStore(Path("data/ticks"))
+# Push channel for /peg/stream and /peg/ws: changed prices only, encoded once per tick
+BROADCASTER: PegBroadcaster = PegBroadcaster()
+TICK_SECONDS = 3.0
+SCHEDULER: Scheduler = Scheduler()
+STREAM_HEARTBEAT_SECONDS = 15.0
+# Encoded response bodies per (resource, params, data version), served with ETags
+RESPONSES = VersionedResponseCache()
+
+# Upstream market data: served from cache, revalidated in the background,
+# last good snapshot kept on disk for warm restarts.
+MARKET_SNAPSHOT_PATH = Path("data/market_snapshot.json")
+MARKET_CACHE = StaleWhileRevalidateCache(ttl=60.0, snapshot_path=MARKET_SNAPSHOT_PATH)
+# Pegged assets listed by DefiLlama (symbol -> coingecko id); changes rarely
+SYMBOL_IDS_PATH = Path("data/stablecoin_ids.json")
+SYMBOL_CACHE = StaleWhileRevalidateCache(ttl=86400.0, snapshot_path=SYMBOL_IDS_PATH)
+
+
+async def _load_prices() -> Dict[str, Dict[str, float]]:
+    live = await afetch_current_prices(STORE.symbols)
+    if not live:
+        raise ValueError("No prices returned")
+    return live
+
+
+def _tick() -> None:
+    """Advance synthetic prices, then record and push the same snapshot."""
+    STORE.random_walk(VENUES)
+    snap = STORE.current()
+    # replay venues are recorded by the replay itself, at scenario pace
+    samples = [(k, p) for k, p in snap.prices.items() if not ReplayManager.is_replay_venue(k[0])]
+    HISTORY.append_many(snap.updated_at, samples)
+    TICKS.append_many(snap.updated_at, [(k, p) for k, p in samples if k[1] in SYMBOLS])
+    _update_peg_stats([k for k, _ in samples])
+    BROADCASTER.publish(snap.rows)
+
+
+def _record_replay(keys: List[Tuple[str, str]], key_index: np.ndarray, ts: np.ndarray, px: np.ndarray) -> None:
+    """Replayed ticks take the live path: history rings, store snapshot, push feed."""
+    quotes: Dict[Tuple[str, str], float] = {}
+    for k in np.unique(key_index).tolist():
+        mask = key_index == k
+        HISTORY.extend(keys[k], ts[mask], px[mask])
+        quotes[keys[k]] = float(px[mask][-1])
+    _update_peg_stats(list(quotes))
+    STORE.update_prices(quotes, ts=float(ts[-1]))
+    BROADCASTER.publish(STORE.current().rows)
+
+
+_PEG_ALERTS = REGISTRY.counter("weal_peg_alerts", "Peg stats threshold crossings", ["kind", "state"])
+
+
+def _update_peg_stats(keys: Optional[List[Tuple[str, str]]] = None) -> None:
+    # writers pass the series they just appended; followers scan the shared rings
+    for alert in PEG_STATS.feed(HISTORY, keys):
+        _PEG_ALERTS.labels(alert.kind, alert.state).inc()
+
+
+# Depeg replays/backtests: several may run at once, each on its own replay venues
+REPLAYS: ReplayManager = ReplayManager(_record_replay)
+
+
+async def _ingest() -> None:
+    quotes = await INGEST.tick()
+    if quotes:
+        STORE.update_prices(quotes)
+
+
+async def _load_symbol_ids() -> Dict[str, str]:
+    ids = await afetch_stablecoin_ids(limit=MAX_TRACKED_SYMBOLS)
+    if not ids:
+        raise ValueError("No pegged assets returned")
+    return ids
+
+
+async def _discover_symbols() -> None:
+    """Track every discovered pegged asset on all venues."""
+    ids = (await SYMBOL_CACHE.get("ids", _load_symbol_ids)).value
+    register_coingecko_ids(ids)
+    STORE.add_symbols(list(ids), init_venues=VENUES)
+    INGEST.symbols = list(STORE.symbols)
+
+
+def _refresh_market() -> None:
+    # keep upstream data warm so requests rarely see an expired entry
+    MARKET_CACHE.revalidate("prices", _load_prices)
+    MARKET_CACHE.revalidate("usdc_anchors", _load_usdc_anchors)
+
+
+async def _load_usdc_anchors() -> Dict[str, Dict[str, List[float]]]:
+    live = await afetch_usdc_lending_anchors()
+    if not live:
+        raise ValueError("No USDC anchors returned")
+    return live
+
+
+def _is_writer() -> bool:
+    """True in the process that ingests (always, unless market state is shared)."""
+    return WRITER_LEASE is None or WRITER_LEASE.held
+
+
+def _follow() -> None:
+    """Followers: adopt the writer's latest snapshot and push it to this worker's stream clients."""
+    if _is_writer():
+        return
+    snap = SHARED.snapshot()
+    if snap is not None and snap.version != STORE.version:
+        STORE.load(snap)
+        _update_peg_stats()
+        BROADCASTER.publish(snap.rows)
+
+
+async def _elect() -> None:
+    # the lease frees up when the writer exits; the first follower to grab it takes over
+    if not _is_writer() and WRITER_LEASE.try_acquire():
+        await _become_writer(fresh=False)
+
+
+def _collect_metrics() -> List[Family]:
+    """Stats the components already keep, turned into metric families at scrape time."""
+    fill = HISTORY.fill_levels()
+    hits, misses, not_modified, cached_bytes = RESPONSES.stats()
+    cache_samples = []
+    for name, cache in (("market", MARKET_CACHE), ("symbols", SYMBOL_CACHE)):
+        stats = cache.stats()
+        for result in ("hits", "stale_hits", "misses"):
+            cache_samples.append(({"cache": name, "result": result}, stats[result]))
+    grids = grid_cache_stats()
+    source_samples = []
+    for venue, health in INGEST.health().items():
+        for result in ("successes", "failures", "timeouts", "hedges"):
+            source_samples.append(({"venue": venue, "result": result}, health[result]))
+    return [
+        ("weal_history_fill_ratio", "gauge", "Ring buffer fill level per series (1 = full, oldest ticks overwritten)",
+         [({"venue": str(v), "symbol": str(s)}, f) for (v, s), f in sorted(fill.items())]),
+        ("weal_history_series", "gauge", "Series with an in-memory ring buffer", [({}, len(fill))]),
+        ("weal_response_cache_total", "counter", "Encoded-body cache lookups",
+         [({"result": "hit"}, hits), ({"result": "miss"}, misses), ({"result": "not_modified"}, not_modified)]),
+        ("weal_response_cache_bytes", "gauge", "Bytes of encoded bodies held", [({}, cached_bytes)]),
+        ("weal_grid_cache_total", "counter", "Computed /slippage_grid surface lookups",
+         [({"result": "hit"}, grids["hits"]), ({"result": "miss"}, grids["misses"])]),
+        ("weal_grid_cache_bytes", "gauge", "Bytes of slippage grids held", [({}, grids["bytes"])]),
+        ("weal_upstream_cache_total", "counter", "Stale-while-revalidate cache lookups", cache_samples),
+        ("weal_source_requests_total", "counter", "Ingest requests per price source", source_samples),
+        ("weal_stream_subscribers", "gauge", "Open /peg/stream and /peg/ws clients", [({}, BROADCASTER.subscriber_count)]),
+        ("weal_peg_store_version", "gauge", "Live store snapshot version", [({}, STORE.version)]),
+        ("weal_ingest_writer", "gauge", "1 in the process that ingests and writes market state",
+         [({"pid": str(os.getpid())}, 1 if _is_writer() else 0)]),
+        ("weal_shared_dropped_series", "gauge", "History series not stored because the shared rings are full",
+         [({}, SHARED.dropped_series if SHARED is not None else 0)]),
+    ]
+
+
+REGISTRY.register_collector(_collect_metrics)
+# Off until toggled through /debug/profiler
+PROFILER = SamplingProfiler()
+
+
+async def _become_writer(fresh: bool) -> None:
+    """Start ingesting: upstream fetches, synthetic ticks, persistence and publishing."""
+    if SHARED is not None:
+        SHARED.claim()
+        MARKET_CACHE.follow = SYMBOL_CACHE.follow = False
+        snap = SHARED.snapshot()
+        if not fresh and snap is not None:
+            STORE.load(snap)  # carry on from the previous writer
+        STORE.on_publish = SHARED.publish
+        SHARED.publish(STORE.current())
+
+    # Discover pegged assets, then re-anchor synthetic prices to live DefiLlama
+    # (both best-effort). Disk snapshots answer immediately and are revalidated
+    # in the background.
     try:
-        live = fetch_current_prices(SYMBOLS)
-        # Small venue offsets so spreads exist (around ~10 bps total)
-        venue_offset = {"Binance": -0.0005, "Curve": 0.0005}
-        with STORE._lock:  # type: ignore[attr-defined]
-            now_iso = datetime.now(timezone.utc).isoformat()
-            for v in VENUES:
-                for s in SYMBOLS:
-                    base = live.get(s, {}).get("price", 1.0)
-                    price = max(0.90, min(1.10, float(base) + venue_offset.get(v, 0.0)))
-                    STORE._prices[(v, s)] = price  # type: ignore[attr-defined]
-                    STORE._timestamps[(v, s)] = now_iso  # type: ignore[attr-defined]
+        await _discover_symbols()
     except Exception:
         pass
+    if fresh:
+        try:
+            live = (await MARKET_CACHE.get("prices", _load_prices)).value
+            # Small venue offsets so spreads exist (around ~10 bps total)
+            venue_offset = {"Binance": -0.0005, "Curve": 0.0005}
+            quotes = {}
+            for v in VENUES:
+                for s in STORE.symbols:
+                    base = live.get(s, {}).get("price", 1.0)
+                    quotes[(v, s)] = max(0.90, min(1.10, float(base) + venue_offset.get(v, 0.0)))
+            STORE.update_prices(quotes)
+        except Exception:
+            pass
+
+        # Warm the in-memory rings from the on-disk tick log
+        try:
+            horizon = time.time() - HISTORY.capacity * 3.0
+            for key in TICKS.keys():
+                ts, px = TICKS.query(key, since=horizon)
+                if len(ts):
+                    HISTORY.extend(key, ts, px)
+        except Exception:
+            pass
+
+    # One scheduler drives every periodic job, so sampling stays in step with updates
+    SCHEDULER.add_job("ingest", TICK_SECONDS, _ingest, run_at_start=True)
+    SCHEDULER.add_job("tick", TICK_SECONDS, _tick)
+    SCHEDULER.add_job("persist_ticks", TICK_SECONDS, TICKS.flush, jitter=0.5, blocking=True)
+    SCHEDULER.add_job("tick_retention", 600.0, TICKS.enforce_retention, jitter=5.0, blocking=True)
+    SCHEDULER.add_job("refresh_market", MARKET_CACHE.ttl, _refresh_market, jitter=2.0)
+    SCHEDULER.add_job("discover_symbols", SYMBOL_CACHE.ttl, _discover_symbols, jitter=60.0)
+    SCHEDULER.start()
 
-    # Start random walk updater
-    start_price_background_updater(STORE, interval_seconds=3.0)
-
-    # Start history sampler thread
-    stop_flag = {"stop": False}
-
-    def _sample_history_loop():
-        while not stop_flag["stop"]:
-            try:
-                rows = STORE.snapshot()
-                for r in rows:
-                    key = (str(r["venue"]), str(r["symbol"]))
-                    HISTORY[key].append({"t": r["timestamp"], "p": r["price"]})
-            except Exception:
-                pass
-            time.sleep(3.0)
 
-    t = threading.Thread(target=_sample_history_loop, daemon=True)
-    t.start()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if SHARED is not None and not WRITER_LEASE.try_acquire():
+        # Follower: serve the shared state, read upstream data from the writer's
+        # disk snapshots, and stand by to take over if the writer goes away.
+        MARKET_CACHE.follow = SYMBOL_CACHE.follow = True
+        _follow()
+        SCHEDULER.add_job("follow", SHARED_POLL_SECONDS, _follow)
+        SCHEDULER.add_job("elect", ELECTION_SECONDS, _elect, jitter=0.5)
+        SCHEDULER.add_job("rescan_ticks", 60.0, TICKS.rescan, blocking=True)
+        SCHEDULER.start()
+    else:
+        await _become_writer(fresh=SHARED is None or SHARED.version == 0)
 
     try:
         yield
     finally:
-        stop_flag["stop"] = True
+        PROFILER.stop()
+        await SCHEDULER.stop()
+        await REPLAYS.stop_all()
+        SCHEDULER.clear()
+        if _is_writer():
+            TICKS.flush()
+        STORE.on_publish = None
+        if WRITER_LEASE is not None:
+            WRITER_LEASE.release()
+        await aclose_clients()
 
 
 app = FastAPI(title="Weal: Stablecoin Analytics (Prototype)", lifespan=lifespan)
-app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
+# Dashboard HTML and /static files: read and precompressed once, served from memory
+ASSETS = AssetStore(Path("frontend/static"), Path("frontend/index.html"))
+ASSETS.load()
 
 # CORS for Next.js dev
 app.add_middleware(
@@ -83,71 +337,330 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+_REQUEST_SECONDS = REGISTRY.histogram(
+    "weal_http_request_seconds", "Request latency per route, until the body is fully sent", ["method", "route", "status"]
+)
+
+
+class RouteMetricsMiddleware:
+    """
+    Times every HTTP request into a per-route histogram. Plain ASGI rather than
+    BaseHTTPMiddleware, so streaming bodies pass through untouched. Routes are
+    labelled by their template (/replay/{session_id}), never the raw path.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            _REQUEST_SECONDS.labels(scope["method"], route, f"{status // 100}xx").observe(time.perf_counter() - t0)
+
+
+app.add_middleware(RouteMetricsMiddleware)  # outermost, so CORS and error handling are timed too
+
+
+def _names(csv: str | None, upper: bool = False) -> List[str] | None:
+    if csv is None:
+        return None
+    names = [x.strip() for x in csv.split(",") if x.strip()]
+    return [n.upper() for n in names] if upper else names
+
 
 @app.get("/peg")
-def get_peg_snapshot():
+def get_peg_snapshot(
+    request: Request,
+    symbols: str | None = Query(default=None, description="Comma-separated symbols, e.g. USDC,USDT"),
+    venues: str | None = Query(default=None, description="Comma-separated venues"),
+):
     try:
-        rows = STORE.snapshot()
-        return JSONResponse(content={"data": rows})
+        snap = STORE.current()
+        wanted_symbols, wanted_venues = _names(symbols, upper=True), _names(venues)
+        params = {"symbols": wanted_symbols, "venues": wanted_venues}
+        return RESPONSES.respond(
+            request, "peg", snap.version, params, lambda: {"data": snap.select(wanted_symbols, wanted_venues)}
+        )
     except Exception:
         return JSONResponse(status_code=502, content={"error": "Failed to fetch prices"})
 
 
+@app.get("/peg/stream")
+async def stream_peg(
+    symbols: str | None = Query(default=None, description="Comma-separated symbols, e.g. USDC,USDT"),
+    venues: str | None = Query(default=None, description="Comma-separated venues"),
+):
+    """Server-sent events: a full snapshot, then deltas of changed (venue, symbol) prices."""
+    sub = BROADCASTER.subscribe(row_filter(_names(symbols, upper=True), _names(venues)))
+
+    async def events():
+        try:
+            while True:
+                try:
+                    msg = await asyncio.wait_for(sub.queue.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield msg.sse
+        finally:
+            BROADCASTER.unsubscribe(sub)
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+@app.websocket("/peg/ws")
+async def ws_peg(websocket: WebSocket, symbols: str | None = None, venues: str | None = None):
+    """WebSocket variant of /peg/stream with the same JSON messages and filters."""
+    await websocket.accept()
+    sub = BROADCASTER.subscribe(row_filter(_names(symbols, upper=True), _names(venues)))
+    try:
+        while True:
+            msg = await sub.queue.get()
+            await websocket.send_text(msg.text)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        BROADCASTER.unsubscribe(sub)
+
+
 @app.get("/peg_history")
-def get_peg_history(symbol: str | None = Query(default=None), limit: int = Query(default=120, ge=1, le=1000)):
+def get_peg_history(
+    request: Request,
+    symbol: str | None = Query(default=None),
+    symbols: str | None = Query(default=None, description="Comma-separated symbols (default: USDC,USDT,DAI)"),
+    venues: str | None = Query(default=None, description="Comma-separated venues (default: all)"),
+    limit: int = Query(default=120, ge=1, le=1000),
+    since: float | None = Query(default=None, description="Epoch seconds, inclusive"),
+    until: float | None = Query(default=None, description="Epoch seconds, inclusive"),
+    points: int | None = Query(default=None, ge=3, le=5000, description="Downsample to about this many points"),
+    method: str = Query(default="lttb"),
+):
+    downsample = DOWNSAMPLERS.get(method)
+    if downsample is None:
+        return JSONResponse(status_code=400, content={"error": f"method must be one of {', '.join(DOWNSAMPLERS)}"})
+    wanted = _names(symbols, upper=True) or ([symbol.upper()] if symbol else SYMBOLS)
+    wanted_venues = _names(venues)
+    params = {
+        "symbols": wanted, "venues": wanted_venues, "limit": limit,
+        "since": since, "until": until, "points": points, "method": method,
+    }
     try:
-        symbols = [symbol.upper()] if symbol else SYMBOLS
-        out: Dict[str, Dict[str, List[Dict[str, object]]]] = {}
-        for s in symbols:
-            out[s] = {}
-            for v in VENUES:
-                key = (v, s)
-                points = list(HISTORY.get(key, deque()))
-                # take last N
-                out[s][v] = points[-limit:]
-        return JSONResponse(content={"data": out})
+        return RESPONSES.respond(
+            request, "peg_history", HISTORY.version, params,
+            lambda: _build_peg_history(wanted, wanted_venues, limit, since, until, points, downsample),
+        )
+    except HistoryTooLarge as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception:
         return JSONResponse(status_code=502, content={"error": "Failed to fetch history"})
 
 
+# Raw (not downsampled) ticks one /peg_history response may carry across all series
+MAX_HISTORY_TICKS = 100_000
+
+
+class HistoryTooLarge(ValueError):
+    pass
+
+
+def _build_peg_history(
+    symbols: List[str],
+    venues: List[str] | None,
+    limit: int,
+    since: float | None,
+    until: float | None,
+    points: int | None,
+    downsample: Callable[[np.ndarray, np.ndarray, int], Tuple[np.ndarray, np.ndarray]],
+) -> Dict[str, object]:
+    ranged = since is not None or until is not None
+    keys = STORE.current().keys(symbols, venues)
+    out: Dict[str, Dict[str, List[Dict[str, object]]]] = {s: {} for s in symbols}
+    total = 0
+    for v, s in keys:
+        # A time range or a downsample target replaces the last-N window
+        oldest = HISTORY.oldest((v, s))
+        if since is not None and (oldest is None or since < oldest) and s in SYMBOLS:
+            # older than the in-memory ring: scan only the disk segments in range
+            # (only dashboard symbols are persisted)
+            ts, px = TICKS.query((v, s), since, until)
+        else:
+            ts, px = HISTORY.query((v, s), since, until, None if ranged or points else limit)
+        if points:
+            ts, px = downsample(ts, px, points)
+        total += len(ts)
+        if total > MAX_HISTORY_TICKS:
+            raise HistoryTooLarge(
+                f"More than {MAX_HISTORY_TICKS} ticks in range; narrow since/until, fewer series, or set points="
+            )
+        out[s][v] = [{"t": _iso_from_unix(t), "p": round(p, 6)} for t, p in zip(ts.tolist(), px.tolist())]
+    return {"data": out}
+
+
+@app.get("/peg_stats")
+def get_peg_stats(
+    request: Request,
+    symbols: str | None = Query(default=None, description="Comma-separated symbols (default: USDC,USDT,DAI)"),
+    venues: str | None = Query(default=None, description="Comma-separated venues (default: all)"),
+):
+    wanted = _names(symbols, upper=True) or SYMBOLS
+    wanted_venues = _names(venues)
+    params = {"symbols": wanted, "venues": wanted_venues}
+    return RESPONSES.respond(
+        request, "peg_stats", PEG_STATS.version, params,
+        lambda: {
+            **PEG_STATS.stats(wanted, wanted_venues),
+            "config": PEG_STATS.config(),
+            "last_alert_seq": PEG_STATS.alert_seq,
+        },
+    )
+
+
+@app.get("/peg_stats/alerts")
+def get_peg_alerts(
+    since: int = Query(default=0, ge=0, description="Only alerts with seq > since"),
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    alerts = PEG_STATS.alerts(since, limit)
+    return JSONResponse(content={"alerts": [a.as_dict() for a in alerts], "last_seq": PEG_STATS.alert_seq})
+
+
+@app.get("/scheduler")
+def get_scheduler_stats():
+    role = "writer" if _is_writer() else "follower"
+    return JSONResponse(content={"running": SCHEDULER.running, "pid": os.getpid(), "role": role, "jobs": SCHEDULER.stats()})
+
+
+@app.get("/metrics")
+def get_metrics():
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+
+@app.get("/debug/profiler")
+def get_profiler(
+    format: str = Query(default="status", description="status or collapsed"),
+    limit: int | None = Query(default=None, ge=1, description="collapsed: top N stacks"),
+):
+    """Profiler state, or the sampled stacks in collapsed (flamegraph) format."""
+    if format == "collapsed":
+        return PlainTextResponse(PROFILER.collapsed(limit))
+    if format != "status":
+        return JSONResponse(status_code=400, content={"error": "format must be one of status, collapsed"})
+    return PROFILER.status()
+
+
+@app.post("/debug/profiler")
+def toggle_profiler(
+    enable: bool = Query(...),
+    interval_ms: float = Query(default=10.0, ge=1.0, le=1000.0),
+    reset: bool = Query(default=True, description="Drop previously sampled stacks when starting"),
+):
+    """Start or stop the sampling profiler on a live instance."""
+    if enable:
+        PROFILER.start(interval_ms / 1000.0, reset=reset)
+    else:
+        PROFILER.stop()
+    return PROFILER.status()
+
+
+@app.get("/sources")
+def get_source_health():
+    return INGEST.health()
+
+
 @app.get("/replay/usdc_2023")
 def replay_usdc_2023():
     try:
-        # Synthetic March 2023 USDC depeg-style path (~60 points)
-        now = datetime.now(timezone.utc)
+        # Synthetic March 2023 USDC depeg-style path (~60 points), ending now
         n = 60
-        times = [(now - timedelta(seconds=3 * (n - 1 - i))).isoformat() for i in range(n)]
-        # Build a curve: start 1.000 -> trough 0.885 -> partial recovery 0.97
-        values = []
-        for i in range(n):
-            t = i / (n - 1)
-            if t < 0.5:
-                # drop
-                v = 1.0 - 0.23 * (t / 0.5)  # to ~0.77 if linear, clip later
-            else:
-                # recover
-                v = 0.885 + (0.97 - 0.885) * ((t - 0.5) / 0.5)
-            v = max(0.88, min(1.02, v))
-            values.append(v)
-        binance = [ round(v + 0.003, 6) for v in values ]
-        curve = [ round(v - 0.003, 6) for v in values ]
-        pts_b = [{"t": times[i], "p": binance[i]} for i in range(n)]
-        pts_c = [{"t": times[i], "p": curve[i]} for i in range(n)]
-        return JSONResponse(content={"data": {"USDC": {"Binance": pts_b, "Curve": pts_c}}})
+        source = depeg_scenario(points=n, noise_bps=0.0, start=time.time() - 3.0 * (n - 1))
+        out: Dict[str, List[Dict[str, object]]] = {}
+        for (venue, _), (ts, px) in collect(source).items():
+            out[venue] = [{"t": _iso_from_unix(t), "p": round(p, 6)} for t, p in zip(ts.tolist(), px.tolist())]
+        return JSONResponse(content={"data": {"USDC": out}})
     except Exception:
         return JSONResponse(status_code=502, content={"error": "Failed to build replay"})
 
 
+@app.post("/replay")
+async def start_replay(
+    scenario: str = Query(default="usdc_2023", description="usdc_2023 (generated) or recorded (from data/ticks)"),
+    speed: float = Query(default=60.0, ge=MIN_SPEED, le=MAX_SPEED),
+    seed: int = Query(default=0),
+    points: int = Query(default=28_800, ge=2, le=10_000_000, description="Generated ticks per venue"),
+    symbol: str = Query(default="USDC"),
+    since: float | None = Query(default=None, description="recorded: epoch seconds, inclusive"),
+    until: float | None = Query(default=None, description="recorded: epoch seconds, inclusive"),
+):
+    """Start a replay that streams ticks into the live store under "Replay <n>/<venue>" venues."""
+    if not _is_writer():
+        return JSONResponse(status_code=409, content={"error": "Replays run in the ingesting worker; retry the request"})
+    symbol = symbol.upper()
+    if scenario == "usdc_2023":
+        source = depeg_scenario(symbol=symbol, points=points, seed=seed)
+    elif scenario == "recorded":
+        keys = [k for k in TICKS.keys() if k[1] == symbol and not ReplayManager.is_replay_venue(k[0])]
+        if not keys:
+            return JSONResponse(status_code=404, content={"error": f"No recorded ticks for {symbol}"})
+        source = recorded_ticks(TICKS, keys, since, until)
+    else:
+        return JSONResponse(status_code=400, content={"error": "scenario must be one of usdc_2023, recorded"})
+    try:
+        session = REPLAYS.start(source, speed)
+    except RuntimeError as e:
+        return JSONResponse(status_code=429, content={"error": str(e)})
+    return session.as_dict()
+
+
+@app.get("/replay")
+def list_replays():
+    return {"data": REPLAYS.sessions()}
+
+
+@app.delete("/replay/{session_id}")
+async def stop_replay(session_id: int):
+    session = await REPLAYS.stop(session_id)
+    if session is None:
+        return JSONResponse(status_code=404, content={"error": "Unknown replay"})
+    return session.as_dict()
+
+
 @app.get("/slippage")
-def get_slippage(reserve_x: float = 50_000_000, reserve_y: float = 50_000_000, size: float = 0.0):
+def get_slippage(
+    reserve_x: float = 50_000_000,
+    reserve_y: float = 50_000_000,
+    size: float = 0.0,
+    fee_bps: float = Query(default=0.0, ge=0.0, lt=10_000.0),
+    curve: str = Query(default=CURVE_CONSTANT_PRODUCT),
+    amp: float = Query(default=100.0, gt=0.0),
+):
+    if curve not in CURVES:
+        return JSONResponse(status_code=400, content={"error": f"curve must be one of {', '.join(CURVES)}"})
     sizes = [1_000_000.0, 5_000_000.0, 10_000_000.0]
-    rows = compute_slippage_summary(reserve_x, reserve_y, sizes)
+    rows = compute_slippage_summary(reserve_x, reserve_y, sizes, fee_bps, curve, amp)
     extra = None
     if size > 0:
-        extra = compute_slippage_summary(reserve_x, reserve_y, [size])[0]
+        extra = compute_slippage_summary(reserve_x, reserve_y, [size], fee_bps, curve, amp)[0]
     return JSONResponse(
         content={
             "reserves": {"x": reserve_x, "y": reserve_y},
+            "curve": curve,
+            "amp": amp if curve != CURVE_CONSTANT_PRODUCT else None,
+            "fee_bps": fee_bps,
             "sizes": sizes,
             "summary": rows,
             "query": extra,
@@ -155,56 +668,214 @@ def get_slippage(reserve_x: float = 50_000_000, reserve_y: float = 50_000_000, s
     )
 
 
+MAX_ROUTE_POOLS = 20_000
+MAX_ROUTE_SIZES = 1_000
+MAX_ROUTE_CELLS = 1_000_000
+
+
+def _floats(csv: str) -> List[float]:
+    return [float(x) for x in csv.split(",") if x.strip()]
+
+
+def _route_response(
+    reserves_in: List[float], reserves_out: List[float], fees: List[float], sizes: List[float], allocations: bool
+) -> Response:
+    if not reserves_in or len(reserves_in) != len(reserves_out):
+        return JSONResponse(status_code=400, content={"error": "reserves_in and reserves_out must be the same non-empty length"})
+    if len(fees) not in (1, len(reserves_in)):
+        return JSONResponse(status_code=400, content={"error": "fee_bps must be one value or one per pool"})
+    if not sizes or len(sizes) > MAX_ROUTE_SIZES or len(reserves_in) > MAX_ROUTE_POOLS:
+        return JSONResponse(
+            status_code=400, content={"error": f"Up to {MAX_ROUTE_POOLS} pools and 1..{MAX_ROUTE_SIZES} sizes"}
+        )
+    if allocations and len(sizes) * len(reserves_in) > MAX_ROUTE_CELLS:
+        return JSONResponse(status_code=400, content={"error": f"Allocations exceed {MAX_ROUTE_CELLS} cells"})
+    try:
+        split = optimal_split(reserves_in, reserves_out, sizes, fees if len(fees) > 1 else fees[0], allocations)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return Response(content=dumps({"pools": len(reserves_in), "sizes": sizes, **split}), media_type="application/json")
+
+
+@app.get("/slippage/route")
+def get_slippage_route(
+    reserves_in: str = Query(..., description="Comma-separated input-token reserves, one per pool"),
+    reserves_out: str = Query(..., description="Comma-separated output-token reserves, one per pool"),
+    sizes: str = Query(default="1000000,5000000,10000000", description="Comma-separated order sizes"),
+    fee_bps: str = Query(default="0", description="One fee for all pools, or one per pool"),
+    allocations: bool = Query(default=True, description="Include the per-pool input amounts"),
+):
+    """Optimal split of each order size across constant-product pools."""
+    try:
+        parsed = [_floats(reserves_in), _floats(reserves_out), _floats(fee_bps), _floats(sizes)]
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "parameters must be comma-separated numbers"})
+    return _route_response(*parsed, allocations)
+
+
+@app.post("/slippage/route")
+def post_slippage_route(
+    reserves_in: List[float] = Body(...),
+    reserves_out: List[float] = Body(...),
+    sizes: List[float] = Body(default=[1_000_000.0, 5_000_000.0, 10_000_000.0]),
+    fee_bps: float | List[float] = Body(default=0.0),
+    allocations: bool = Body(default=True),
+):
+    """Same as GET /slippage/route, with a JSON body for pool lists too long for a URL."""
+    fees = fee_bps if isinstance(fee_bps, list) else [fee_bps]
+    return _route_response(reserves_in, reserves_out, fees, sizes, allocations)
+
+
+MAX_GRID_CELLS = 1_000_000
+
+
 @app.get("/slippage_grid")
 def get_slippage_grid(
+    request: Request,
     reserve_x: float = 50_000_000,
     reserve_y: float = 50_000_000,
     depth_multipliers: str = Query(default="0.5,1.0,1.5,2.0"),
     max_size_millions: int = Query(default=20, ge=1, le=100),
+    size_points: int | None = Query(default=None, ge=1, le=100_000),
+    fee_bps: float = Query(default=0.0, ge=0.0, lt=10_000.0),
+    curve: str = Query(default=CURVE_CONSTANT_PRODUCT),
+    amp: float = Query(default=100.0, gt=0.0),
 ):
+    if curve not in CURVES:
+        return JSONResponse(status_code=400, content={"error": f"curve must be one of {', '.join(CURVES)}"})
+    if not (0.0 < reserve_x < np.inf and 0.0 < reserve_y < np.inf):
+        return JSONResponse(status_code=400, content={"error": "reserve_x and reserve_y must be positive"})
+    try:
+        depths = _floats(depth_multipliers)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "depth_multipliers must be comma-separated numbers"})
+    if not depths or not all(0.0 < d < np.inf for d in depths):
+        return JSONResponse(status_code=400, content={"error": "depth_multipliers must be one or more positive numbers"})
     try:
-        depths = [float(x) for x in depth_multipliers.split(",") if x.strip()]
-        sizes = [float(i) * 1_000_000.0 for i in range(1, max_size_millions + 1)]
-        z: List[List[float]] = []
-        for d in depths:
-            rows = compute_slippage_summary(reserve_x * d, reserve_y * d, sizes)
-            z.append([r["slippage_bps"] for r in rows])
-        return JSONResponse(content={
-            "x_sizes_mm": [s / 1_000_000.0 for s in sizes],
-            "y_depth_multipliers": depths,
-            "z_slippage_bps": z,
-        })
+        # Default resolution is one point per million; size_points samples the same range finer.
+        n = size_points or max_size_millions
+        if n * len(depths) > MAX_GRID_CELLS:
+            return JSONResponse(status_code=400, content={"error": f"Grid exceeds {MAX_GRID_CELLS} cells"})
+        dtype = columns_dtype(request)
+
+        def build() -> Dict[str, object]:
+            # both representations read the same memoized arrays
+            grid = cached_slippage_grid(
+                reserve_x, reserve_y, depths, max_size_millions * 1_000_000.0, n, fee_bps, curve, amp
+            )
+            return {
+                "x_sizes_mm": grid["sizes"] / 1_000_000.0,
+                "y_depth_multipliers": grid["depth_multipliers"],
+                "z_slippage_bps": grid["slippage_bps"],
+            }
+
+        # Pure function of its inputs: the version never changes, only the params do
+        params = {
+            "reserve_x": reserve_x, "reserve_y": reserve_y, "depths": depths, "max_size_millions": max_size_millions,
+            "n": n, "fee_bps": fee_bps, "curve": curve, "amp": amp if curve != CURVE_CONSTANT_PRODUCT else None,
+            "format": dtype or "json",
+        }
+        if dtype is None:
+            return RESPONSES.respond(request, "slippage_grid", 0, params, build, vary="Accept")
+        return RESPONSES.respond(
+            request, "slippage_grid", 0, params, build,
+            encode=lambda cols: encode_columns(cols, dtype, {"curve": curve, "fee_bps": fee_bps}),
+            media_type=COLUMNS_MEDIA_TYPE, vary="Accept",
+        )
     except Exception:
         return JSONResponse(status_code=502, content={"error": "Failed to compute grid"})
 
 
+MAX_YIELD_TENORS = 10_000
+
+
 @app.get("/yield")
-def get_yield_curve():
+async def get_yield_curve(request: Request, method: str = Query(default=CURVE_MONOTONE_CUBIC)):
     # Live-only anchors
+    if method not in CURVE_METHODS:
+        return JSONResponse(status_code=400, content={"error": f"method must be one of {', '.join(CURVE_METHODS)}"})
     try:
-        live = fetch_usdc_lending_anchors()
-        if not live:
+        try:
+            cached = await MARKET_CACHE.get("usdc_anchors", _load_usdc_anchors)
+        except Exception:
             return JSONResponse(status_code=502, content={"error": "Live yields unavailable"})
-        payload = build_usdc_yield_curve(live)
-        # Compute simple CeFi vs DeFi delta (bps)
-        cefi_keys = [k for k in live.keys() if "binance" in k.lower()]
-        defi_keys = [k for k in live.keys() if k not in cefi_keys]
-        def avg_rate(keys: List[str]) -> float:
-            vals: List[float] = []
-            for k in keys:
-                vals.extend(live[k]["rates"])  # simple average across provided terms
-            return sum(vals) / len(vals) if vals else 0.0
-        delta_bps = (avg_rate(cefi_keys) - avg_rate(defi_keys)) * 100.0
-        payload["delta_bps"] = delta_bps
-        return JSONResponse(content=payload)
+        live = cached.value
+        try:
+            fit_curve(live, method)  # memoized per anchor set; surfaces fit errors as 400
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+        def build() -> Dict[str, object]:
+            payload = build_usdc_yield_curve(live, method)
+            payload.update({"fetched_at": cached.fetched_at, "stale": cached.stale})
+            # Compute simple CeFi vs DeFi delta (bps)
+            cefi_keys = [k for k in live.keys() if "binance" in k.lower()]
+            defi_keys = [k for k in live.keys() if k not in cefi_keys]
+            def avg_rate(keys: List[str]) -> float:
+                vals: List[float] = []
+                for k in keys:
+                    vals.extend(live[k]["rates"])  # simple average across provided terms
+                return sum(vals) / len(vals) if vals else 0.0
+            delta_bps = (avg_rate(cefi_keys) - avg_rate(defi_keys)) * 100.0
+            payload["delta_bps"] = delta_bps
+            return payload
+
+        version = f"{int(cached.fetched_at * 1000)}{'s' if cached.stale else ''}"
+        response = RESPONSES.respond(request, "yield", version, {"method": method}, build)
+        # age changes every request, so it travels in a header and the body stays byte-stable
+        response.headers["Age"] = str(int(cached.age_seconds))
+        return response
     except Exception:
         return JSONResponse(status_code=502, content={"error": "Failed to fetch live yields"})
 
 
+@app.get("/yield/query")
+async def query_yield_curve(
+    tenors: str = Query(..., description="Comma-separated tenors in days, fractional allowed, e.g. 0.5,7,90,365"),
+    method: str = Query(default=CURVE_MONOTONE_CUBIC),
+):
+    """Evaluate the fitted USDC curve at arbitrary tenors in one call."""
+    try:
+        days = np.array([float(x) for x in tenors.split(",") if x.strip()], dtype=np.float64)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "tenors must be comma-separated numbers"})
+    if days.size == 0 or days.size > MAX_YIELD_TENORS or not np.all(np.isfinite(days)) or np.any(days < 0):
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"tenors must be 1..{MAX_YIELD_TENORS} finite, non-negative numbers"},
+        )
+    try:
+        cached = await MARKET_CACHE.get("usdc_anchors", _load_usdc_anchors)
+    except Exception:
+        return JSONResponse(status_code=502, content={"error": "Live yields unavailable"})
+    try:
+        curve = fit_curve(cached.value, method)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return Response(
+        content=dumps({
+            "tenors": days,
+            "rates": curve(days),
+            "fit": curve.describe(),
+            "fetched_at": cached.fetched_at,
+            "stale": cached.stale,
+        }),
+        media_type="application/json",
+    )
+
+
 @app.get("/")
-def dashboard():
-    index_path = Path("frontend/index.html")
-    return HTMLResponse(content=index_path.read_text(encoding="utf-8"))
+def dashboard(request: Request):
+    return ASSETS.respond(request, ASSETS.index, REVALIDATE)
+
+
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"])
+def static_asset(request: Request, name: str, v: str | None = Query(default=None)):
+    asset = ASSETS.get(name)
+    if asset is None:
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    # only the digest-stamped URL from the dashboard HTML may be cached for good
+    return ASSETS.respond(request, asset, IMMUTABLE if v == asset.digest else REVALIDATE)
 
 
 def _iso_from_unix(ts: float | int | None) -> str:
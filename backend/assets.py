@@ -0,0 +1,122 @@
+import gzip
+import hashlib
+import mimetypes
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import brotli
+from fastapi import Request, Response
+
+from backend.responses import etag_matches
+
+# Fingerprinted URLs (?v=<digest>) never change content, so browsers may keep them
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Below this, compression rarely pays for its headers
+MIN_COMPRESS_BYTES = 256
+
+
+@dataclass(frozen=True)
+class Asset:
+    media_type: str
+    digest: str
+    bodies: Dict[str, bytes]  # content-coding -> bytes; always has "identity"
+
+    def etag(self, coding: str) -> str:
+        # each encoded representation gets its own strong validator
+        return f'"{self.digest}"' if coding == "identity" else f'"{self.digest}-{coding}"'
+
+
+def _compress(raw: bytes) -> Dict[str, bytes]:
+    bodies = {"identity": raw}
+    if len(raw) < MIN_COMPRESS_BYTES:
+        return bodies
+    # brotli is ~15-20% smaller than gzip on JS/CSS; gzip covers older clients
+    encoded = {
+        "gzip": gzip.compress(raw, compresslevel=9, mtime=0),
+        "br": brotli.compress(raw, quality=11),
+    }
+    bodies.update({coding: body for coding, body in encoded.items() if len(body) < len(raw)})
+    return bodies
+
+
+def _asset(raw: bytes, media_type: str) -> Asset:
+    return Asset(media_type, hashlib.blake2b(raw, digest_size=8).hexdigest(), _compress(raw))
+
+
+def negotiate(accept_encoding: Optional[str], available: Dict[str, bytes]) -> str:
+    """Pick the smallest coding the client accepts (RFC 9110 q-values); identity otherwise."""
+    if not accept_encoding:
+        return "identity"
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        match = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    wildcard = weights.get("*", 0.0)
+    accepted = [c for c in available if c != "identity" and weights.get(c, wildcard) > 0]
+    if not accepted:
+        return "identity"
+    return min(accepted, key=lambda c: len(available[c]))
+
+
+class AssetStore:
+    """
+    Dashboard HTML and static files, read and precompressed once at startup.
+
+    References to /static files inside the HTML are rewritten to carry a content
+    digest (?v=...), so those URLs can be cached for a year; the HTML itself is
+    revalidated with its ETag. Each response picks br/gzip/identity from the
+    client's Accept-Encoding.
+    """
+
+    def __init__(self, static_dir: Path, index_path: Path, url_prefix: str = "/static"):
+        self.static_dir = static_dir
+        self.index_path = index_path
+        self.url_prefix = url_prefix.rstrip("/")
+        self._files: Dict[str, Asset] = {}
+        self.index: Optional[Asset] = None
+
+    def load(self) -> None:
+        files: Dict[str, Asset] = {}
+        for path in sorted(p for p in self.static_dir.rglob("*") if p.is_file()):
+            name = path.relative_to(self.static_dir).as_posix()
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+                media_type += "; charset=utf-8"
+            files[name] = _asset(path.read_bytes(), media_type)
+        self._files = files
+        html = self.index_path.read_text(encoding="utf-8")
+        self.index = _asset(self._fingerprint(html).encode("utf-8"), "text/html; charset=utf-8")
+
+    def _fingerprint(self, html: str) -> str:
+        pattern = re.compile(r'((?:src|href)=")' + re.escape(self.url_prefix) + r'/([^"?#]+)"')
+
+        def repl(m: "re.Match[str]") -> str:
+            asset = self._files.get(m.group(2))
+            if asset is None:
+                return m.group(0)
+            return f'{m.group(1)}{self.url_prefix}/{m.group(2)}?v={asset.digest}"'
+
+        return pattern.sub(repl, html)
+
+    def get(self, name: str) -> Optional[Asset]:
+        return self._files.get(name)
+
+    @staticmethod
+    def respond(request: Request, asset: Asset, cache_control: str) -> Response:
+        coding = negotiate(request.headers.get("accept-encoding"), asset.bodies)
+        headers = {"ETag": asset.etag(coding), "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(content=asset.bodies[coding], media_type=asset.media_type, headers=headers)
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import struct
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import orjson
+from fastapi import Request, Response
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode to compact JSON bytes; NumPy arrays and scalars are accepted."""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY, default=_json_default)
+
+
+# Binary columnar bodies, negotiated with `Accept: application/vnd.weal.columns[; dtype=float32]`
+COLUMNS_MEDIA_TYPE = "application/vnd.weal.columns"
+COLUMNS_MAGIC = b"WCOL"
+COLUMNS_VERSION = 1
+_COLUMN_DTYPES = {"float32": "<f4", "float64": "<f8"}
+
+
+def encode_columns(columns: Dict[str, Any], dtype: str = "float64", meta: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Numeric columns as one little-endian binary body:
+
+        b"WCOL" | u8 version | 3 zero bytes | u32 header length | JSON header | data
+
+    The JSON header lists each column's name, dtype ("<f4"/"<f8"), shape and
+    byte offset into the data section, plus optional `meta`. The data section
+    and every column start on an 8-byte boundary, so clients can view them in
+    place (e.g. new Float32Array(buf, dataStart + offset, n)).
+    """
+    dt = np.dtype(_COLUMN_DTYPES[dtype])
+    arrays = {name: np.ascontiguousarray(values, dtype=dt) for name, values in columns.items()}
+    specs = []
+    offset = 0
+    for name, arr in arrays.items():
+        specs.append({"name": name, "dtype": dt.str, "shape": list(arr.shape), "offset": offset})
+        offset += -(-arr.nbytes // 8) * 8
+    header = json.dumps({"columns": specs, "meta": meta or {}}, separators=(",", ":")).encode("utf-8")
+    header += b" " * (-(12 + len(header)) % 8)
+    out = bytearray(COLUMNS_MAGIC + struct.pack("<B3xI", COLUMNS_VERSION, len(header)) + header)
+    for arr in arrays.values():
+        out += arr.tobytes()
+        out += b"\0" * (-arr.nbytes % 8)
+    return bytes(out)
+
+
+def columns_dtype(request: Request) -> Optional[str]:
+    """The dtype the client asked for via Accept, or None when JSON should be sent."""
+    best: Optional[str] = None
+    best_q = json_q = 0.0
+    for part in request.headers.get("accept", "").split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        opts = dict(p.partition("=")[::2] for p in params)
+        try:
+            q = float(opts.get("q", 1.0))
+        except ValueError:
+            q = 0.0
+        if media.lower() == COLUMNS_MEDIA_TYPE and q > best_q:
+            dtype = opts.get("dtype", "float64").strip('"').lower()
+            if dtype in _COLUMN_DTYPES:
+                best, best_q = dtype, q
+        elif media.lower() in ("application/json", "*/*", "application/*"):
+            json_q = max(json_q, q)
+    # an explicit, at least equally preferred request for columns wins over */*
+    return best if best is not None and best_q >= json_q else None
+
+
+def params_digest(params: Dict[str, Any]) -> str:
+    """Short stable digest of normalized query parameters."""
+    raw = json.dumps(params, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+class VersionedResponseCache:
+    """
+    Encoded JSON bodies keyed by (resource, params, data version).
+
+    A resource's version changes whenever its underlying data does, so the
+    strong ETag "<resource>-<version>-<params digest>" identifies the bytes.
+    A matching If-None-Match gets a bodiless 304; otherwise the body is encoded
+    at most once per version and served from an LRU bounded by `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._bodies: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def etag(resource: str, version: Any, params: Optional[Dict[str, Any]] = None) -> str:
+        return f'"{resource}-{version}-{params_digest(params or {})}"'
+
+    def get_body(self, etag: str, build: Callable[[], Any], encode: Callable[[Any], bytes] = dumps) -> bytes:
+        with self._lock:
+            body = self._bodies.get(etag)
+            if body is not None:
+                self._bodies.move_to_end(etag)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = encode(build())
+        if len(body) <= self.max_bytes:
+            with self._lock:
+                if etag not in self._bodies:
+                    self._bodies[etag] = body
+                    self._size += len(body)
+                    while self._size > self.max_bytes:
+                        _, old = self._bodies.popitem(last=False)
+                        self._size -= len(old)
+        return body
+
+    def respond(
+        self,
+        request: Request,
+        resource: str,
+        version: Any,
+        params: Optional[Dict[str, Any]],
+        build: Callable[[], Any],
+        encode: Callable[[Any], bytes] = dumps,
+        media_type: str = "application/json",
+        vary: Optional[str] = None,
+    ) -> Response:
+        """
+        304 if the client already holds this version, else the cached body.
+        The body is byte-identical for a given ETag; `encode`/`media_type` replace JSON for other representations, which
+        must then differ in `params` (and set `vary` to the negotiated header).
+        """
+        tag = self.etag(resource, version, params)
+        headers = {"ETag": tag, "Cache-Control": "no-cache"}
+        if vary is not None:
+            headers["Vary"] = vary
+        if etag_matches(request, tag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        body = self.get_body(tag, build, encode)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def stats(self) -> Tuple[int, int, int, int]:
+        with self._lock:
+            return self.hits, self.misses, self.not_modified, self._size
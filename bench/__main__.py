@@ -0,0 +1,176 @@
+"""
+Run the lib/ micro-benchmarks and compare against a stored baseline.
+
+    python -m bench                      # run all, compare with bench/baseline.json
+    python -m bench -k peg --quick       # subset, shorter timing budget
+    python -m bench --save               # record the current results as the baseline
+
+Exits with status 1 when a case's throughput drops, or its peak allocation
+grows, by more than the threshold relative to the baseline. Baselines are
+machine-specific: record one on the box you compare on. They also record the
+timing budget, and runs with a different budget (e.g. --quick against a full
+baseline) are not compared.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bench.cases import Case, all_cases
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+# (seconds per case, repeats); baselines saved before budgets were recorded used FULL
+FULL_TIMING = (0.3, 5)
+QUICK_TIMING = (0.05, 3)
+
+
+def _time_per_call(fn: Callable[[], object], budget: float, repeats: int) -> float:
+    """Best-of-`repeats` seconds per call, each repeat looping for about budget/repeats."""
+    fn()  # warm caches, lazy imports and allocator pools
+    t0 = time.perf_counter()
+    fn()
+    single = max(time.perf_counter() - t0, 1e-9)
+    loops = max(1, int(budget / repeats / single))
+    best = float("inf")
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            best = min(best, (time.perf_counter() - t0) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def _peak_alloc(fn: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(case: Case, budget: float, repeats: int) -> Dict[str, Any]:
+    fn = case.setup()
+    per_call = _time_per_call(fn, budget, repeats)
+    return {
+        "size": case.size,
+        "seconds_per_call": per_call,
+        "calls_per_second": 1.0 / per_call,
+        "items_per_second": case.size / per_call,
+        "peak_alloc_bytes": _peak_alloc(fn),
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], threshold: float, alloc_threshold: float
+) -> List[str]:
+    problems = []
+    for case_id, r in results.items():
+        b = baseline.get(case_id)
+        if b is None:
+            continue
+        ratio = r["items_per_second"] / b["items_per_second"]
+        if ratio < 1.0 - threshold:
+            problems.append(f"{case_id}: throughput {ratio:.2f}x of baseline")
+        slack = 64 * 1024  # ignore noise on tiny allocations
+        if r["peak_alloc_bytes"] > b["peak_alloc_bytes"] * (1.0 + alloc_threshold) + slack:
+            problems.append(
+                f"{case_id}: peak allocation {r['peak_alloc_bytes'] / 1e6:.2f} MB "
+                f"vs {b['peak_alloc_bytes'] / 1e6:.2f} MB baseline"
+            )
+    return problems
+
+
+def _fmt_rate(x: float) -> str:
+    for unit, scale in (("G", 1e9), ("M", 1e6), ("k", 1e3)):
+        if x >= scale:
+            return f"{x / scale:.2f}{unit}"
+    return f"{x:.1f}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="lib/ hot-path benchmarks (offline)")
+    parser.add_argument("-k", "--filter", default="", help="only run cases whose id contains this text")
+    parser.add_argument("--quick", action="store_true", help="shorter timing budget (noisier)")
+    parser.add_argument("--save", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed throughput drop (fraction)")
+    parser.add_argument("--alloc-threshold", type=float, default=0.25, help="allowed peak allocation growth (fraction)")
+    parser.add_argument("--json", type=Path, default=None, help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    budget, repeats = QUICK_TIMING if args.quick else FULL_TIMING
+    baseline: Dict[str, Dict[str, Any]] = {}
+    baseline_timing = (budget, repeats)
+    if args.baseline.exists():
+        stored = json.loads(args.baseline.read_text(encoding="utf-8"))
+        baseline = stored.get("results", {})
+        base_meta = stored.get("meta", {})
+        baseline_timing = (base_meta.get("budget", FULL_TIMING[0]), base_meta.get("repeats", FULL_TIMING[1]))
+    comparable = baseline_timing == (budget, repeats)
+    if baseline and not comparable:
+        if args.save:
+            print(
+                f"{args.baseline} was recorded with a {baseline_timing[0]}s x {baseline_timing[1]} budget; "
+                f"not merging {budget}s x {repeats} results into it (use --baseline for a separate file)",
+                file=sys.stderr,
+            )
+            return 2
+        print(f"Baseline recorded with a {baseline_timing[0]}s x {baseline_timing[1]} budget; not comparing.\n")
+        baseline = {}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    print(f"{'case':<52} {'time/call':>12} {'items/s':>10} {'peak alloc':>11} {'vs base':>8}")
+    for case in all_cases():
+        if args.filter not in case.id:
+            continue
+        r = results[case.id] = run_case(case, budget, repeats)
+        b = baseline.get(case.id)
+        vs = f"{r['items_per_second'] / b['items_per_second']:.2f}x" if b else "-"
+        print(
+            f"{case.id:<52} {r['seconds_per_call'] * 1e6:>10.1f}us {_fmt_rate(r['items_per_second']):>10} "
+            f"{r['peak_alloc_bytes'] / 1e6:>9.2f}MB {vs:>8}"
+        )
+
+    meta = {
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "budget": budget,
+        "repeats": repeats,
+    }
+    if args.json is not None:
+        args.json.write_text(json.dumps({"meta": meta, "results": results}, indent=1), encoding="utf-8")
+    if args.save:
+        saved: Dict[str, Dict[str, Any]] = dict(baseline)
+        saved.update(results)
+        args.baseline.write_text(json.dumps({"meta": meta, "results": saved}, indent=1, sort_keys=True), encoding="utf-8")
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    problems = compare(results, baseline, args.threshold, args.alloc_threshold)
+    if problems:
+        print("\nRegressions:")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    if baseline:
+        print("\nNo regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
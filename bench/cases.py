@@ -0,0 +1,154 @@
+"""
+Benchmark cases for the lib/ hot paths.
+
+Each case is a setup function returning the callable to time, so fixtures
+are built outside the measurement. `size` is the number of items one call
+processes and is used to report items/s.
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List
+
+import numpy as np
+
+from bench import fixtures
+from lib import yield_curve
+from lib.amm import compute_constant_product_trade_output, compute_slippage_summary, optimal_split, slippage_grid
+from lib.peg import PegDataStore
+from lib.pegstats import RollingPegStats
+from lib.pools import PoolIndex, iter_pools
+
+
+@dataclass(frozen=True)
+class Case:
+    group: str
+    name: str
+    size: int
+    setup: Callable[[], Callable[[], object]]
+
+    @property
+    def id(self) -> str:
+        return f"{self.group}/{self.name}[{self.size}]"
+
+
+def _cp_scalar(n: int) -> Callable[[], object]:
+    sizes = np.linspace(1e3, 1e7, n).tolist()
+
+    def run() -> object:
+        return [compute_constant_product_trade_output(5e7, 5e7, s) for s in sizes]
+
+    return run
+
+
+def _slippage_summary(n: int) -> Callable[[], object]:
+    sizes = np.linspace(1e3, 2e7, n).tolist()
+    return lambda: compute_slippage_summary(5e7, 5e7, sizes, fee_bps=4)
+
+
+def _slippage_grid(depths: int, sizes: int, curve: str) -> Callable[[], object]:
+    size_arr = np.linspace(1e4, 2e7, sizes)
+    depth_arr = np.linspace(0.25, 4.0, depths)
+    return lambda: slippage_grid(5e7, 5e7, size_arr, depth_arr, fee_bps=4, curve=curve, amp=100)
+
+
+def _optimal_split(pools: int, sizes: int) -> Callable[[], object]:
+    rng = np.random.default_rng(0)
+    reserve_in = rng.uniform(1e5, 5e8, pools)
+    reserve_out = reserve_in * rng.uniform(0.99, 1.01, pools)
+    fees = rng.choice([1.0, 4.0, 30.0], pools)
+    size_arr = np.geomspace(1e3, 1e9, sizes)
+    return lambda: optimal_split(reserve_in, reserve_out, size_arr, fees)
+
+
+def _linear_interpolate(knots: int) -> Callable[[], object]:
+    xs = np.linspace(1, 365, knots).tolist()
+    ys = np.linspace(4.0, 5.5, knots).tolist()
+    return lambda: [yield_curve.linear_interpolate(xs, ys, d) for d in range(1, 31)]
+
+
+def _build_curve(platforms: int, tenors: int, method: str, cold: bool) -> Callable[[], object]:
+    anchors = fixtures.anchors(platforms, tenors)
+
+    def run() -> object:
+        if cold:
+            yield_curve._FITTED.clear()
+        return yield_curve.build_usdc_yield_curve(anchors, method)
+
+    return run
+
+
+def _curve_eval(points: int) -> Callable[[], object]:
+    curve = yield_curve.fit_curve(fixtures.anchors(3, 8))
+    tenors = np.linspace(0.0, 730.0, points)
+    return lambda: curve(tenors)
+
+
+def _random_walk(symbols: int, venues: int) -> Callable[[], object]:
+    store = PegDataStore([f"S{i}" for i in range(symbols)], [f"V{i}" for i in range(venues)], seed=0)
+    return store.random_walk
+
+
+def _walk_and_snapshot(symbols: int, venues: int) -> Callable[[], object]:
+    store = PegDataStore([f"S{i}" for i in range(symbols)], [f"V{i}" for i in range(venues)], seed=0)
+
+    def run() -> object:
+        store.random_walk()
+        return store.snapshot()
+
+    return run
+
+
+def _peg_stats_update(symbols: int, venues: int) -> Callable[[], object]:
+    stats = RollingPegStats()
+    keys = [(f"V{v}", f"S{s}") for v in range(venues) for s in range(symbols)]
+    prices = 1.0 + np.random.default_rng(0).normal(0.0, 0.002, (64, len(keys)))
+    step = iter(range(1 << 62))
+
+    def run() -> object:
+        i = next(step)
+        return stats.update(3.0 * i, keys, prices[i % len(prices)])
+
+    return run
+
+
+def _parse_pools(n: int) -> Callable[[], object]:
+    chunks = list(fixtures.chunked(fixtures.pools_payload(n)))
+
+    def run() -> object:
+        index = PoolIndex()
+        for pool in iter_pools(chunks):
+            index.add(pool)
+        return index
+
+    return run
+
+
+def all_cases() -> List[Case]:
+    cases: List[Case] = []
+    for n in (10, 1_000, 100_000):
+        cases.append(Case("amm", "constant_product_scalar", n, lambda n=n: _cp_scalar(n)))
+        cases.append(Case("amm", "slippage_summary", n, lambda n=n: _slippage_summary(n)))
+    for depths, sizes in ((4, 100), (10, 2_000), (100, 10_000)):
+        for curve in ("constant_product", "stableswap"):
+            cases.append(
+                Case("amm", f"slippage_grid_{curve}", depths * sizes, lambda d=depths, s=sizes, c=curve: _slippage_grid(d, s, c))
+            )
+    for pools, sizes in ((5, 10), (1_000, 100), (10_000, 100)):
+        cases.append(Case("amm", "optimal_split", pools * sizes, lambda p=pools, s=sizes: _optimal_split(p, s)))
+    for knots in (3, 100, 1_000):
+        cases.append(Case("yield", "linear_interpolate_30d", knots, lambda k=knots: _linear_interpolate(k)))
+    for platforms, tenors in ((3, 3), (20, 12), (200, 40)):
+        size = platforms * tenors
+        for method in yield_curve.CURVE_METHODS:
+            cases.append(Case("yield", f"fit_{method}_cold", size, lambda p=platforms, t=tenors, m=method: _build_curve(p, t, m, True)))
+        cases.append(Case("yield", "build_curve_memoized", size, lambda p=platforms, t=tenors: _build_curve(p, t, "monotone_cubic", False)))
+    for points in (30, 10_000, 1_000_000):
+        cases.append(Case("yield", "curve_eval", points, lambda p=points: _curve_eval(p)))
+    for symbols, venues in ((3, 2), (50, 10), (500, 30)):
+        size = symbols * venues
+        cases.append(Case("peg", "random_walk", size, lambda s=symbols, v=venues: _random_walk(s, v)))
+        cases.append(Case("peg", "random_walk_snapshot", size, lambda s=symbols, v=venues: _walk_and_snapshot(s, v)))
+        cases.append(Case("peg", "stats_update", size, lambda s=symbols, v=venues: _peg_stats_update(s, v)))
+    for n in (1_000, 10_000, 50_000):
+        cases.append(Case("pools", "stream_parse_index", n, lambda n=n: _parse_pools(n)))
+    return cases
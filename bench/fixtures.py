@@ -0,0 +1,120 @@
+"""
+Offline fixtures for the benchmarks.
+
+`defillama-api.json` is DefiLlama's OpenAPI description, not recorded data,
+so payloads are synthesized: each record starts from the example object the
+spec documents for that endpoint, and seeded random values are filled into
+the fields we parse. The same seed and size always give the same bytes.
+"""
+
+import copy
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+SPEC_PATH = Path(__file__).resolve().parent.parent / "defillama-api.json"
+
+PROJECTS = ["aave", "aave-v3", "compound", "compound-v3", "curve-dex", "uniswap-v3", "morpho", "spark", "maker"]
+CHAINS = ["Ethereum", "Arbitrum", "Optimism", "Base", "Polygon", "BSC", "Avalanche", "Tron"]
+STABLES = ["USDC", "USDT", "DAI", "FRAX", "LUSD", "USDE", "PYUSD", "GHO", "CRVUSD", "TUSD"]
+
+
+@lru_cache(maxsize=1)
+def load_spec() -> Dict[str, Any]:
+    with SPEC_PATH.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def example_from_schema(schema: Dict[str, Any]) -> Any:
+    """Build an example value from an OpenAPI schema, preferring documented examples."""
+    if "example" in schema:
+        return copy.deepcopy(schema["example"])
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        return {k: example_from_schema(v) for k, v in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_from_schema(schema.get("items", {}))]
+    return {"string": "", "number": 0.0, "integer": 0, "boolean": False}.get(kind)
+
+
+def _item_example(path: str, field: str) -> Dict[str, Any]:
+    responses = load_spec()["paths"][path]["get"]["responses"]
+    schema = responses["200"]["content"]["application/json"]["schema"]
+    return example_from_schema(schema["properties"][field]["items"])
+
+
+def pools_payload(n: int, seed: int = 0, stable_share: float = 0.4) -> str:
+    """/pools body with `n` pools shaped like the spec example."""
+    template = _item_example("/pools", "data")
+    rng = np.random.default_rng(seed)
+    tvl = rng.lognormal(15.0, 2.0, n)
+    apy = rng.gamma(2.0, 2.5, n)
+    mean_30d = apy * rng.uniform(0.8, 1.2, n)
+    stable = rng.random(n) < stable_share
+    projects = rng.integers(0, len(PROJECTS), n)
+    chains = rng.integers(0, len(CHAINS), n)
+    symbols = rng.integers(0, len(STABLES), n)
+    pct_7d = rng.normal(0.0, 0.5, n)
+    data: List[Dict[str, Any]] = []
+    for i in range(n):
+        pool = dict(template)
+        pool.update(
+            {
+                "pool": f"{seed:04x}{i:012x}-bench",
+                "chain": CHAINS[chains[i]],
+                "project": PROJECTS[projects[i]],
+                "symbol": STABLES[symbols[i]] if stable[i] else f"{STABLES[symbols[i]]}-WETH",
+                "tvlUsd": round(float(tvl[i]), 2),
+                "apy": round(float(apy[i]), 4),
+                "apyBase": round(float(apy[i]) * 0.7, 4),
+                "apyMean30d": round(float(mean_30d[i]), 4),
+                "apyPct7D": round(float(pct_7d[i]), 4),
+                "stablecoin": bool(stable[i]),
+            }
+        )
+        data.append(pool)
+    return json.dumps({"status": "success", "data": data})
+
+
+def stablecoins_payload(n: int, seed: int = 0) -> Dict[str, Any]:
+    """/stablecoins body with `n` pegged assets shaped like the spec example."""
+    template = _item_example("/stablecoins", "peggedAssets")
+    rng = np.random.default_rng(seed)
+    circulating = rng.lognormal(18.0, 3.0, n)
+    price = 1.0 + rng.normal(0.0, 0.002, n)
+    assets = []
+    for i in range(n):
+        asset = dict(template)
+        asset.update(
+            {
+                "id": str(i + 1),
+                "symbol": STABLES[i] if i < len(STABLES) else f"STB{i}",
+                "gecko_id": f"bench-stable-{i}",
+                "pegType": "peggedUSD",
+                "circulating": {"peggedUSD": float(circulating[i])},
+                "price": float(price[i]),
+            }
+        )
+        assets.append(asset)
+    return {"peggedAssets": assets}
+
+
+def chunked(text: str, size: int = 64 * 1024) -> Iterator[str]:
+    """Split a body the way a streamed HTTP response would arrive."""
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+def anchors(platforms: int, tenors: int, seed: int = 0) -> Dict[str, Dict[str, List[float]]]:
+    """Yield-curve anchors: `platforms` x `tenors` upward-sloping rates."""
+    rng = np.random.default_rng(seed)
+    days = np.unique(np.geomspace(1, 365, tenors).round(2)).tolist()
+    out = {}
+    for p in range(platforms):
+        base = rng.uniform(3.0, 5.0)
+        rates = (base + 0.4 * np.log1p(np.asarray(days)) / np.log(366) + rng.normal(0, 0.05, len(days))).tolist()
+        out[f"Platform {p}"] = {"days": days, "rates": rates}
+    return out
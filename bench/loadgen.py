@@ -0,0 +1,124 @@
+"""
+Open-loop load generator for the API.
+
+    python -m bench.loadgen --target http://127.0.0.1:8000 --rps 200 --duration 30
+
+Requests are issued on a fixed schedule at `--rps`, spread round-robin over
+the endpoints, whether or not earlier ones have answered. Latency is measured
+from each request's scheduled start, so queueing inside the client or the
+server shows up in the numbers instead of silently lowering the send rate.
+Reports count, errors, p50/p99/max latency and completed requests per second
+for each endpoint and overall.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+DEFAULT_ENDPOINTS = [
+    "/peg",
+    "/peg_history?points=200",
+    "/slippage_grid?size_points=500",
+    "/yield",
+]
+
+
+async def _one(client: httpx.AsyncClient, path: str, scheduled: float, out: List[Tuple[str, float, int]]) -> None:
+    delay = scheduled - time.perf_counter()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    try:
+        r = await client.get(path)
+        await r.aread()
+        status = r.status_code
+    except httpx.HTTPError:
+        status = 0
+    out.append((path, time.perf_counter() - scheduled, status))
+
+
+async def run_load(
+    target: str,
+    endpoints: List[str],
+    rps: float,
+    duration: float,
+    warmup: float = 2.0,
+    connections: int = 64,
+    timeout: float = 30.0,
+) -> Dict[str, Dict[str, float]]:
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=target, limits=limits, timeout=timeout) as client:
+        if warmup > 0:
+            warm: List[Tuple[str, float, int]] = []
+            t0 = time.perf_counter()
+            n_warm = max(len(endpoints), int(warmup * rps))
+            await asyncio.gather(*(_one(client, endpoints[i % len(endpoints)], t0 + i / rps, warm) for i in range(n_warm)))
+        results: List[Tuple[str, float, int]] = []
+        n = int(duration * rps)
+        t0 = time.perf_counter() + 0.05
+        tasks = [
+            asyncio.ensure_future(_one(client, endpoints[i % len(endpoints)], t0 + i / rps, results)) for i in range(n)
+        ]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - t0
+    return summarize(results, elapsed)
+
+
+def summarize(results: List[Tuple[str, float, int]], elapsed: float) -> Dict[str, Dict[str, float]]:
+    groups: Dict[str, List[Tuple[float, int]]] = {}
+    for path, latency, status in results:
+        groups.setdefault(path, []).append((latency, status))
+    groups["ALL"] = [(lat, st) for _, lat, st in results]
+    report: Dict[str, Dict[str, float]] = {}
+    for path, rows in groups.items():
+        lat = np.array([r[0] for r in rows]) * 1000.0
+        ok = np.array([200 <= r[1] < 400 for r in rows])
+        report[path] = {
+            "requests": len(rows),
+            "errors": int((~ok).sum()),
+            "p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+            "p99_ms": float(np.percentile(lat, 99)) if len(lat) else 0.0,
+            "max_ms": float(lat.max()) if len(lat) else 0.0,
+            "throughput_rps": float(ok.sum() / elapsed) if elapsed > 0 else 0.0,
+        }
+    return report
+
+
+def print_report(report: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'endpoint':<36} {'reqs':>7} {'errors':>7} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9} {'ok/s':>9}")
+    for path, r in report.items():
+        print(
+            f"{path:<36} {r['requests']:>7} {r['errors']:>7} {r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r['max_ms']:>9.2f} {r['throughput_rps']:>9.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.loadgen", description="Open-loop load test for the API")
+    parser.add_argument("--target", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", action="append", dest="endpoints", help="path to hit (repeatable)")
+    parser.add_argument("--rps", type=float, default=100.0, help="target request rate across all endpoints")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--json", type=Path, default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    endpoints = args.endpoints or DEFAULT_ENDPOINTS
+    report = asyncio.run(
+        run_load(args.target, endpoints, args.rps, args.duration, args.warmup, args.connections)
+    )
+    print_report(report)
+    if args.json is not None:
+        args.json.write_text(json.dumps(report, indent=1), encoding="utf-8")
+    return 0 if report["ALL"]["errors"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
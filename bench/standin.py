@@ -0,0 +1,162 @@
+"""
+Local stand-in for the DefiLlama coins, yields and stablecoins APIs.
+
+    python -m bench.standin --port 8100 --latency-ms 40 --jitter-ms 20 --error-rate 0.02 --scale 5
+
+then start the app against it:
+
+    COINS_BASE=http://127.0.0.1:8100 YIELDS_BASE=http://127.0.0.1:8100 \\
+    STABLECOINS_BASE=http://127.0.0.1:8100 python main.py web
+
+Serves `/prices/current/{coins}`, `/pools` and `/stablecoins`. Bodies come
+from `--payloads DIR` (pools.json / stablecoins.json, e.g. saved from the
+real API) when present, otherwise they are synthesized by bench.fixtures.
+`--scale` multiplies the number of records. Latency, jitter and error rate
+can be changed while running via `POST /_standin/config?latency_ms=...`.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Query, Response
+from fastapi.responses import JSONResponse
+
+from bench import fixtures
+
+BASE_POOLS = 2_000
+BASE_STABLECOINS = 300
+
+
+@dataclass
+class StandInConfig:
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 502
+    scale: float = 1.0
+    seed: int = 0
+
+
+def _scaled(records: List[Dict[str, Any]], scale: float, id_field: str) -> List[Dict[str, Any]]:
+    """Repeat (or trim) records to len * scale, keeping ids unique."""
+    target = max(1, int(len(records) * scale))
+    out = records[:target]
+    copy_no = 1
+    while len(out) < target:
+        for r in records[: target - len(out)]:
+            dup = dict(r)
+            dup[id_field] = f"{r.get(id_field)}-x{copy_no}"
+            out.append(dup)
+        copy_no += 1
+    return out
+
+
+def _load_bodies(config: StandInConfig, payloads: Optional[Path]) -> Dict[str, bytes]:
+    pools: Optional[Dict[str, Any]] = None
+    stables: Optional[Dict[str, Any]] = None
+    if payloads is not None:
+        if (payloads / "pools.json").exists():
+            pools = json.loads((payloads / "pools.json").read_text(encoding="utf-8"))
+        if (payloads / "stablecoins.json").exists():
+            stables = json.loads((payloads / "stablecoins.json").read_text(encoding="utf-8"))
+    if pools is None:
+        pools = json.loads(fixtures.pools_payload(BASE_POOLS, seed=config.seed))
+    if stables is None:
+        stables = fixtures.stablecoins_payload(BASE_STABLECOINS, seed=config.seed)
+    pools["data"] = _scaled(pools.get("data", []), config.scale, "pool")
+    stables["peggedAssets"] = _scaled(stables.get("peggedAssets", []), config.scale, "id")
+    return {
+        "pools": json.dumps(pools).encode("utf-8"),
+        "stablecoins": json.dumps(stables).encode("utf-8"),
+    }
+
+
+def create_app(config: Optional[StandInConfig] = None, payloads: Optional[Path] = None) -> FastAPI:
+    config = config or StandInConfig()
+    app = FastAPI(title="DefiLlama stand-in")
+    bodies = _load_bodies(config, payloads)
+    rng = random.Random(config.seed)
+    counters: Dict[str, int] = {"requests": 0, "errors": 0}
+
+    async def inject() -> Optional[Response]:
+        counters["requests"] += 1
+        delay = config.latency_ms + (rng.uniform(0.0, config.jitter_ms) if config.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+        if config.error_rate and rng.random() < config.error_rate:
+            counters["errors"] += 1
+            return JSONResponse(status_code=config.error_status, content={"error": "injected failure"})
+        return None
+
+    @app.get("/prices/current/{coins}")
+    async def current_prices(coins: str):
+        failure = await inject()
+        if failure is not None:
+            return failure
+        now = int(time.time())
+        data = {
+            c: {"price": 1.0 + rng.gauss(0.0, 0.0005), "symbol": c.split(":")[-1].upper(), "timestamp": now, "confidence": 0.99}
+            for c in coins.split(",")
+            if c
+        }
+        return {"coins": data}
+
+    @app.get("/pools")
+    async def pools():
+        return await inject() or Response(content=bodies["pools"], media_type="application/json")
+
+    @app.get("/stablecoins")
+    async def stablecoins(includePrices: bool = Query(default=True)):
+        return await inject() or Response(content=bodies["stablecoins"], media_type="application/json")
+
+    @app.get("/_standin/config")
+    def get_config():
+        return {**asdict(config), **counters, "body_bytes": {k: len(v) for k, v in bodies.items()}}
+
+    @app.post("/_standin/config")
+    def set_config(
+        latency_ms: Optional[float] = Query(default=None, ge=0),
+        jitter_ms: Optional[float] = Query(default=None, ge=0),
+        error_rate: Optional[float] = Query(default=None, ge=0, le=1),
+        error_status: Optional[int] = Query(default=None, ge=400, le=599),
+    ):
+        for name, value in (
+            ("latency_ms", latency_ms),
+            ("jitter_ms", jitter_ms),
+            ("error_rate", error_rate),
+            ("error_status", error_status),
+        ):
+            if value is not None:
+                setattr(config, name, value)
+        return get_config()
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m bench.standin", description="Local DefiLlama stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=502)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of pools / pegged assets")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--payloads", type=Path, default=None, help="directory with pools.json / stablecoins.json")
+    args = parser.parse_args()
+
+    config = StandInConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.scale, args.seed)
+    uvicorn.run(create_app(config, args.payloads), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
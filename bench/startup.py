@@ -0,0 +1,80 @@
+"""
+Startup-time budget for `main.py cli` and `main.py web`.
+
+    python -m bench.startup                # exits 1 if a mode is over budget
+    python -m bench.startup --runs 10 --web-budget 1.0
+
+Each run is a fresh interpreter that imports what the mode loads before doing
+any I/O: `main` plus the CLI's lib modules, or `main` plus uvicorn and the app
+(which reads and precompresses the dashboard assets). Wall time includes
+interpreter startup; the median over `--runs` is compared to the budget. The
+cli mode also fails if it pulls in the web stack.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES: Dict[str, List[str]] = {
+    "cli": ["main", "lib.amm", "lib.defillama", "lib.yield_curve"],
+    "web": ["main", "uvicorn", "backend.api"],
+}
+WEB_STACK = ("fastapi", "starlette", "uvicorn", "pydantic")
+DEFAULT_BUDGETS = {"cli": 0.5, "web": 1.5}
+
+_CHILD = """
+import importlib, json, sys, time
+t0 = time.perf_counter()
+for name in {modules!r}:
+    importlib.import_module(name)
+print(json.dumps({{"imports": time.perf_counter() - t0, "web_stack": [m for m in {web!r} if m in sys.modules]}}))
+"""
+
+
+def measure(mode: str) -> Dict[str, object]:
+    code = _CHILD.format(modules=MODES[mode], web=WEB_STACK)
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - t0
+    child = json.loads(out.stdout.strip().splitlines()[-1])
+    return {"wall": wall, "imports": child["imports"], "web_stack": child["web_stack"]}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.startup", description="Startup-time budget per main.py mode")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--cli-budget", type=float, default=DEFAULT_BUDGETS["cli"], help="seconds (median wall time)")
+    parser.add_argument("--web-budget", type=float, default=DEFAULT_BUDGETS["web"], help="seconds (median wall time)")
+    args = parser.parse_args(argv)
+    budgets = {"cli": args.cli_budget, "web": args.web_budget}
+
+    problems: List[str] = []
+    print(f"{'mode':<6} {'wall p50':>10} {'imports p50':>12} {'budget':>8}")
+    for mode in MODES:
+        runs = [measure(mode) for _ in range(max(1, args.runs))]
+        wall = statistics.median(r["wall"] for r in runs)
+        imports = statistics.median(r["imports"] for r in runs)
+        print(f"{mode:<6} {wall * 1e3:>8.0f}ms {imports * 1e3:>10.0f}ms {budgets[mode] * 1e3:>6.0f}ms")
+        if wall > budgets[mode]:
+            problems.append(f"{mode}: {wall * 1e3:.0f}ms over the {budgets[mode] * 1e3:.0f}ms budget")
+        if mode == "cli" and runs[0]["web_stack"]:
+            problems.append(f"cli: imports the web stack ({', '.join(runs[0]['web_stack'])})")
+
+    if problems:
+        print("\nOver budget:")
+        for p in problems:
+            print(f"  {p}")
+        return 1
+    print("\nWithin budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
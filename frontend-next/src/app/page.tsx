@@ -1,12 +1,19 @@
 "use client";
 
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 
 type PegRow = { venue: string; symbol: string; price: number; timestamp: string };
 type SlippageRow = { size: number; out_amount: number; execution_price: number; slippage_bps: number };
-type YieldData = { anchors: Record<string, { days: number[]; rates: number[] }>; curve: { days: number[]; rates: number[] } };
+type YieldData = {
+  anchors: Record<string, { days: number[]; rates: number[] }>;
+  curve: { days: number[]; rates: number[] };
+  fetched_at?: number;
+  stale?: boolean;
+};
 
 const BACKEND = process.env.NEXT_PUBLIC_BACKEND_URL || "http://127.0.0.1:8001";
+// The backend tracks every pegged asset; the dashboard shows a few
+const PEG_SYMBOLS = ["USDC", "USDT", "DAI"];
 
 export default function Home() {
   const [intervalSec, setIntervalSec] = useState<number>(3);
@@ -14,16 +21,18 @@ export default function Home() {
   const [slip, setSlip] = useState<SlippageRow[]>([]);
   const [yieldData, setYieldData] = useState<YieldData | null>(null);
   const [loading, setLoading] = useState(false);
+  const streaming = useRef(false);
 
   const fetchAll = async () => {
     setLoading(true);
     try {
       const [pegRes, slipRes, yRes] = await Promise.all([
-        fetch(`${BACKEND}/peg`).then((r) => r.json()),
+        // peg prices arrive over /peg/stream once it is connected
+        streaming.current ? Promise.resolve(null) : fetch(`${BACKEND}/peg?symbols=${PEG_SYMBOLS.join(",")}`).then((r) => r.json()),
         fetch(`${BACKEND}/slippage`).then((r) => r.json()),
         fetch(`${BACKEND}/yield`).then((r) => r.json()),
       ]);
-      setPeg((pegRes?.data as PegRow[]) || []);
+      if (pegRes) setPeg((pegRes?.data as PegRow[]) || []);
       setSlip((slipRes?.summary as SlippageRow[]) || []);
       setYieldData(yRes as YieldData);
     } catch (e) {
@@ -37,6 +46,28 @@ export default function Home() {
     fetchAll();
   }, []);
 
+  useEffect(() => {
+    if (typeof EventSource === "undefined") return;
+    const es = new EventSource(`${BACKEND}/peg/stream`);
+    const onMessage = (ev: MessageEvent) => {
+      streaming.current = true;
+      const rows = (JSON.parse(ev.data)?.data as PegRow[]) || [];
+      setPeg((prev) => {
+        const next = new Map(prev.map((r) => [`${r.symbol}|${r.venue}`, r]));
+        for (const r of rows) {
+          if (PEG_SYMBOLS.includes(r.symbol)) next.set(`${r.symbol}|${r.venue}`, r);
+        }
+        return [...next.values()];
+      });
+    };
+    es.addEventListener("snapshot", onMessage);
+    es.addEventListener("delta", onMessage);
+    es.onerror = () => {
+      if (es.readyState === EventSource.CLOSED) streaming.current = false;
+    };
+    return () => es.close();
+  }, []);
+
   useEffect(() => {
     if (intervalSec <= 0) return;
     const id = setInterval(fetchAll, intervalSec * 1000);
@@ -117,7 +148,11 @@ export default function Home() {
         </div>
 
         <div style={{ background: "#131826", border: "1px solid #22252e", borderRadius: 10, padding: 14 }}>
-          <div style={{ color: "#9aa4bf", marginBottom: 8 }}>Yield Curve (USDC)</div>
+          <div style={{ color: "#9aa4bf", marginBottom: 8 }}>
+            Yield Curve (USDC)
+            {typeof yieldData?.fetched_at === "number" &&
+              ` · data ${Math.round(Math.max(0, Date.now() / 1000 - yieldData.fetched_at))}s old${yieldData.stale ? " (stale, refreshing)" : ""}`}
+          </div>
           {yieldData && (
             <>
               <table style={{ width: "100%", borderCollapse: "collapse", marginBottom: 12 }}>
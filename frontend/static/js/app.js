@@ -5,10 +5,32 @@ function setActive(id){
   document.getElementById('panel-'+id).classList.add('active');
 }
 
-async function loadPeg(){
-  const res = await fetch('/peg');
-  const data = await res.json();
-  const rows = data.data;
+// Latest row per symbol/venue plus a short client-side sparkline buffer,
+// fed by /peg/stream (or by polling /peg when streaming is unavailable).
+const pegState = {};
+const sparkData = {};
+const SPARK_POINTS = 60;
+// The backend tracks every pegged asset; the dashboard shows a few
+const PEG_SYMBOLS = ['USDC', 'USDT', 'DAI'];
+
+function pegKey(symbol, venue){ return `${symbol}|${venue}`; }
+
+function applyPegRows(rows){
+  for(const r of rows){
+    if(!PEG_SYMBOLS.includes(r.symbol)) continue;
+    const key = pegKey(r.symbol, r.venue);
+    pegState[key] = r;
+    const spark = sparkData[key] = sparkData[key] || {x: [], y: []};
+    const t = new Date(r.timestamp);
+    if(spark.x.length && spark.x[spark.x.length-1].getTime() === t.getTime()) continue;
+    spark.x.push(t); spark.y.push(r.price);
+    if(spark.x.length > SPARK_POINTS){ spark.x.shift(); spark.y.shift(); }
+  }
+  renderPeg();
+}
+
+function renderPeg(){
+  const rows = Object.values(pegState);
   const tb = document.querySelector('#peg-table tbody');
   tb.innerHTML='';
   rows.sort((a,b)=> a.symbol.localeCompare(b.symbol) || a.venue.localeCompare(b.venue));
@@ -34,10 +56,38 @@ async function loadPeg(){
     const sparkId = `spark-${r.symbol}-${r.venue}`.replace(/[^a-zA-Z0-9_-]/g,'');
     tr.innerHTML = `<td>${r.symbol}</td><td>${r.venue}</td><td>${r.price.toFixed(6)}</td><td class="${sClass}">${sBps.toFixed(1)}</td><td><div id="${sparkId}" class="spark"></div></td><td class="small">${ts}</td>`;
     tb.appendChild(tr);
-    drawSpark(r.symbol, r.venue, sparkId);
+    drawSpark(pegKey(r.symbol, r.venue), sparkId);
   }
 }
 
+async function loadPeg(){
+  const res = await fetch(`/peg?symbols=${PEG_SYMBOLS.join(',')}`);
+  const data = await res.json();
+  applyPegRows(data.data);
+}
+
+async function loadSparkHistory(){
+  const res = await fetch(`/peg_history?symbols=${PEG_SYMBOLS.join(',')}&limit=${SPARK_POINTS}`);
+  const data = await res.json();
+  for(const [symbol, venues] of Object.entries(data.data || {})){
+    for(const [venue, points] of Object.entries(venues)){
+      sparkData[pegKey(symbol, venue)] = {x: points.map(p=> new Date(p.t)), y: points.map(p=> p.p)};
+    }
+  }
+}
+
+function startPegStream(){
+  if(!window.EventSource){ refreshPegLoop(); return; }
+  const es = new EventSource(`/peg/stream?symbols=${PEG_SYMBOLS.join(',')}`);
+  const onMessage = ev => applyPegRows(JSON.parse(ev.data).data);
+  es.addEventListener('snapshot', onMessage);
+  es.addEventListener('delta', onMessage);
+  es.onerror = () => {
+    // EventSource retries on its own; fall back to polling only if it gave up
+    if(es.readyState === EventSource.CLOSED) refreshPegLoop();
+  };
+}
+
 async function loadSlippage(){
   const res = await fetch('/slippage');
   const data = await res.json();
@@ -74,6 +124,10 @@ async function loadYield(){
   if(el){
     const sign = delta >= 0 ? '+' : '';
     el.textContent = `CeFi vs DeFi spread: ${sign}${delta.toFixed(1)} bps`;
+    if(typeof data.fetched_at === 'number'){
+      const age = Math.max(0, Date.now() / 1000 - data.fetched_at);
+      el.textContent += ` · data ${Math.round(age)}s old${data.stale ? ' (stale, refreshing)' : ''}`;
+    }
   }
 }
 
@@ -86,24 +140,19 @@ async function refreshPegLoop(){
 
 window.addEventListener('DOMContentLoaded', async ()=>{
   setActive('peg');
+  try { await loadSparkHistory(); } catch(e) { console.error(e); }
   await loadPeg();
   await loadSlippage();
   await loadYield();
-  refreshPegLoop();
+  startPegStream();
   setupReplay();
   loadHeatmap();
 });
 
-async function drawSpark(symbol, venue, elId){
-  try{
-    const res = await fetch(`/peg_history?symbol=${encodeURIComponent(symbol)}&limit=60`);
-    const data = await res.json();
-    const points = (((data||{}).data||{})[symbol]||{})[venue]||[];
-    if(!points.length) return;
-    const x = points.map(p=> new Date(p.t));
-    const y = points.map(p=> p.p);
-    Plotly.newPlot(elId, [{x, y, mode:'lines', line:{color:'#9aa4bf'} }], {paper_bgcolor:'#131826', plot_bgcolor:'#131826', margin:{t:2,l:20,r:10,b:18}, xaxis:{visible:false}, yaxis:{visible:false}});
-  }catch(e){ console.error(e); }
+function drawSpark(key, elId){
+  const spark = sparkData[key];
+  if(!spark || !spark.x.length) return;
+  Plotly.newPlot(elId, [{x: spark.x, y: spark.y, mode:'lines', line:{color:'#9aa4bf'} }], {paper_bgcolor:'#131826', plot_bgcolor:'#131826', margin:{t:2,l:20,r:10,b:18}, xaxis:{visible:false}, yaxis:{visible:false}});
 }
 
 function setupReplay(){
@@ -132,10 +181,28 @@ function setupReplay(){
   });
 }
 
+// Binary columnar body (see backend/responses.py encode_columns): typed-array views, no JSON parsing
+function decodeColumns(buf){
+  const view = new DataView(buf);
+  const headerLen = view.getUint32(8, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 12, headerLen)));
+  const base = 12 + headerLen;
+  const cols = {};
+  for(const c of header.columns){
+    const Arr = c.dtype === '<f4' ? Float32Array : Float64Array;
+    const n = c.shape.reduce((a, b) => a * b, 1);
+    const flat = new Arr(buf, base + c.offset, n);
+    cols[c.name] = c.shape.length === 2
+      ? Array.from({length: c.shape[0]}, (_, i) => flat.subarray(i * c.shape[1], (i + 1) * c.shape[1]))
+      : flat;
+  }
+  return cols;
+}
+
 async function loadHeatmap(){
   try{
-    const res = await fetch('/slippage_grid');
-    const data = await res.json();
+    const res = await fetch('/slippage_grid', {headers: {'Accept': 'application/vnd.weal.columns; dtype=float32'}});
+    const data = decodeColumns(await res.arrayBuffer());
     const x = data.x_sizes_mm;
     const y = data.y_depth_multipliers;
     const z = data.z_slippage_bps;
@@ -1,4 +1,18 @@
-from typing import Dict, List
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+CURVE_CONSTANT_PRODUCT = "constant_product"
+CURVE_STABLESWAP = "stableswap"
+CURVES = (CURVE_CONSTANT_PRODUCT, CURVE_STABLESWAP)
+
+_NEWTON_MAX_ITER = 255
+_NEWTON_TOL = 1e-12
 
 
 def compute_constant_product_trade_output(reserve_in: float, reserve_out: float, amount_in: float) -> float:
@@ -13,25 +27,336 @@ def compute_constant_product_trade_output(reserve_in: float, reserve_out: float,
     return max(0.0, amount_out)
 
 
-def compute_slippage_summary(reserve_x: float, reserve_y: float, trade_sizes: List[float]) -> List[Dict[str, float]]:
-    if reserve_x <= 0 or reserve_y <= 0:
-        return []
-    mid_price = reserve_y / reserve_x
-    rows: List[Dict[str, float]] = []
-    for size in trade_sizes:
-        out = compute_constant_product_trade_output(reserve_x, reserve_y, size)
-        exec_price = out / size if size > 0 else 0.0
-        slippage = 0.0
-        if exec_price > 0:
-            slippage = (mid_price - exec_price) / mid_price * 10000.0
-        rows.append(
-            {
-                "size": float(size),
-                "out_amount": float(out),
-                "execution_price": float(exec_price),
-                "slippage_bps": float(slippage),
-            }
+def constant_product_outputs(
+    reserve_in: ArrayLike, reserve_out: ArrayLike, amounts_in: ArrayLike, fee_bps: ArrayLike = 0.0
+) -> np.ndarray:
+    """
+    Vectorized constant-product output. Arguments broadcast against each other,
+    so one call can price many sizes across many pools. The LP fee is taken
+    from the input amount, as in Uniswap v2.
+    """
+    r_in = np.asarray(reserve_in, dtype=np.float64)
+    r_out = np.asarray(reserve_out, dtype=np.float64)
+    amt = np.asarray(amounts_in, dtype=np.float64)
+    gamma = 1.0 - np.asarray(fee_bps, dtype=np.float64) / 10000.0
+    eff = amt * gamma
+    valid = (amt > 0) & (r_in > 0) & (r_out > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = r_out * eff / (r_in + eff)
+    return np.where(valid, np.maximum(out, 0.0), 0.0)
+
+
+def batch_slippage(
+    reserve_x: ArrayLike, reserve_y: ArrayLike, sizes: ArrayLike, fee_bps: ArrayLike = 0.0
+) -> Dict[str, np.ndarray]:
+    """
+    Columnar slippage for selling `sizes` of x into pools (reserve_x, reserve_y).
+    All inputs broadcast; every output array has the broadcast shape.
+    Returns {"out_amount", "execution_price", "slippage_bps"}.
+    """
+    rx = np.asarray(reserve_x, dtype=np.float64)
+    ry = np.asarray(reserve_y, dtype=np.float64)
+    size = np.asarray(sizes, dtype=np.float64)
+    out = constant_product_outputs(rx, ry, size, fee_bps)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mid = np.where(rx > 0, ry / rx, 0.0)
+        exec_price = np.where(size > 0, out / size, 0.0)
+        slippage = np.where((exec_price > 0) & (mid > 0), (mid - exec_price) / mid * 10000.0, 0.0)
+    return {"out_amount": out, "execution_price": exec_price, "slippage_bps": slippage}
+
+
+def optimal_split(
+    reserve_in: ArrayLike,
+    reserve_out: ArrayLike,
+    sizes: ArrayLike,
+    fee_bps: ArrayLike = 0.0,
+    allocations: bool = True,
+) -> Dict[str, np.ndarray]:
+    """
+    Best split of each order size across constant-product pools, selling the
+    `reserve_in` token for the `reserve_out` token.
+
+    At the optimum every pool that receives flow has the same marginal output
+    rate lambda, and pools whose spot rate gamma*y/x is below lambda get nothing.
+    With u = sqrt(x*y/gamma) and v = x/gamma, a pool's input at rate lambda is
+    u/sqrt(lambda) - v, so for the active set S the closed form is
+    1/sqrt(lambda) = (size + sum_S v) / sum_S u. Sorting pools by spot rate, the
+    size at which each pool joins is a prefix-sum expression, so every size
+    finds its active set with one searchsorted, and the total output is also
+    closed-form. Only the allocations and the single-pool comparison take an
+    S x P pass.
+
+    Returns per-size columns {"out_amount", "execution_price", "slippage_bps",
+    "marginal_price", "pools_used", "best_single_out", "improvement_bps"} and,
+    if `allocations`, the (sizes, pools) input amounts in the caller's pool order.
+    Slippage is measured against the best pool's fee-free spot price; pools
+    with non-positive reserves are skipped.
+    """
+    x = np.atleast_1d(np.asarray(reserve_in, dtype=np.float64))
+    y = np.atleast_1d(np.asarray(reserve_out, dtype=np.float64))
+    fees = np.broadcast_to(np.asarray(fee_bps, dtype=np.float64), x.shape)
+    size = np.atleast_1d(np.asarray(sizes, dtype=np.float64))
+    if x.ndim != 1 or x.shape != y.shape:
+        raise ValueError("reserve_in and reserve_out must be 1-D and the same length")
+    if np.any((fees < 0) | (fees >= 10000.0)):
+        raise ValueError("fee_bps must be in [0, 10000)")
+
+    gamma = 1.0 - fees / 10000.0
+    valid = np.flatnonzero((x > 0) & (y > 0))
+    if valid.size == 0:
+        raise ValueError("no pool has positive reserves")
+    xv, yv, gv = x[valid], y[valid], gamma[valid]
+    order = np.argsort(-(gv * yv / xv), kind="stable")  # best spot rate first
+    xs, ys, gs, fs = xv[order], yv[order], gv[order], fees[valid][order]
+    spot = gs * ys / xs
+    u = np.sqrt(xs * ys / gs)
+    v = xs / gs
+    u_pre = np.concatenate(([0.0], np.cumsum(u)))
+    v_pre = np.concatenate(([0.0], np.cumsum(v)))
+    # total size at which pool j starts receiving flow (non-decreasing, 0 for the best pool)
+    joins = u_pre[:-1] / np.sqrt(spot) - v_pre[:-1]
+    amount = np.maximum(size, 0.0)
+    active = np.maximum(np.searchsorted(joins, amount, side="left"), 1)
+    scale = (amount + v_pre[active]) / u_pre[active]  # 1 / sqrt(lambda)
+
+    # active pools end at x + gamma*a = gamma*u*scale, so each returns y - y*v/(u*scale)
+    w_pre = np.concatenate(([0.0], np.cumsum(ys * v / u)))
+    y_pre = np.concatenate(([0.0], np.cumsum(ys)))
+    out = np.where(amount > 0, y_pre[active] - w_pre[active] / scale, 0.0)
+
+    mid = float(np.max(yv / xv))
+    best_single = constant_product_outputs(xs, ys, amount[:, None], fs).max(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exec_price = np.where(amount > 0, out / amount, 0.0)
+        slippage = np.where(exec_price > 0, (mid - exec_price) / mid * 10000.0, 0.0)
+        improvement = np.where(best_single > 0, (out - best_single) / best_single * 10000.0, 0.0)
+    result = {
+        "out_amount": out,
+        "execution_price": exec_price,
+        "slippage_bps": slippage,
+        "marginal_price": np.where(amount > 0, 1.0 / (scale * scale), spot[0]),
+        "pools_used": np.where(amount > 0, active, 0),
+        "best_single_out": best_single,
+        "improvement_bps": improvement,
+    }
+    if allocations:
+        alloc = np.maximum(u[None, :] * scale[:, None] - v[None, :], 0.0)
+        alloc[np.arange(len(xs))[None, :] >= active[:, None]] = 0.0
+        alloc[amount <= 0] = 0.0
+        full = np.zeros((len(size), len(x)), dtype=np.float64)
+        full[:, valid[order]] = alloc
+        result["allocations"] = full
+    return result
+
+
+@lru_cache(maxsize=1024)
+def _stableswap_d_cached(balances: Tuple[float, ...], amp: float) -> float:
+    n = len(balances)
+    s = sum(balances)
+    if s <= 0:
+        return 0.0
+    ann = amp * n**n
+    d = s
+    for _ in range(_NEWTON_MAX_ITER):
+        d_p = d
+        for x in balances:
+            d_p = d_p * d / (x * n)
+        d_prev = d
+        d = (ann * s + d_p * n) * d / ((ann - 1.0) * d + (n + 1) * d_p)
+        if abs(d - d_prev) <= _NEWTON_TOL * d:
+            return d
+    raise ArithmeticError("StableSwap D did not converge")
+
+
+def stableswap_d(balances: Sequence[float], amp: float) -> float:
+    """
+    StableSwap invariant D for a pool state, solved by Newton's method as in
+    Curve's get_D. Results are cached per (balances, amp).
+    """
+    bal = tuple(float(b) for b in balances)
+    if len(bal) < 2 or min(bal) <= 0 or amp <= 0:
+        raise ValueError("StableSwap needs >= 2 positive balances and amp > 0")
+    return _stableswap_d_cached(bal, float(amp))
+
+
+def _stableswap_get_y(x_new: np.ndarray, others: np.ndarray, d: np.ndarray, amp: float, n: int) -> np.ndarray:
+    """
+    Vectorized Curve get_y: balance of the output coin that keeps D fixed once
+    the input coin's balance is x_new. `others` holds, per element, the sum and
+    product of the balances that are neither input nor output: shape (2, ...).
+    """
+    ann = amp * n**n
+    s_ = x_new + others[0]
+    prod = x_new * others[1]
+    c = d ** (n + 1) / (prod * n**n * ann)
+    b = s_ + d / ann
+    y = d.copy()
+    for _ in range(_NEWTON_MAX_ITER):
+        y_prev = y
+        y = (y * y + c) / (2.0 * y + b - d)
+        if np.all(np.abs(y - y_prev) <= _NEWTON_TOL * np.maximum(y, 1.0)):
+            return y
+    raise ArithmeticError("StableSwap y did not converge")
+
+
+def stableswap_slippage(
+    balances: Sequence[float],
+    amp: float,
+    sizes: ArrayLike,
+    depth_multipliers: ArrayLike = 1.0,
+    fee_bps: float = 0.0,
+    i: int = 0,
+    j: int = 1,
+) -> Dict[str, np.ndarray]:
+    """
+    Columnar slippage for selling `sizes` of coin i for coin j in a StableSwap pool.
+
+    D is solved once for the pool state (cached); scaled pools reuse it because
+    D is homogeneous of degree one in the balances. All sizes and depths are then
+    solved together in one vectorized Newton loop. The fee is charged on the
+    output, as Curve does. Output shape is broadcast(depth_multipliers, sizes).
+    """
+    bal = np.asarray(balances, dtype=np.float64)
+    n = len(bal)
+    d0 = stableswap_d(bal.tolist(), amp)
+    depth = np.asarray(depth_multipliers, dtype=np.float64)
+    size = np.asarray(sizes, dtype=np.float64)
+    shape = np.broadcast(depth, size).shape
+    depth_b = np.broadcast_to(depth, shape)
+    size_b = np.broadcast_to(size, shape)
+
+    rest = np.delete(bal, [i, j])
+    d = d0 * depth_b
+    x_new = bal[i] * depth_b + np.maximum(size_b, 0.0)
+    others = np.stack([rest.sum() * depth_b, np.prod(rest) * depth_b ** len(rest)])
+    y = _stableswap_get_y(x_new, others, d, amp, n)
+    gross = np.maximum(bal[j] * depth_b - y, 0.0)
+    out = np.where(size_b > 0, gross * (1.0 - fee_bps / 10000.0), 0.0)
+
+    # Spot price of i in units of j from the invariant's partial derivatives.
+    ann = amp * n**n
+    p = d0 ** (n + 1) / (n**n * np.prod(bal))
+    mid = (ann + p / bal[i]) / (ann + p / bal[j])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        exec_price = np.where(size_b > 0, out / size_b, 0.0)
+        slippage = np.where(exec_price > 0, (mid - exec_price) / mid * 10000.0, 0.0)
+    return {"out_amount": out, "execution_price": exec_price, "slippage_bps": slippage}
+
+
+def slippage_grid(
+    reserve_x: ArrayLike,
+    reserve_y: ArrayLike,
+    sizes: ArrayLike,
+    depth_multipliers: ArrayLike = (1.0,),
+    fee_bps: ArrayLike = 0.0,
+    curve: str = CURVE_CONSTANT_PRODUCT,
+    amp: float = 100.0,
+) -> Dict[str, np.ndarray]:
+    """
+    Size-by-depth slippage surface in one pass. Scalar reserves give arrays of
+    shape (depths, sizes); for constant product, reserve arrays of shape (pools,)
+    give (pools, depths, sizes). StableSwap takes a single two-coin pool.
+    """
+    depths = np.asarray(depth_multipliers, dtype=np.float64)
+    size = np.asarray(sizes, dtype=np.float64)
+    if curve == CURVE_STABLESWAP:
+        grid = stableswap_slippage(
+            [float(reserve_x), float(reserve_y)], amp, size[None, :], depths[:, None], float(fee_bps)
         )
-    return rows
+    elif curve == CURVE_CONSTANT_PRODUCT:
+        rx = np.asarray(reserve_x, dtype=np.float64)[..., None, None]
+        ry = np.asarray(reserve_y, dtype=np.float64)[..., None, None]
+        grid = batch_slippage(rx * depths[:, None], ry * depths[:, None], size[None, :], fee_bps)
+    else:
+        raise ValueError(f"Unknown curve type: {curve}")
+    grid["sizes"] = size
+    grid["depth_multipliers"] = depths
+    return grid
 
 
+_GRIDS: "OrderedDict[Tuple[object, ...], Dict[str, np.ndarray]]" = OrderedDict()
+_GRIDS_MAX_BYTES = 128 * 1024 * 1024
+_GRIDS_LOCK = threading.Lock()
+_grid_stats = {"hits": 0, "misses": 0, "bytes": 0}
+
+
+def cached_slippage_grid(
+    reserve_x: float,
+    reserve_y: float,
+    depth_multipliers: Sequence[float],
+    max_size: float,
+    points: int,
+    fee_bps: float = 0.0,
+    curve: str = CURVE_CONSTANT_PRODUCT,
+    amp: float = 100.0,
+) -> Dict[str, np.ndarray]:
+    """
+    slippage_grid over `points` evenly spaced sizes in (0, max_size], memoized on
+    the normalized inputs in an LRU bounded by total array bytes. Only the
+    sizes, depth_multipliers and slippage_bps arrays are kept; they are shared
+    between callers and read-only.
+    """
+    depths = tuple(float(d) for d in depth_multipliers)
+    key = (
+        float(reserve_x), float(reserve_y), depths, float(max_size), int(points), float(fee_bps), curve,
+        float(amp) if curve == CURVE_STABLESWAP else None,
+    )
+    with _GRIDS_LOCK:
+        grid = _GRIDS.get(key)
+        if grid is not None:
+            _GRIDS.move_to_end(key)
+            _grid_stats["hits"] += 1
+            return grid
+        _grid_stats["misses"] += 1
+    sizes = np.arange(1, points + 1, dtype=np.float64) * (float(max_size) / points)
+    full = slippage_grid(reserve_x, reserve_y, sizes, depths, fee_bps, curve, amp)
+    grid = {name: full[name] for name in ("sizes", "depth_multipliers", "slippage_bps")}
+    for arr in grid.values():
+        arr.flags.writeable = False
+    nbytes = sum(arr.nbytes for arr in grid.values())
+    if nbytes <= _GRIDS_MAX_BYTES:
+        with _GRIDS_LOCK:
+            if key not in _GRIDS:
+                _GRIDS[key] = grid
+                _grid_stats["bytes"] += nbytes
+                while _grid_stats["bytes"] > _GRIDS_MAX_BYTES:
+                    _, old = _GRIDS.popitem(last=False)
+                    _grid_stats["bytes"] -= sum(arr.nbytes for arr in old.values())
+    return grid
+
+
+def grid_cache_stats() -> Dict[str, int]:
+    with _GRIDS_LOCK:
+        return {**_grid_stats, "entries": len(_GRIDS)}
+
+
+def compute_slippage_summary(
+    reserve_x: float,
+    reserve_y: float,
+    trade_sizes: List[float],
+    fee_bps: float = 0.0,
+    curve: str = CURVE_CONSTANT_PRODUCT,
+    amp: float = 100.0,
+) -> List[Dict[str, float]]:
+    if reserve_x <= 0 or reserve_y <= 0:
+        return []
+    if curve == CURVE_STABLESWAP:
+        cols = stableswap_slippage([reserve_x, reserve_y], amp, trade_sizes, fee_bps=fee_bps)
+    elif curve == CURVE_CONSTANT_PRODUCT:
+        cols = batch_slippage(reserve_x, reserve_y, trade_sizes, fee_bps)
+    else:
+        raise ValueError(f"Unknown curve type: {curve}")
+    return [
+        {
+            "size": float(size),
+            "out_amount": out,
+            "execution_price": price,
+            "slippage_bps": slip,
+        }
+        for size, out, price, slip in zip(
+            trade_sizes,
+            cols["out_amount"].tolist(),
+            cols["execution_price"].tolist(),
+            cols["slippage_bps"].tolist(),
+        )
+    ]
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class CachedValue:
+    value: Any
+    fetched_at: float
+    stale: bool
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Async cache for upstream market data.
+
+    - Fresh entries (younger than `ttl`) are returned as-is.
+    - Expired entries are returned immediately, marked stale, while one
+      background task per key reloads them.
+    - A failed reload keeps serving the last good value.
+    - Every successful load is written to `snapshot_path` (JSON), and the file
+      is read back on construction so a restart can serve data right away.
+    - With `follow` set, the cache never calls its loader: it re-reads the
+      snapshot file whenever another process has rewritten it, so several
+      processes can share one upstream fetcher.
+    """
+
+    def __init__(self, ttl: float, snapshot_path: Optional[Path] = None, follow: bool = False):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.follow = follow
+        self._snapshot_mtime = 0
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self.last_errors: Dict[str, str] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._load_snapshot()
+
+    async def get(self, key: str, loader: Loader) -> CachedValue:
+        if self.follow:
+            return self._follow(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            # Cold miss: nothing to serve, so callers wait on one shared load.
+            self.misses += 1
+            await asyncio.shield(self.revalidate(key, loader))
+            entry = self._entries[key]
+            return CachedValue(entry["value"], entry["fetched_at"], stale=False)
+        stale = time.time() - entry["fetched_at"] > self.ttl
+        if stale:
+            self.stale_hits += 1
+            self.revalidate(key, loader)
+        else:
+            self.hits += 1
+        return CachedValue(entry["value"], entry["fetched_at"], stale=stale)
+
+    def _follow(self, key: str) -> CachedValue:
+        try:
+            mtime = self.snapshot_path.stat().st_mtime_ns if self.snapshot_path is not None else 0
+        except OSError:
+            mtime = 0
+        if mtime != self._snapshot_mtime:
+            self._snapshot_mtime = mtime
+            self._load_snapshot()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            raise LookupError(f"No snapshot of {key!r} yet")
+        stale = time.time() - entry["fetched_at"] > self.ttl
+        if stale:
+            self.stale_hits += 1
+        else:
+            self.hits += 1
+        return CachedValue(entry["value"], entry["fetched_at"], stale=stale)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses, "entries": len(self._entries)}
+
+    def peek(self, key: str) -> Optional[CachedValue]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stale = time.time() - entry["fetched_at"] > self.ttl
+        return CachedValue(entry["value"], entry["fetched_at"], stale=stale)
+
+    def revalidate(self, key: str, loader: Loader) -> asyncio.Task:
+        """Start a background reload of `key` unless one is already running."""
+        task = self._refreshing.get(key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._refresh(key, loader))
+            # errors are recorded in last_errors; a stale value stays in place
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._refreshing[key] = task
+        return task
+
+    async def _refresh(self, key: str, loader: Loader) -> None:
+        try:
+            value = await loader()
+        except Exception as exc:
+            self.last_errors[key] = f"{type(exc).__name__}: {exc}"
+            raise
+        self._entries[key] = {"value": value, "fetched_at": time.time()}
+        self.last_errors.pop(key, None)
+        self._save_snapshot()
+
+    def _load_snapshot(self) -> None:
+        if self.snapshot_path is None or not self.snapshot_path.exists():
+            return
+        try:
+            data = json.loads(self.snapshot_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        for key, entry in data.items():
+            if isinstance(entry, dict) and "value" in entry and isinstance(entry.get("fetched_at"), (int, float)):
+                self._entries[key] = {"value": entry["value"], "fetched_at": float(entry["fetched_at"])}
+
+    def _save_snapshot(self) -> None:
+        if self.snapshot_path is None:
+            return
+        tmp = self.snapshot_path.with_suffix(self.snapshot_path.suffix + ".tmp")
+        try:
+            self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(self._entries), encoding="utf-8")
+            os.replace(tmp, self.snapshot_path)
+        except OSError:
+            pass  # disk warm start is best-effort
@@ -1,15 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import math
+import os
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from typing import Dict, List, Tuple
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 import httpx
 
+from lib.metrics import REGISTRY
+from lib.pools import PoolFilter, PoolIndex, PoolStreamParser, iter_pools, keep_stablecoin_pools
 
-COINS_BASE = "https://coins.llama.fi"
-YIELDS_BASE = "https://yields.llama.fi"
-STABLECOINS_BASE = "https://stablecoins.llama.fi"
+
+# Overridable so tests and load runs can point at a local stand-in (python -m bench.standin)
+COINS_BASE = os.environ.get("COINS_BASE", "https://coins.llama.fi").rstrip("/")
+YIELDS_BASE = os.environ.get("YIELDS_BASE", "https://yields.llama.fi").rstrip("/")
+STABLECOINS_BASE = os.environ.get("STABLECOINS_BASE", "https://stablecoins.llama.fi").rstrip("/")
 
 
 SYMBOL_TO_COINGECKO: Dict[str, str] = {
@@ -18,32 +28,152 @@ SYMBOL_TO_COINGECKO: Dict[str, str] = {
     "DAI": "dai",
 }
 
+# Coins per /prices/current request when tracking many symbols
+_COINS_BATCH = 100
+
+# Shared pool limits: a handful of keep-alive connections per host is plenty
+# for three upstream hosts, and caps fan-out when many requests land at once.
+_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=30.0)
+
 
 def _now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
-def fetch_current_prices(symbols: List[str]) -> Dict[str, Dict[str, float]]:
+class _SingleFlight:
     """
-    Fetch current prices using DefiLlama coins API via coingecko IDs.
-    Returns mapping: symbol -> {price: float, timestamp: int}.
+    Coalesce concurrent async calls by key: the first caller starts the work,
+    later callers await the same in-flight task instead of issuing their own.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._forget(k, t))
+        # shield so one cancelled waiter does not cancel the shared request
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved; waiters re-raise it themselves
+
+
+_SINGLE_FLIGHT = _SingleFlight()
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_client: Optional[httpx.Client] = None
+_sync_client_lock = threading.Lock()
+_POOL_INDEX: Optional[PoolIndex] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the shared AsyncClient for the running event loop, creating it on
+    first use. A client is bound to one loop, so a new loop gets a new pool.
     """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(limits=_LIMITS, timeout=10.0)
+        _async_client_loop = loop
+    return _async_client
+
+
+def get_sync_client() -> httpx.Client:
+    global _sync_client
+    with _sync_client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(limits=_LIMITS, timeout=10.0)
+        return _sync_client
+
+
+async def aclose_clients() -> None:
+    """Close pooled connections; call from app shutdown."""
+    global _async_client, _sync_client
+    if _async_client is not None and _async_client_loop is asyncio.get_running_loop():
+        await _async_client.aclose()
+    _async_client = None
+    with _sync_client_lock:
+        if _sync_client is not None:
+            _sync_client.close()
+        _sync_client = None
+
+
+_UPSTREAM_SECONDS = REGISTRY.histogram(
+    "weal_upstream_request_seconds", "DefiLlama request duration, body included", ["host", "outcome"]
+)
+_UPSTREAM_ERRORS = REGISTRY.counter("weal_upstream_errors", "Failed DefiLlama requests", ["host", "kind"])
+
+
+def _error_kind(exc: BaseException) -> str:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return f"http_{exc.response.status_code}"
+    if isinstance(exc, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(exc, httpx.TransportError):
+        return "transport"
+    return type(exc).__name__
+
+
+@contextmanager
+def _upstream(url: str) -> Iterator[None]:
+    """Time one upstream round trip and count its failures, per host."""
+    host = urlsplit(url).hostname or "unknown"
+    t0 = time.perf_counter()
+    try:
+        yield
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        # a hedge or deadline gave up on it: not the host's fault
+        _UPSTREAM_SECONDS.labels(host, "cancelled").observe(time.perf_counter() - t0)
+        raise
+    except Exception as exc:
+        _UPSTREAM_SECONDS.labels(host, "error").observe(time.perf_counter() - t0)
+        _UPSTREAM_ERRORS.labels(host, _error_kind(exc)).inc()
+        raise
+    _UPSTREAM_SECONDS.labels(host, "ok").observe(time.perf_counter() - t0)
+
+
+async def _aget_json(url: str, timeout: float, coalesce: bool = True) -> Any:
+    async def _fetch() -> Any:
+        with _upstream(url):
+            r = await get_async_client().get(url, timeout=timeout)
+            r.raise_for_status()
+            return r.json()
+
+    if not coalesce:  # hedged requests need their own round trip
+        return await _fetch()
+    return await _SINGLE_FLIGHT.do(url, _fetch)
+
+
+def _get_json(url: str, timeout: float) -> Any:
+    with _upstream(url):
+        r = get_sync_client().get(url, timeout=timeout)
+        r.raise_for_status()
+        return r.json()
+
+
+def _coins_urls(symbols: List[str]) -> List[str]:
+    """One /prices/current URL per batch of coins, keeping URLs a sane length."""
     tokens: List[str] = []
     for s in symbols:
         cid = SYMBOL_TO_COINGECKO.get(s.upper())
         if cid:
             tokens.append(f"coingecko:{cid}")
+    return [
+        f"{COINS_BASE}/prices/current/{','.join(tokens[i:i + _COINS_BATCH])}"
+        for i in range(0, len(tokens), _COINS_BATCH)
+    ]
 
-    if not tokens:
-        return {}
-
-    coins_param = ",".join(tokens)
-    url = f"{COINS_BASE}/prices/current/{coins_param}"
-    with httpx.Client(timeout=5.0) as client:
-        r = client.get(url)
-        r.raise_for_status()
-        data = r.json().get("coins", {})
 
+def _parse_current_prices(body: Dict[str, Any], symbols: List[str]) -> Dict[str, Dict[str, float]]:
+    data = body.get("coins", {})
     result: Dict[str, Dict[str, float]] = {}
     for s in symbols:
         cid = SYMBOL_TO_COINGECKO.get(s.upper())
@@ -59,37 +189,61 @@ def fetch_current_prices(symbols: List[str]) -> Dict[str, Dict[str, float]]:
     return result
 
 
-def fetch_stablecoin_prices(symbols: List[str]) -> Dict[str, float]:
-    """
-    Alternate source: /stablecoins?includePrices=true, aggregate price per symbol.
-    Returns mapping symbol -> price (float) if available.
-    """
-    url = f"{STABLECOINS_BASE}/stablecoins?includePrices=true"
-    with httpx.Client(timeout=8.0) as client:
-        r = client.get(url)
-        r.raise_for_status()
-        body = r.json()
+def _parse_stablecoin_prices(body: Dict[str, Any], symbols: List[str]) -> Dict[str, float]:
+    wanted = {s.upper() for s in symbols}
     out: Dict[str, float] = {}
     for asset in body.get("peggedAssets", []):
         sym = str(asset.get("symbol", "")).upper()
-        if sym in {s.upper() for s in symbols}:
+        if sym in wanted:
             price = asset.get("price")
             if isinstance(price, (int, float)):
                 out[sym] = float(price)
     return out
 
 
-def fetch_usdc_lending_anchors() -> Dict[str, Dict[str, List[float]]]:
+def parse_stablecoin_ids(body: Dict[str, Any], peg_type: str = "peggedUSD", limit: Optional[int] = None) -> Dict[str, str]:
     """
-    Fetch current USDC APYs for a few lending platforms from /pools.
-    Returns anchors dict like { platform: { days: [1,7,30], rates: [apy, apy, apy] } }.
+    Symbol -> coingecko id for every pegged asset of `peg_type` listed by
+    /stablecoins, largest circulating supply first. When several assets share
+    a symbol the largest one wins.
     """
-    url = f"{YIELDS_BASE}/pools"
-    with httpx.Client(timeout=10.0) as client:
-        r = client.get(url)
-        r.raise_for_status()
-        data = r.json().get("data", [])
+    ranked: List[Tuple[float, str, str]] = []
+    for asset in body.get("peggedAssets", []):
+        sym = str(asset.get("symbol") or "").upper()
+        gecko_id = asset.get("gecko_id")
+        if not sym or not gecko_id or asset.get("pegType") != peg_type:
+            continue
+        circulating = (asset.get("circulating") or {}).get(peg_type)
+        ranked.append((float(circulating) if isinstance(circulating, (int, float)) else 0.0, sym, str(gecko_id)))
+    ranked.sort(key=lambda r: r[0], reverse=True)
+    out: Dict[str, str] = {}
+    for _, sym, gecko_id in ranked:
+        if sym not in out:
+            out[sym] = gecko_id
+            if limit is not None and len(out) >= limit:
+                break
+    return out
+
+
+def register_coingecko_ids(mapping: Dict[str, str]) -> List[str]:
+    """Add discovered ids to SYMBOL_TO_COINGECKO (existing entries win). Returns new symbols."""
+    added: List[str] = []
+    for sym, gecko_id in mapping.items():
+        sym = sym.upper()
+        if sym not in SYMBOL_TO_COINGECKO:
+            SYMBOL_TO_COINGECKO[sym] = gecko_id
+            added.append(sym)
+    return added
+
 
+def usdc_lending_anchors(index: PoolIndex) -> Dict[str, Dict[str, List[float]]]:
+    """
+    Pick USDC supply APYs for a few lending platforms out of a pool index.
+    Returns anchors dict like { platform: { days: [1, 7, 30], rates: [apy, apy_mean_7d, apy_mean_30d] } }:
+    the current APY anchors the short end, the 7-day mean (estimated from the
+    7-day APY change, assuming linear drift) the 7d tenor and the 30-day mean
+    the 30d tenor. A tenor is omitted when DefiLlama has no data for it.
+    """
     # Preferred projects and synonyms
     preferred = {
         "aave": "Aave",
@@ -98,27 +252,131 @@ def fetch_usdc_lending_anchors() -> Dict[str, Dict[str, List[float]]]:
         "compound-v3": "Compound V3",
     }
 
-    # Filter for USDC supply/lend pools on main chains and select top by TVL
-    candidates: Dict[str, Tuple[float, float]] = {}  # display -> (apy, tvl)
-    for p in data:
-        symbol = str(p.get("symbol", "")).upper()
-        if symbol != "USDC":
-            continue
-        project = str(p.get("project", "")).lower()
-        display = preferred.get(project)
-        if not display:
-            continue
-        apy = p.get("apy") or p.get("apyBase")
-        tvl = p.get("tvlUsd", 0.0)
-        if isinstance(apy, (int, float)) and isinstance(tvl, (int, float)):
+    # Select the top-TVL USDC pool per platform
+    candidates: Dict[str, Tuple[float, float, float, float]] = {}  # display -> (apy, apy_mean_7d, apy_mean_30d, tvl)
+    for project, display in preferred.items():
+        for i in index.query(symbol="USDC", project=project):
+            apy = index.apy[i]
+            if not apy or math.isnan(apy):
+                apy = index.apy_base[i]
+            tvl = index.tvl_usd[i]
+            if math.isnan(apy) or math.isnan(tvl):
+                continue
             # Keep the highest TVL instance per display name
             prev = candidates.get(display)
-            if prev is None or tvl > prev[1]:
-                candidates[display] = (float(apy), float(tvl))
+            if prev is None or tvl > prev[3]:
+                mean_7d = apy - index.apy_pct_7d[i] / 2.0  # NaN when the change is unknown
+                candidates[display] = (float(apy), float(mean_7d), float(index.apy_mean_30d[i]), float(tvl))
 
     anchors: Dict[str, Dict[str, List[float]]] = {}
-    for display, (apy, _tvl) in candidates.items():
-        anchors[display] = {"days": [1, 7, 30], "rates": [float(apy), float(apy), float(apy)]}
+    for display, (apy, mean_7d, mean_30d, _tvl) in candidates.items():
+        days, rates = [1], [apy]
+        for tenor, rate in ((7, mean_7d), (30, mean_30d)):
+            if not math.isnan(rate):
+                days.append(tenor)
+                rates.append(rate)
+        anchors[display] = {"days": days, "rates": rates}
     return anchors
 
 
+def latest_pool_index() -> Optional[PoolIndex]:
+    """Most recent default (stablecoin) pool index, if any; query it without refetching."""
+    return _POOL_INDEX
+
+
+def _set_pool_index(index: PoolIndex) -> PoolIndex:
+    global _POOL_INDEX
+    _POOL_INDEX = index
+    return index
+
+
+async def afetch_pool_index(keep: PoolFilter = keep_stablecoin_pools) -> PoolIndex:
+    """
+    Stream /pools and index the pools accepted by `keep` (stablecoin pools by default).
+    Concurrent callers share one download.
+    """
+    url = f"{YIELDS_BASE}/pools"
+
+    async def _fetch() -> PoolIndex:
+        parser = PoolStreamParser()
+        index = PoolIndex(fetched_at=time.time())
+        with _upstream(url):
+            async with get_async_client().stream("GET", url, timeout=10.0) as r:
+                r.raise_for_status()
+                async for chunk in r.aiter_text():
+                    for pool in parser.feed(chunk):
+                        if keep(pool):
+                            index.add(pool)
+        parser.close()
+        return _set_pool_index(index) if keep is keep_stablecoin_pools else index
+
+    # keyed on the filter object itself: distinct filters never share a download
+    return await _SINGLE_FLIGHT.do((url, keep), _fetch)
+
+
+def fetch_pool_index(keep: PoolFilter = keep_stablecoin_pools) -> PoolIndex:
+    """Blocking variant of afetch_pool_index on the shared sync pool."""
+    index = PoolIndex(fetched_at=time.time())
+    url = f"{YIELDS_BASE}/pools"
+    with _upstream(url), get_sync_client().stream("GET", url, timeout=10.0) as r:
+        r.raise_for_status()
+        for pool in iter_pools(r.iter_text(), keep):
+            index.add(pool)
+    return _set_pool_index(index) if keep is keep_stablecoin_pools else index
+
+
+async def afetch_current_prices(
+    symbols: List[str], timeout: float = 5.0, coalesce: bool = True
+) -> Dict[str, Dict[str, float]]:
+    """
+    Fetch current prices using DefiLlama coins API via coingecko IDs.
+    Returns mapping: symbol -> {price: float, timestamp: int}.
+    """
+    bodies = await asyncio.gather(*(_aget_json(url, timeout=timeout, coalesce=coalesce) for url in _coins_urls(symbols)))
+    result: Dict[str, Dict[str, float]] = {}
+    for body in bodies:
+        result.update(_parse_current_prices(body, symbols))
+    return result
+
+
+async def afetch_stablecoin_prices(symbols: List[str], timeout: float = 8.0, coalesce: bool = True) -> Dict[str, float]:
+    """
+    Alternate source: /stablecoins?includePrices=true, aggregate price per symbol.
+    Returns mapping symbol -> price (float) if available.
+    """
+    url = f"{STABLECOINS_BASE}/stablecoins?includePrices=true"
+    return _parse_stablecoin_prices(await _aget_json(url, timeout=timeout, coalesce=coalesce), symbols)
+
+
+async def afetch_stablecoin_ids(limit: Optional[int] = None) -> Dict[str, str]:
+    """Discover USD-pegged symbols and their coingecko ids from /stablecoins."""
+    url = f"{STABLECOINS_BASE}/stablecoins?includePrices=true"
+    return parse_stablecoin_ids(await _aget_json(url, timeout=8.0), limit=limit)
+
+
+async def afetch_usdc_lending_anchors() -> Dict[str, Dict[str, List[float]]]:
+    """
+    Fetch current USDC APYs for a few lending platforms from /pools.
+    Returns anchors dict like { platform: { days: [1, 7, 30], rates: [apy, apy_mean_7d, apy_mean_30d] } }
+    (see usdc_lending_anchors).
+    """
+    return usdc_lending_anchors(await afetch_pool_index())
+
+
+def fetch_current_prices(symbols: List[str]) -> Dict[str, Dict[str, float]]:
+    """Blocking variant of afetch_current_prices on the shared sync pool."""
+    result: Dict[str, Dict[str, float]] = {}
+    for url in _coins_urls(symbols):
+        result.update(_parse_current_prices(_get_json(url, timeout=5.0), symbols))
+    return result
+
+
+def fetch_stablecoin_prices(symbols: List[str]) -> Dict[str, float]:
+    """Blocking variant of afetch_stablecoin_prices on the shared sync pool."""
+    url = f"{STABLECOINS_BASE}/stablecoins?includePrices=true"
+    return _parse_stablecoin_prices(_get_json(url, timeout=8.0), symbols)
+
+
+def fetch_usdc_lending_anchors() -> Dict[str, Dict[str, List[float]]]:
+    """Blocking variant of afetch_usdc_lending_anchors on the shared sync pool."""
+    return usdc_lending_anchors(fetch_pool_index())
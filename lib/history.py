@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+# 2 days of 1-second ticks: ~2 MB per series (float64 epoch + float32 price).
+DEFAULT_CAPACITY = 2 * 24 * 3600
+_INITIAL_ALLOC = 1024
+
+
+class TickRing:
+    """
+    Fixed-capacity ring buffer of (epoch seconds, price) ticks backed by typed arrays.
+    Storage grows geometrically until it reaches `capacity`, then the oldest ticks
+    are overwritten. Timestamps are expected to be non-decreasing.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("capacity must be >= 1")
+        self.capacity = capacity
+        alloc = min(capacity, _INITIAL_ALLOC)
+        self._ts = np.empty(alloc, dtype=np.float64)
+        self._px = np.empty(alloc, dtype=np.float32)
+        self._count = 0  # total ticks ever appended
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        return self._ts.nbytes + self._px.nbytes
+
+    def append(self, ts: float, price: float) -> None:
+        n = self._count
+        if n < self.capacity:
+            if n == len(self._ts):
+                self._grow()
+            pos = n
+        else:
+            pos = n % self.capacity
+        self._ts[pos] = ts
+        self._px[pos] = price
+        self._count = n + 1
+
+    def extend(self, ts: np.ndarray, prices: np.ndarray) -> None:
+        """Bulk append in time order; only the newest `capacity` ticks are kept."""
+        ts = np.asarray(ts, dtype=np.float64)[-self.capacity:]
+        prices = np.asarray(prices)[-self.capacity:]
+        m = len(ts)
+        if m == 0:
+            return
+        need = min(self.capacity, self._count + m)
+        if need > len(self._ts):
+            self._grow(need)
+        pos = (self._count + np.arange(m)) % self.capacity
+        self._ts[pos] = ts
+        self._px[pos] = prices
+        self._count += m
+
+    def _grow(self, at_least: int = 0) -> None:
+        alloc = min(self.capacity, max(len(self._ts) * 2, at_least))
+        ts = np.empty(alloc, dtype=np.float64)
+        px = np.empty(alloc, dtype=np.float32)
+        n = self._count
+        ts[:n] = self._ts[:n]
+        px[:n] = self._px[:n]
+        self._ts, self._px = ts, px
+
+    def _segments(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Views of the stored ticks in chronological order (one or two pieces)."""
+        n = self._count
+        if n <= self.capacity:
+            return [(self._ts[:n], self._px[:n])]
+        head = n % self.capacity
+        return [(self._ts[head:], self._px[head:]), (self._ts[:head], self._px[:head])]
+
+    def oldest(self) -> Optional[float]:
+        if self._count == 0:
+            return None
+        return float(self._segments()[0][0][0])
+
+    def range(self, since: Optional[float] = None, until: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the ticks with since <= t <= until, oldest first."""
+        ts_parts: List[np.ndarray] = []
+        px_parts: List[np.ndarray] = []
+        for ts, px in self._segments():
+            lo = 0 if since is None else int(np.searchsorted(ts, since, side="left"))
+            hi = len(ts) if until is None else int(np.searchsorted(ts, until, side="right"))
+            if hi > lo:
+                ts_parts.append(ts[lo:hi])
+                px_parts.append(px[lo:hi])
+        if not ts_parts:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+        return np.concatenate(ts_parts), np.concatenate(px_parts)
+
+    def last(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        ts, px = self.range()
+        return ts[-n:], px[-n:]
+
+    @property
+    def total(self) -> int:
+        """Ticks ever appended; a cursor for since()."""
+        return self._count
+
+    def since(self, start: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the ticks appended after the first `start` (those still held)."""
+        start = max(start, self._count - self.capacity)
+        pos = np.arange(start, self._count) % self.capacity
+        return self._ts[pos], self._px[pos]
+
+
+class HistoryStore:
+    """
+    Thread-safe map of series key -> TickRing, created on first append.
+    `capacity_for(key)` sizes each new ring (default: `capacity` for all), so
+    a few important series can keep long history while the rest stay small.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, capacity_for: Optional[Callable[[Hashable], int]] = None):
+        self.capacity = capacity
+        self.capacity_for = capacity_for
+        self._rings: Dict[Hashable, TickRing] = {}
+        self._lock = threading.Lock()
+        self.version = 0  # bumped on every write
+
+    def _ring(self, key: Hashable) -> TickRing:
+        ring = self._rings.get(key)
+        if ring is None:
+            capacity = self.capacity if self.capacity_for is None else self.capacity_for(key)
+            ring = self._rings[key] = TickRing(capacity)
+        return ring
+
+    def append(self, key: Hashable, ts: float, price: float) -> None:
+        with self._lock:
+            self._ring(key).append(ts, price)
+            self.version += 1
+
+    def append_many(self, ts: float, items: Iterable[Tuple[Hashable, float]]) -> None:
+        with self._lock:
+            for key, price in items:
+                self._ring(key).append(ts, price)
+            self.version += 1
+
+    def extend(self, key: Hashable, ts: np.ndarray, prices: np.ndarray) -> None:
+        with self._lock:
+            self._ring(key).extend(ts, prices)
+            self.version += 1
+
+    def oldest(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            ring = self._rings.get(key)
+            return None if ring is None else ring.oldest()
+
+    def query(
+        self,
+        key: Hashable,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+            ts, px = ring.range(since, until)
+        if limit is not None:
+            ts, px = ts[-limit:], px[-limit:]
+        return ts, px
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._rings)
+
+    def ticks_since(
+        self,
+        cursor: Dict[Hashable, int],
+        limit: Optional[int] = None,
+        keys: Optional[Iterable[Hashable]] = None,
+    ) -> List[Tuple[Hashable, np.ndarray, np.ndarray]]:
+        """
+        New ticks per series since `cursor` (key -> ticks seen, updated in place),
+        at most the newest `limit` per series. `keys` limits the scan to those series.
+        """
+        out = []
+        with self._lock:
+            if keys is None:
+                rings = list(self._rings.items())
+            else:
+                rings = [(k, self._rings[k]) for k in keys if k in self._rings]
+            for key, ring in rings:
+                seen = cursor.get(key, 0)
+                if ring.total == seen:
+                    continue
+                start = seen if limit is None else max(seen, ring.total - limit)
+                ts, px = ring.since(start)
+                cursor[key] = ring.total
+                out.append((key, ts, px))
+        return out
+
+    def fill_levels(self) -> Dict[Hashable, float]:
+        with self._lock:
+            return {k: len(r) / r.capacity for k, r in self._rings.items()}
+
+
+def downsample_minmax(ts: np.ndarray, px: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the min and max tick of each of n_out // 2 equal-count buckets, in time
+    order. Preserves spikes exactly, which matters for depeg charts.
+    """
+    n = len(ts)
+    buckets = max(1, n_out // 2)
+    if n <= n_out or buckets >= n:
+        return ts, px
+    width = -(-n // buckets)  # ceil
+    padded = np.full(buckets * width, np.nan, dtype=np.float64)
+    padded[:n] = px
+    grid = padded.reshape(buckets, width)
+    used = np.arange(buckets) * width < n
+    grid = grid[used]
+    base = np.arange(len(grid)) * width
+    lo = base + np.nanargmin(grid, axis=1)
+    hi = base + np.nanargmax(grid, axis=1)
+    idx = np.unique(np.concatenate([lo, hi]))
+    return ts[idx], px[idx]
+
+
+def downsample_lttb(ts: np.ndarray, px: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Largest-Triangle-Three-Buckets: n_out points that keep the visual shape."""
+    n = len(ts)
+    if n_out >= n or n_out < 3:
+        return ts, px
+    x = ts - ts[0]  # keep areas well-conditioned for epoch-sized values
+    y = px.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0] = 0
+    idx[-1] = n - 1
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nxt_lo, nxt_hi = edges[b + 1], edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = x[nxt_lo:nxt_hi].mean()
+        avg_y = y[nxt_lo:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[b + 1] = a
+    return ts[idx], px[idx]
+
+
+DOWNSAMPLERS = {"lttb": downsample_lttb, "minmax": downsample_minmax}
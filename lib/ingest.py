@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from lib.defillama import afetch_current_prices, afetch_stablecoin_prices
+
+
+# fetch(symbols, timeout, coalesce) -> {symbol: price}
+Fetcher = Callable[[List[str], float, bool], Awaitable[Dict[str, float]]]
+Quotes = Dict[Tuple[str, str], float]
+
+
+@dataclass
+class SourceHealth:
+    successes: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    hedges: int = 0
+    last_latency: Optional[float] = None
+    last_success_at: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "successes": self.successes,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "last_latency_ms": None if self.last_latency is None else round(self.last_latency * 1000.0, 3),
+            "last_success_at": self.last_success_at,
+            "last_error": self.last_error,
+        }
+
+
+@dataclass
+class PriceSource:
+    """
+    One upstream feed, reported as its own venue.
+
+    `timeout` bounds the whole fetch including any hedge. If the first request
+    has not answered after `hedge_after` seconds a second, independent request
+    is sent and whichever returns first wins. `min_interval` throttles heavy
+    feeds: between refreshes the source is skipped and the store keeps its
+    last quote.
+    """
+
+    venue: str
+    fetch: Fetcher
+    timeout: float = 1.5
+    hedge_after: Optional[float] = 0.4
+    min_interval: float = 0.0
+    health: SourceHealth = field(default_factory=SourceHealth)
+
+
+async def _coins_fetch(symbols: List[str], timeout: float, coalesce: bool) -> Dict[str, float]:
+    rows = await afetch_current_prices(symbols, timeout=timeout, coalesce=coalesce)
+    return {s: row["price"] for s, row in rows.items()}
+
+
+async def _stablecoins_fetch(symbols: List[str], timeout: float, coalesce: bool) -> Dict[str, float]:
+    return await afetch_stablecoin_prices(symbols, timeout=timeout, coalesce=coalesce)
+
+
+def default_sources() -> List[PriceSource]:
+    return [
+        PriceSource("DefiLlama", _coins_fetch, timeout=1.5, hedge_after=0.4),
+        # /stablecoins is a multi-MB payload that updates slowly: poll it once a minute
+        PriceSource("DefiLlama Stables", _stablecoins_fetch, timeout=2.5, hedge_after=1.0, min_interval=60.0),
+    ]
+
+
+async def _hedged(source: PriceSource, symbols: List[str]) -> Dict[str, float]:
+    tasks = [asyncio.ensure_future(source.fetch(symbols, source.timeout, False))]
+    try:
+        if source.hedge_after is not None:
+            done, _ = await asyncio.wait(tasks, timeout=source.hedge_after)
+            if not done:
+                source.health.hedges += 1
+                tasks.append(asyncio.ensure_future(source.fetch(symbols, source.timeout, False)))
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        assert error is not None
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+class PriceIngestor:
+    """
+    Fetches every configured source concurrently on each tick and merges the
+    answers into per-venue quotes. Each source runs under its own timeout, so a
+    slow or failing one is dropped for that tick without holding up the rest.
+    """
+
+    def __init__(self, sources: List[PriceSource], symbols: List[str]):
+        self.sources = sources
+        self.symbols = symbols
+
+    @property
+    def venues(self) -> List[str]:
+        return [s.venue for s in self.sources]
+
+    async def _run_source(self, source: PriceSource) -> Quotes:
+        health = source.health
+        t0 = time.perf_counter()
+        try:
+            prices = await asyncio.wait_for(_hedged(source, self.symbols), timeout=source.timeout)
+        except asyncio.TimeoutError:
+            health.timeouts += 1
+            health.last_error = f"timeout after {source.timeout:.2f}s"
+            return {}
+        except Exception as exc:
+            health.failures += 1
+            health.last_error = f"{type(exc).__name__}: {exc}"
+            return {}
+        health.successes += 1
+        health.last_latency = time.perf_counter() - t0
+        health.last_success_at = time.time()
+        health.last_error = None
+        return {(source.venue, sym): float(p) for sym, p in prices.items() if p}
+
+    async def tick(self) -> Quotes:
+        now = time.time()
+        due = [
+            s
+            for s in self.sources
+            if not s.min_interval or s.health.last_success_at is None or now - s.health.last_success_at >= s.min_interval
+        ]
+        quotes: Quotes = {}
+        for result in await asyncio.gather(*(self._run_source(s) for s in due)):
+            quotes.update(result)
+        return quotes
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        return {s.venue: s.health.as_dict() for s in self.sources}
@@ -1,68 +1,271 @@
-import random
-import threading
 import time
+from dataclasses import dataclass, field
 from datetime import datetime, timezone
-from typing import Dict, List, Tuple
+from functools import cached_property
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.metrics import LOCK_BUCKETS, REGISTRY, TimedLock
 
 Stablecoin = str
 Venue = str
+Key = Tuple[Venue, Stablecoin]
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat()
+
+
+def _frozen(a: np.ndarray) -> np.ndarray:
+    a.flags.writeable = False
+    return a
+
+
+@dataclass(frozen=True, eq=False)
+class PegSnapshot:
+    """
+    Immutable view of every price at one version, shared by all readers.
+
+    Prices live in a venue × symbol matrix (NaN where a venue has no quote);
+    the per-key mappings and the JSON-ready `rows` served by /peg are derived
+    lazily, once per version, and must be treated as read-only.
+    """
+
+    version: int
+    updated_at: float
+    venues: Tuple[Venue, ...]
+    symbols: Tuple[Stablecoin, ...]
+    price_matrix: np.ndarray  # float64, shape (len(venues), len(symbols))
+    ts_matrix: np.ndarray
+    _venue_index: Mapping[Venue, int] = field(repr=False)
+    _symbol_index: Mapping[Stablecoin, int] = field(repr=False)
+
+    def _indices(self, names: Optional[Iterable[str]], index: Mapping[str, int]) -> np.ndarray:
+        if names is None:
+            return np.arange(len(index), dtype=np.intp)
+        return np.fromiter((index[n] for n in names if n in index), dtype=np.intp)
+
+    def slice(
+        self, symbols: Optional[Iterable[Stablecoin]] = None, venues: Optional[Iterable[Venue]] = None
+    ) -> Tuple[List[Venue], List[Stablecoin], np.ndarray, np.ndarray]:
+        """Sub-matrices for a venue/symbol subset; unknown names are skipped."""
+        vi = self._indices(venues, self._venue_index)
+        si = self._indices(symbols, self._symbol_index)
+        sel = np.ix_(vi, si)
+        return (
+            [self.venues[i] for i in vi],
+            [self.symbols[j] for j in si],
+            self.price_matrix[sel],
+            self.ts_matrix[sel],
+        )
+
+    def keys(self, symbols: Optional[Iterable[Stablecoin]] = None, venues: Optional[Iterable[Venue]] = None) -> List[Key]:
+        """(venue, symbol) pairs that currently have a price."""
+        vs, ss, px, _ = self.slice(symbols, venues)
+        vi, si = np.nonzero(~np.isnan(px))
+        return [(vs[i], ss[j]) for i, j in zip(vi.tolist(), si.tolist())]
+
+    def select(
+        self, symbols: Optional[Iterable[Stablecoin]] = None, venues: Optional[Iterable[Venue]] = None
+    ) -> List[Dict[str, object]]:
+        """/peg rows for a venue/symbol subset, in venue-major order."""
+        if symbols is None and venues is None:
+            return list(self.rows)
+        return _rows(*self.slice(symbols, venues))
+
+    @cached_property
+    def rows(self) -> Tuple[Dict[str, object], ...]:
+        return tuple(_rows(list(self.venues), list(self.symbols), self.price_matrix, self.ts_matrix))
+
+    @cached_property
+    def prices(self) -> Mapping[Key, float]:
+        vi, si = np.nonzero(~np.isnan(self.price_matrix))
+        values = self.price_matrix[vi, si].tolist()
+        keys = [(self.venues[i], self.symbols[j]) for i, j in zip(vi.tolist(), si.tolist())]
+        return MappingProxyType(dict(zip(keys, values)))
+
+    @cached_property
+    def timestamps(self) -> Mapping[Key, float]:
+        vi, si = np.nonzero(~np.isnan(self.price_matrix))
+        values = self.ts_matrix[vi, si].tolist()
+        keys = [(self.venues[i], self.symbols[j]) for i, j in zip(vi.tolist(), si.tolist())]
+        return MappingProxyType(dict(zip(keys, values)))
+
+
+def _rows(venues: Sequence[Venue], symbols: Sequence[Stablecoin], px: np.ndarray, ts: np.ndarray) -> List[Dict[str, object]]:
+    vi, si = np.nonzero(~np.isnan(px))
+    prices = np.round(px[vi, si], 6).tolist()
+    stamps = ts[vi, si]
+    # one ISO string per distinct timestamp (usually one per tick)
+    uniq, inverse = np.unique(stamps, return_inverse=True)
+    iso = [_iso(t) for t in uniq.tolist()]
+    return [
+        {"venue": venues[i], "symbol": symbols[j], "price": p, "timestamp": iso[k]}
+        for i, j, p, k in zip(vi.tolist(), si.tolist(), prices, inverse.tolist())
+    ]
+
+
+_LOCK_WAIT = REGISTRY.histogram("weal_lock_wait_seconds", "Time spent waiting to acquire a lock", ["lock"], LOCK_BUCKETS)
+_LOCK_HOLD = REGISTRY.histogram("weal_lock_hold_seconds", "Time a lock was held", ["lock"], LOCK_BUCKETS)
 
 
 class PegDataStore:
     """
-    Thread-safe in-memory store for synthetic stablecoin prices by venue.
-    Prices are simple random walks around $1.00.
+    In-memory store of stablecoin prices by venue, backed by a venue × symbol
+    matrix. Synthetic venues are simple random walks around $1.00; live venues
+    are set in bulk by `update_prices`.
+
+    Writers serialize on a lock, copy the matrix, update it with vectorized
+    operations and publish a new PegSnapshot with a single reference swap
+    (copy-on-write). Readers call `current()` and never take the lock.
+    `on_publish`, if set, is called with each new snapshot while the writer
+    lock is still held, so it sees snapshots in version order.
     """
 
-    def __init__(self, symbols: List[Stablecoin], venues: List[Venue]):
-        self.symbols = symbols
-        self.venues = venues
-        self._lock = threading.Lock()
-        self._prices: Dict[Tuple[Venue, Stablecoin], float] = {}
-        now = self._now_iso()
-        self._timestamps: Dict[Tuple[Venue, Stablecoin], str] = {}
-        for v in venues:
-            for s in symbols:
-                base = 1.0 + random.uniform(-0.0015, 0.0015)
-                self._prices[(v, s)] = base
-                self._timestamps[(v, s)] = now
-
-    def _now_iso(self) -> str:
-        return datetime.now(timezone.utc).isoformat()
-
-    def random_walk(self):
+    def __init__(self, symbols: List[Stablecoin], venues: List[Venue], seed: Optional[int] = None):
+        self.symbols: List[Stablecoin] = []
+        self.venues: List[Venue] = []
+        self._symbol_index: Dict[Stablecoin, int] = {}
+        self._venue_index: Dict[Venue, int] = {}
+        self._rng = np.random.default_rng(seed)
+        self._lock = TimedLock(_LOCK_WAIT, _LOCK_HOLD, "peg_store")  # writers only
+        self.on_publish: Optional[Callable[[PegSnapshot], None]] = None
+        now = time.time()
+        empty = np.empty((0, 0), dtype=np.float64)
+        self._snap = self._build(0, _frozen(empty), _frozen(empty.copy()), now)
+        self.add_venues(venues)
+        self.add_symbols(symbols, init_venues=venues)
+
+    def _build(self, version: int, prices: np.ndarray, timestamps: np.ndarray, now: float) -> PegSnapshot:
+        prev = getattr(self, "_snap", None)
+        if prev is not None and prices.shape == prev.price_matrix.shape:
+            # axes only ever grow, so an unchanged shape means unchanged names
+            axes = (prev.venues, prev.symbols, prev._venue_index, prev._symbol_index)
+        else:
+            axes = (
+                tuple(self.venues),
+                tuple(self.symbols),
+                MappingProxyType(dict(self._venue_index)),
+                MappingProxyType(dict(self._symbol_index)),
+            )
+        venues, symbols, venue_index, symbol_index = axes
+        return PegSnapshot(version, now, venues, symbols, _frozen(prices), _frozen(timestamps), venue_index, symbol_index)
+
+    def _grown(self, snap: PegSnapshot) -> Tuple[np.ndarray, np.ndarray]:
+        """Writable copies of the current matrices, padded with NaN to the current shape."""
+        shape = (len(self.venues), len(self.symbols))
+        prices = np.full(shape, np.nan)
+        timestamps = np.full(shape, np.nan)
+        r, c = snap.price_matrix.shape
+        prices[:r, :c] = snap.price_matrix
+        timestamps[:r, :c] = snap.ts_matrix
+        return prices, timestamps
+
+    def _register(self, names: Iterable[str], order: List[str], index: Dict[str, int]) -> List[str]:
+        added = []
+        for n in names:
+            if n not in index:
+                index[n] = len(order)
+                order.append(n)
+                added.append(n)
+        return added
+
+    def _publish(self, snap: PegSnapshot) -> PegSnapshot:
+        self._snap = snap
+        if self.on_publish is not None:
+            self.on_publish(snap)
+        return snap
+
+    def load(self, snap: PegSnapshot) -> None:
+        """Adopt a snapshot published elsewhere (e.g. by another process), axes included."""
         with self._lock:
-            now = self._now_iso()
-            for key, price in list(self._prices.items()):
-                drift = (1.0 - price) * 0.05
-                shock = random.uniform(-0.0008, 0.0008)
-                new_price = max(0.95, min(1.05, price + drift + shock))
-                self._prices[key] = new_price
-                self._timestamps[key] = now
+            self.venues = list(snap.venues)
+            self.symbols = list(snap.symbols)
+            self._venue_index = dict(snap._venue_index)
+            self._symbol_index = dict(snap._symbol_index)
+            self._snap = snap
 
-    def snapshot(self) -> List[Dict[str, object]]:
+    @property
+    def version(self) -> int:
+        return self._snap.version
+
+    def current(self) -> PegSnapshot:
+        """Latest published snapshot; lock-free and allocation-free."""
+        return self._snap
+
+    def add_venues(self, venues: Iterable[Venue]) -> List[Venue]:
+        """Track more venues (rows start empty). Returns the ones that were new."""
         with self._lock:
-            rows: List[Dict[str, object]] = []
-            for (venue, symbol), price in self._prices.items():
-                rows.append(
-                    {
-                        "venue": venue,
-                        "symbol": symbol,
-                        "price": round(price, 6),
-                        "timestamp": self._timestamps[(venue, symbol)],
-                    }
-                )
-            return rows
-
-
-def start_price_background_updater(store: PegDataStore, interval_seconds: float = 3.0) -> threading.Thread:
-    def _loop():
-        while True:
-            store.random_walk()
-            time.sleep(interval_seconds)
-
-    t = threading.Thread(target=_loop, daemon=True)
-    t.start()
-    return t
+            added = self._register(venues, self.venues, self._venue_index)
+            if added:
+                snap = self._snap
+                self._publish(self._build(snap.version + 1, *self._grown(snap), time.time()))
+            return added
 
+    def add_symbols(self, symbols: Iterable[Stablecoin], init_venues: Optional[Iterable[Venue]] = None) -> List[Stablecoin]:
+        """
+        Track more symbols. Their prices start empty, except on `init_venues`
+        (e.g. the synthetic ones), which start near $1.00. Returns the new symbols.
+        """
+        with self._lock:
+            added = self._register(symbols, self.symbols, self._symbol_index)
+            if not added:
+                return added
+            snap = self._snap
+            now = time.time()
+            prices, timestamps = self._grown(snap)
+            if init_venues is not None:
+                rows = np.array([self._venue_index[v] for v in init_venues if v in self._venue_index], dtype=np.intp)
+                cols = np.array([self._symbol_index[s] for s in added], dtype=np.intp)
+                sel = np.ix_(rows, cols)
+                prices[sel] = 1.0 + self._rng.uniform(-0.0015, 0.0015, size=(len(rows), len(cols)))
+                timestamps[sel] = now
+            self._publish(self._build(snap.version + 1, prices, timestamps, now))
+            return added
 
+    def random_walk(self, venues: Optional[Iterable[Venue]] = None):
+        """Step every price, or only those on `venues` (e.g. the synthetic ones)."""
+        with self._lock:
+            snap = self._snap
+            now = time.time()
+            prices = snap.price_matrix.copy()
+            timestamps = snap.ts_matrix.copy()
+            if venues is None:
+                rows = slice(None)
+            else:
+                rows = np.array([self._venue_index[v] for v in venues if v in self._venue_index], dtype=np.intp)
+            block = prices[rows]
+            shock = self._rng.uniform(-0.0008, 0.0008, size=block.shape)
+            # NaN (no quote) stays NaN through the update and the clip
+            stepped = np.clip(block + (1.0 - block) * 0.05 + shock, 0.95, 1.05)
+            prices[rows] = stepped
+            ts_block = timestamps[rows]
+            ts_block[~np.isnan(stepped)] = now
+            timestamps[rows] = ts_block
+            self._publish(self._build(snap.version + 1, prices, timestamps, now))
+
+    def update_prices(self, quotes: Mapping[Key, float], ts: Optional[float] = None) -> PegSnapshot:
+        """
+        Bulk-set prices for (venue, symbol) keys, e.g. from an ingest tick, and
+        publish one new snapshot. Unknown keys are added.
+        """
+        with self._lock:
+            snap = self._snap
+            now = time.time() if ts is None else ts
+            self._register((v for v, _ in quotes), self.venues, self._venue_index)
+            self._register((s for _, s in quotes), self.symbols, self._symbol_index)
+            if snap.price_matrix.shape == (len(self.venues), len(self.symbols)):
+                prices, timestamps = snap.price_matrix.copy(), snap.ts_matrix.copy()
+            else:
+                prices, timestamps = self._grown(snap)
+            n = len(quotes)
+            rows = np.fromiter((self._venue_index[v] for v, _ in quotes), dtype=np.intp, count=n)
+            cols = np.fromiter((self._symbol_index[s] for _, s in quotes), dtype=np.intp, count=n)
+            prices[rows, cols] = np.fromiter(quotes.values(), dtype=np.float64, count=n)
+            timestamps[rows, cols] = now
+            return self._publish(self._build(snap.version + 1, prices, timestamps, now))
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        return list(self._snap.rows)
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+import math
+import threading
+import warnings
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Key = Tuple[str, str]  # (venue, symbol)
+
+ALERT_DEPEG = "depeg"
+ALERT_ZSCORE = "zscore"
+ALERT_SPREAD = "spread"
+
+
+@dataclass(frozen=True)
+class PegAlert:
+    seq: int
+    ts: float
+    kind: str  # depeg | zscore | spread
+    state: str  # "start" when the threshold is crossed, "end" when it clears
+    venue: Optional[str]  # None for cross-venue spread alerts
+    symbol: str
+    value: float  # deviation bps, z-score or spread bps at the crossing
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "seq": self.seq,
+            "ts": self.ts,
+            "kind": self.kind,
+            "state": self.state,
+            "venue": self.venue,
+            "symbol": self.symbol,
+            "value": round(self.value, 4),
+        }
+
+
+class RollingPegStats:
+    """
+    Rolling peg statistics per (venue, symbol), updated in O(1) per tick.
+
+    State lives in per-series arrays and a whole batch of series is updated
+    with vectorized operations:
+
+    - EWMA of the price with a time-based half-life, so uneven tick spacing
+      is weighted correctly.
+    - Mean / stddev / z-score over the last `window` ticks from running sums
+      of (price - 1), which are recomputed exactly once per window to stop
+      floating-point drift.
+    - Max |price - 1| over the same window via van Herk / Gil-Werman: the max
+      of the current partial block and a precomputed suffix max of the
+      previous block, each O(1) per tick amortized.
+    - Seconds spent off-peg (|price - 1| above `depeg_bps`) in total, and the
+      start of the current excursion.
+    - Cross-venue spread per symbol (max - min of the latest prices). Venues
+      are grouped by `spread_group` so e.g. replayed venues only compare among
+      themselves.
+
+    Threshold crossings emit edge-triggered PegAlert events ("start" and
+    "end"), kept in a bounded log readable by sequence number.
+    """
+
+    def __init__(
+        self,
+        window: int = 200,
+        half_life: float = 300.0,
+        depeg_bps: float = 50.0,
+        zscore_threshold: float = 4.0,
+        spread_bps: float = 30.0,
+        max_alerts: int = 1000,
+        spread_group: Callable[[str], str] = lambda venue: "",
+    ):
+        if window < 2:
+            raise ValueError("window must be >= 2")
+        self.window = window
+        self.half_life = half_life
+        self.depeg_bps = depeg_bps
+        self.zscore_threshold = zscore_threshold
+        self.spread_bps = spread_bps
+        self.spread_group = spread_group
+        self.version = 0
+        self._lock = threading.Lock()
+        self._keys: List[Key] = []
+        self._index: Dict[Key, int] = {}
+        self._columns: Dict[Tuple[str, str], int] = {}  # (group, symbol) -> spread column
+        self._column_names: List[Tuple[str, str]] = []
+        self._venue_rows: Dict[str, int] = {}
+        self._alerts: Deque[PegAlert] = deque(maxlen=max_alerts)
+        self._alert_seq = 0
+        self._cursor: Dict[Hashable, int] = {}  # history series -> ticks consumed
+        self._feed_lock = threading.Lock()
+        self._spread_on = np.zeros(0, dtype=np.bool_)  # per spread column
+        self._allocate(0, 64)
+
+    # -- storage ---------------------------------------------------------
+
+    def _allocate(self, n: int, cap: int) -> None:
+        def grow(old: Optional[np.ndarray], fill: float, shape: Tuple[int, ...], dtype=np.float64) -> np.ndarray:
+            arr = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                arr[:n] = old[:n]
+            return arr
+
+        w = self.window
+        g = getattr
+        self._count = grow(g(self, "_count", None), 0, (cap,), np.int64)
+        self._last_ts = grow(g(self, "_last_ts", None), np.nan, (cap,))
+        self._last_px = grow(g(self, "_last_px", None), np.nan, (cap,))
+        self._ewma = grow(g(self, "_ewma", None), np.nan, (cap,))
+        self._sum = grow(g(self, "_sum", None), 0.0, (cap,))
+        self._sumsq = grow(g(self, "_sumsq", None), 0.0, (cap,))
+        self._ring = grow(g(self, "_ring", None), 0.0, (cap, w))
+        self._prefix_max = grow(g(self, "_prefix_max", None), 0.0, (cap,))
+        self._suffix_max = grow(g(self, "_suffix_max", None), 0.0, (cap, w + 1))
+        self._zscore = grow(g(self, "_zscore", None), np.nan, (cap,))
+        self._off_seconds = grow(g(self, "_off_seconds", None), 0.0, (cap,))
+        self._off_since = grow(g(self, "_off_since", None), np.nan, (cap,))
+        self._z_alert = grow(g(self, "_z_alert", None), False, (cap,), np.bool_)
+        self._column = grow(g(self, "_column", None), -1, (cap,), np.int64)
+        self._venue_row = grow(g(self, "_venue_row", None), -1, (cap,), np.int64)
+        self._capacity = cap
+
+    def _slots(self, keys: Sequence[Key]) -> np.ndarray:
+        new = [k for k in keys if k not in self._index]
+        if new:
+            n = len(self._keys)
+            if n + len(new) > self._capacity:
+                self._allocate(n, max(self._capacity * 2, n + len(new)))
+            for venue, symbol in new:
+                slot = len(self._keys)
+                self._index[(venue, symbol)] = slot
+                self._keys.append((venue, symbol))
+                col = (self.spread_group(venue), symbol)
+                if col not in self._columns:
+                    self._columns[col] = len(self._column_names)
+                    self._column_names.append(col)
+                self._column[slot] = self._columns[col]
+                self._venue_row[slot] = self._venue_rows.setdefault(venue, len(self._venue_rows))
+        return np.fromiter((self._index[k] for k in keys), dtype=np.intp, count=len(keys))
+
+    # -- updates ---------------------------------------------------------
+
+    def update(self, ts: float | np.ndarray, keys: Sequence[Key], prices: Sequence[float] | np.ndarray) -> List[PegAlert]:
+        """One tick for each of `keys` (distinct), at a shared or per-key timestamp."""
+        if len(keys) == 0:
+            return []
+        with self._lock:
+            slots = self._slots(keys)
+            ts_arr = np.broadcast_to(np.asarray(ts, dtype=np.float64), slots.shape)
+            alerts = self._step(slots, ts_arr, np.asarray(prices, dtype=np.float64))
+            alerts.extend(self._spread_alerts(slots, float(np.max(ts_arr))))
+            self.version += 1
+            return alerts
+
+    def extend_many(self, items: Iterable[Tuple[Key, np.ndarray, np.ndarray]]) -> List[PegAlert]:
+        """
+        Several ticks per series, e.g. what arrived since the last call. Ticks
+        are applied in rounds (the r-th new tick of every series at once), so
+        the work stays vectorized across series.
+        """
+        items = [(k, np.asarray(t, dtype=np.float64), np.asarray(p, dtype=np.float64)) for k, t, p in items if len(t)]
+        if not items:
+            return []
+        alerts: List[PegAlert] = []
+        with self._lock:
+            slots = self._slots([k for k, _, _ in items])
+            lengths = np.array([len(t) for _, t, _ in items])
+            rounds = int(lengths.max())
+            ts_mat = np.full((len(items), rounds), np.nan)
+            px_mat = np.full((len(items), rounds), np.nan)
+            for i, (_, t, p) in enumerate(items):
+                ts_mat[i, : len(t)] = t
+                px_mat[i, : len(p)] = p
+            for r in range(rounds):
+                live = lengths > r
+                alerts.extend(self._step(slots[live], ts_mat[live, r], px_mat[live, r]))
+            alerts.extend(self._spread_alerts(slots, float(np.nanmax(ts_mat))))
+            self.version += 1
+        return alerts
+
+    def _step(self, s: np.ndarray, ts: np.ndarray, px: np.ndarray) -> List[PegAlert]:
+        w = self.window
+        dev = px - 1.0
+        count = self._count[s]
+        first = count == 0
+
+        # time off-peg accrues for the interval that ended at this tick
+        prev_off = ~np.isnan(self._off_since[s])
+        dt = np.where(first, 0.0, np.maximum(ts - self._last_ts[s], 0.0))
+        self._off_seconds[s] += np.where(prev_off, dt, 0.0)
+
+        # EWMA with a time-based decay
+        alpha = 1.0 - np.exp(-dt * (math.log(2.0) / self.half_life))
+        self._ewma[s] = np.where(first, px, self._ewma[s] + alpha * (px - self._ewma[s]))
+
+        # rolling sums over the last `window` ticks
+        pos = count % w
+        full = count >= w
+        evicted = np.where(full, self._ring[s, pos], 0.0)
+        self._ring[s, pos] = dev
+        self._sum[s] += dev - evicted
+        self._sumsq[s] += dev * dev - evicted * evicted
+
+        # sliding max of |dev|: current block prefix vs. previous block suffix
+        absdev = np.abs(dev)
+        self._prefix_max[s] = np.where(pos == 0, absdev, np.maximum(self._prefix_max[s], absdev))
+        count = count + 1
+        self._count[s] = count
+        done = s[pos == w - 1]
+        if len(done):
+            block = np.abs(self._ring[done])
+            self._suffix_max[done, :w] = np.maximum.accumulate(block[:, ::-1], axis=1)[:, ::-1]
+            # exact recompute once per window bounds the drift of the running sums
+            self._sum[done] = self._ring[done].sum(axis=1)
+            self._sumsq[done] = np.square(self._ring[done]).sum(axis=1)
+
+        n = np.minimum(count, w).astype(np.float64)
+        mean = self._sum[s] / n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.maximum(self._sumsq[s] - n * mean * mean, 0.0) / (n - 1.0)
+            std = np.sqrt(var)
+            z = np.where((n >= 2) & (std > 1e-12), (dev - mean) / std, np.nan)
+        self._zscore[s] = z
+        self._last_ts[s] = ts
+        self._last_px[s] = px
+
+        alerts: List[PegAlert] = []
+        off = absdev * 10000.0 > self.depeg_bps
+        started = off & ~prev_off
+        ended = ~off & prev_off
+        self._off_since[s[started]] = ts[started]
+        self._off_since[s[ended]] = np.nan
+        alerts.extend(self._emit(ALERT_DEPEG, "start", s[started], ts[started], absdev[started] * 10000.0))
+        alerts.extend(self._emit(ALERT_DEPEG, "end", s[ended], ts[ended], absdev[ended] * 10000.0))
+
+        z_on = np.abs(np.nan_to_num(z)) > self.zscore_threshold
+        was = self._z_alert[s]
+        started, ended = z_on & ~was, ~z_on & was
+        self._z_alert[s] = z_on
+        alerts.extend(self._emit(ALERT_ZSCORE, "start", s[started], ts[started], z[started]))
+        alerts.extend(self._emit(ALERT_ZSCORE, "end", s[ended], ts[ended], np.nan_to_num(z[ended])))
+        return alerts
+
+    def _price_matrix(self) -> np.ndarray:
+        n = len(self._keys)
+        mat = np.full((len(self._venue_rows), len(self._column_names)), np.nan)
+        mat[self._venue_row[:n], self._column[:n]] = self._last_px[:n]
+        return mat
+
+    def _spreads(self) -> np.ndarray:
+        mat = self._price_matrix()
+        quoted = (~np.isnan(mat)).sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            spread = (np.nanmax(mat, axis=0) - np.nanmin(mat, axis=0)) * 10000.0
+        return np.where(quoted >= 2, spread, np.nan)
+
+    def _spread_alerts(self, slots: np.ndarray, ts: float) -> List[PegAlert]:
+        touched = np.unique(self._column[slots])
+        spread = self._spreads()
+        if len(self._spread_on) < len(spread):
+            self._spread_on = np.concatenate([self._spread_on, np.zeros(len(spread) - len(self._spread_on), dtype=np.bool_)])
+        on = np.zeros(len(spread), dtype=np.bool_)
+        np.greater(spread, self.spread_bps, out=on, where=~np.isnan(spread))
+        flipped = touched[on[touched] != self._spread_on[touched]]
+        self._spread_on[flipped] = on[flipped]
+        return [
+            self._alert(
+                ALERT_SPREAD, "start" if on[col] else "end", ts, None,
+                self._column_names[col][1], float(np.nan_to_num(spread[col])),
+            )
+            for col in flipped.tolist()
+        ]
+
+    def _emit(self, kind: str, state: str, slots: np.ndarray, ts: np.ndarray, values: np.ndarray) -> List[PegAlert]:
+        return [
+            self._alert(kind, state, t, *self._keys[slot], v)
+            for slot, t, v in zip(slots.tolist(), ts.tolist(), values.tolist())
+        ]
+
+    def _alert(self, kind: str, state: str, ts: float, venue: Optional[str], symbol: str, value: float) -> PegAlert:
+        self._alert_seq += 1
+        alert = PegAlert(self._alert_seq, ts, kind, state, venue, symbol, value)
+        self._alerts.append(alert)
+        return alert
+
+    # -- reads -----------------------------------------------------------
+
+    def stats(
+        self, symbols: Optional[Iterable[str]] = None, venues: Optional[Iterable[str]] = None
+    ) -> Dict[str, List[Dict[str, object]]]:
+        """Current per-series stats and per-symbol spreads, optionally filtered."""
+        wanted_s = None if symbols is None else set(symbols)
+        wanted_v = None if venues is None else set(venues)
+        with self._lock:
+            n = len(self._keys)
+            w = self.window
+            count = self._count[:n]
+            pos = (count - 1) % w
+            window_max = np.maximum(self._prefix_max[:n], self._suffix_max[np.arange(n), pos + 1])
+            nn = np.minimum(count, w).astype(np.float64)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = self._sum[:n] / nn
+                std = np.sqrt(np.maximum(self._sumsq[:n] - nn * mean * mean, 0.0) / (nn - 1.0))
+            cols = {
+                "price": self._last_px[:n], "ts": self._last_ts[:n], "ewma": self._ewma[:n],
+                "mean": mean + 1.0, "std_bps": std * 10000.0, "zscore": self._zscore[:n],
+                "max_dev_bps": window_max * 10000.0, "off_peg_seconds": self._off_seconds[:n],
+                "off_peg_since": self._off_since[:n],
+            }
+            lists = {name: np.round(values, 8).tolist() for name, values in cols.items()}
+            counts = count.tolist()
+            spreads = self._spreads()
+            mat = self._price_matrix()
+            venue_names = sorted(self._venue_rows, key=self._venue_rows.get)
+            column_names = list(self._column_names)
+            keys = list(self._keys)
+
+        def clean(x: float) -> Optional[float]:
+            return None if math.isnan(x) else x
+
+        series = []
+        for i, (venue, symbol) in enumerate(keys):
+            if (wanted_s is not None and symbol not in wanted_s) or (wanted_v is not None and venue not in wanted_v):
+                continue
+            row: Dict[str, object] = {"venue": venue, "symbol": symbol, "ticks": counts[i]}
+            for name, values in lists.items():
+                row[name] = clean(values[i])
+            row["off_peg"] = row["off_peg_since"] is not None
+            series.append(row)
+        spread_rows = []
+        for col, (group, symbol) in enumerate(column_names):
+            if wanted_s is not None and symbol not in wanted_s:
+                continue
+            quoted = [venue_names[r] for r in np.flatnonzero(~np.isnan(mat[:, col])).tolist()]
+            if wanted_v is not None:
+                quoted = [v for v in quoted if v in wanted_v]
+            if len(quoted) < 2:
+                continue
+            spread_rows.append({
+                "symbol": symbol,
+                "group": group or None,
+                "venues": quoted,
+                "spread_bps": clean(round(float(spreads[col]), 4)),
+            })
+        return {"series": series, "spreads": spread_rows}
+
+    def alerts(self, since: int = 0, limit: Optional[int] = None) -> List[PegAlert]:
+        with self._lock:
+            out = [a for a in self._alerts if a.seq > since]
+        return out[:limit] if limit is not None else out
+
+    @property
+    def alert_seq(self) -> int:
+        return self._alert_seq
+
+    def config(self) -> Dict[str, float]:
+        return {
+            "window_ticks": self.window,
+            "ewma_half_life_s": self.half_life,
+            "depeg_bps": self.depeg_bps,
+            "zscore_threshold": self.zscore_threshold,
+            "spread_bps": self.spread_bps,
+        }
+
+    def feed(self, history, keys: Optional[Iterable[Key]] = None) -> List[PegAlert]:
+        """
+        Apply the ticks appended to `history` (a HistoryStore or SharedHistory)
+        since the previous call, only for `keys` when the caller knows which
+        series it touched. The first call seeds each series from its last
+        `window` ticks.
+        """
+        with self._feed_lock:
+            limit = None if self._cursor else self.window
+            return self.extend_many(history.ticks_since(self._cursor, limit=limit, keys=keys))
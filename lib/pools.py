@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import json
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+PoolFilter = Callable[[Dict[str, Any]], bool]
+
+_DECODER = json.JSONDecoder()
+_WS = " \t\r\n,"
+
+
+def keep_stablecoin_pools(pool: Dict[str, Any]) -> bool:
+    return pool.get("stablecoin") is True
+
+
+class PoolStreamParser:
+    """
+    Incremental parser for the yields `/pools` body: {"status": ..., "data": [pool, ...]}.
+    Text is fed in chunks; each pool object is decoded on its own as soon as
+    its closing brace arrives, so the full list is never materialised.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._pos = 0
+        self._in_data = False
+        self.done = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        if self.done:
+            return []
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        if not self._in_data and not self._seek_data():
+            return []
+        out: List[Dict[str, Any]] = []
+        buf = self._buf
+        n = len(buf)
+        pos = self._pos
+        while True:
+            while pos < n and buf[pos] in _WS:
+                pos += 1
+            if pos >= n:
+                break
+            if buf[pos] == "]":
+                self.done = True
+                pos += 1
+                break
+            try:
+                obj, end = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # object not complete yet, wait for more text
+            if isinstance(obj, dict):
+                out.append(obj)
+            pos = end
+        self._pos = pos
+        return out
+
+    def close(self) -> None:
+        if not self.done:
+            raise ValueError("Truncated /pools payload: data array never closed")
+
+    def _seek_data(self) -> bool:
+        key = self._buf.find('"data"')
+        if key < 0:
+            # keep a short tail in case the key straddles two chunks
+            self._pos = max(0, len(self._buf) - 8)
+            return False
+        bracket = self._buf.find("[", key)
+        if bracket < 0:
+            self._pos = key
+            return False
+        self._pos = bracket + 1
+        self._in_data = True
+        return True
+
+
+def iter_pools(chunks: Iterable[str], keep: PoolFilter = keep_stablecoin_pools) -> Iterator[Dict[str, Any]]:
+    parser = PoolStreamParser()
+    for chunk in chunks:
+        for pool in parser.feed(chunk):
+            if keep(pool):
+                yield pool
+    parser.close()
+
+
+def _num(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) else float("nan")
+
+
+class PoolIndex:
+    """
+    Compact columnar store of yield pools with lookups by symbol, project and chain.
+    Numeric columns are typed arrays; keys are upper-cased symbol and lower-cased
+    project/chain, matching how the upstream payload is usually queried.
+    """
+
+    def __init__(self, fetched_at: float = 0.0):
+        self.fetched_at = fetched_at
+        self.pool_ids: List[str] = []
+        self.symbols: List[str] = []
+        self.projects: List[str] = []
+        self.chains: List[str] = []
+        self.apy = array("d")
+        self.apy_base = array("d")
+        self.apy_mean_30d = array("d")
+        self.apy_pct_7d = array("d")
+        self.tvl_usd = array("d")
+        self._by_symbol: Dict[str, array] = {}
+        self._by_project: Dict[str, array] = {}
+        self._by_chain: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.pool_ids)
+
+    def add(self, pool: Dict[str, Any]) -> None:
+        i = len(self.pool_ids)
+        symbol = str(pool.get("symbol", "")).upper()
+        project = str(pool.get("project", "")).lower()
+        chain = str(pool.get("chain", "")).lower()
+        self.pool_ids.append(str(pool.get("pool", "")))
+        self.symbols.append(symbol)
+        self.projects.append(project)
+        self.chains.append(chain)
+        self.apy.append(_num(pool.get("apy")))
+        self.apy_base.append(_num(pool.get("apyBase")))
+        self.apy_mean_30d.append(_num(pool.get("apyMean30d")))
+        self.apy_pct_7d.append(_num(pool.get("apyPct7D")))
+        self.tvl_usd.append(_num(pool.get("tvlUsd")))
+        self._by_symbol.setdefault(symbol, array("l")).append(i)
+        self._by_project.setdefault(project, array("l")).append(i)
+        self._by_chain.setdefault(chain, array("l")).append(i)
+
+    def query(
+        self,
+        symbol: Optional[str] = None,
+        project: Optional[str] = None,
+        chain: Optional[str] = None,
+    ) -> List[int]:
+        """Row ids matching every given key, in insertion order."""
+        sets = []
+        if symbol is not None:
+            sets.append(self._by_symbol.get(symbol.upper(), ()))
+        if project is not None:
+            sets.append(self._by_project.get(project.lower(), ()))
+        if chain is not None:
+            sets.append(self._by_chain.get(chain.lower(), ()))
+        if not sets:
+            return list(range(len(self)))
+        sets.sort(key=len)
+        rows = set(sets[0])
+        for other in sets[1:]:
+            rows.intersection_update(other)
+        return sorted(rows)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return {
+            "pool": self.pool_ids[i],
+            "symbol": self.symbols[i],
+            "project": self.projects[i],
+            "chain": self.chains[i],
+            "apy": self.apy[i],
+            "apyBase": self.apy_base[i],
+            "apyMean30d": self.apy_mean_30d[i],
+            "apyPct7D": self.apy_pct_7d[i],
+            "tvlUsd": self.tvl_usd[i],
+        }
+
+    def symbols_available(self) -> List[str]:
+        return sorted(self._by_symbol)
+
+    def projects_available(self) -> List[str]:
+        return sorted(self._by_project)
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Samples whose stack was first seen after `max_stacks` distinct ones are counted here
+OTHER_STACK = "[other]"
+
+
+class SamplingProfiler:
+    """
+    In-process sampling profiler for a live server.
+
+    While running, a daemon thread wakes every `interval` seconds, walks the
+    current stack of every other thread and counts it in collapsed form
+    ("outer;inner;leaf"), which flamegraph.pl / speedscope read directly.
+    Nothing is hooked into the profiled code, so the cost when stopped is
+    zero and while running is one stack walk per thread per interval.
+
+    Callers are labelled by function (name, file and first line) and only the
+    leaf by the line executing, so one call site does not split a stack.
+    At most `max_stacks` distinct stacks are kept, "[other]" included; samples
+    of stacks first seen after that are counted under "[other]".
+    """
+
+    def __init__(self, max_depth: int = 64, max_stacks: int = 10_000):
+        self.max_depth = max_depth
+        self.max_stacks = max_stacks
+        self.interval = 0.01
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._started_at: Optional[float] = None
+        self._stopped_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.01, reset: bool = True) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        if self.running:
+            self.interval = interval
+            return
+        with self._lock:
+            if reset:
+                self._stacks.clear()
+                self._samples = 0
+            self.interval = interval
+            self._started_at = time.time()
+            self._stopped_at = None
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join(timeout=1.0)
+        self._thread = None
+        self._stopped_at = time.time()
+
+    def _loop(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            collapsed: List[str] = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                parts = [f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"]
+                f = frame.f_back
+                while f is not None and len(parts) < self.max_depth:
+                    code = f.f_code
+                    parts.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+                    f = f.f_back
+                collapsed.append(";".join(reversed(parts)))
+            del frames
+            with self._lock:
+                stacks = self._stacks
+                # "[other]" takes one of the max_stacks slots, so keep it free until needed
+                room = self.max_stacks - (OTHER_STACK not in stacks)
+                for stack in collapsed:
+                    if stack not in stacks and len(stacks) >= room:
+                        stack = OTHER_STACK
+                        room = self.max_stacks
+                    stacks[stack] += 1
+                self._samples += 1
+
+    def collapsed(self, limit: Optional[int] = None) -> str:
+        """Stacks in collapsed format, most frequent first."""
+        with self._lock:
+            items = self._stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            distinct, samples = len(self._stacks), self._samples
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000.0, 3),
+            "samples": samples,
+            "distinct_stacks": distinct,
+            "max_stacks": self.max_stacks,
+            "started_at": self._started_at,
+            "stopped_at": self._stopped_at,
+        }
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from lib.tickstore import TickStore
+
+Key = Tuple[str, str]  # (venue, symbol)
+
+MIN_SPEED = 1.0
+MAX_SPEED = 1000.0
+USDC_2023_START = 1678406400.0  # 2023-03-10T00:00:00Z, the SVB weekend
+
+
+@dataclass(frozen=True)
+class ReplayChunk:
+    """A run of ticks in long format: one row per (timestamp, key) event, time-ordered."""
+
+    ts: np.ndarray  # float64 epoch seconds, scenario time
+    key_index: np.ndarray  # intp, index into ReplaySource.keys
+    prices: np.ndarray  # float64
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+
+@dataclass(frozen=True)
+class ReplaySource:
+    """A named tick series over fixed keys; `chunks()` starts a fresh, bounded-memory pass."""
+
+    name: str
+    keys: List[Key]
+    chunks: Callable[[], Iterator[ReplayChunk]]
+    params: Dict[str, Any] = field(default_factory=dict)
+
+
+def _depeg_shape(u: np.ndarray, trough: float, recovery: float) -> np.ndarray:
+    # slide to the trough over the first quarter, hold, then partially recover
+    drop = 1.0 - (1.0 - trough) * np.minimum(1.0, u / 0.25)
+    rebound = trough + (recovery - trough) * (u - 0.5) / 0.5
+    return np.where(u < 0.5, drop, rebound)
+
+
+def depeg_scenario(
+    symbol: str = "USDC",
+    venues: Sequence[str] = ("Binance", "Curve"),
+    points: int = 28_800,
+    step_seconds: float = 3.0,
+    trough: float = 0.88,
+    recovery: float = 0.97,
+    venue_spread: float = 0.003,
+    noise_bps: float = 5.0,
+    seed: int = 0,
+    start: float = USDC_2023_START,
+    chunk_size: int = 4096,
+) -> ReplaySource:
+    """
+    Generated depeg-and-recovery path (modelled on USDC, March 2023) with
+    venues spread symmetrically around it and mean-reverting noise. The same
+    seed gives the same ticks regardless of `chunk_size`.
+    """
+    venues = list(venues)
+    keys = [(v, symbol) for v in venues]
+    offsets = np.linspace(venue_spread, -venue_spread, len(venues)) if len(venues) > 1 else np.zeros(1)
+
+    def chunks() -> Iterator[ReplayChunk]:
+        rng = np.random.default_rng(seed)
+        noise = np.zeros(len(venues))
+        denom = max(points - 1, 1)
+        for lo in range(0, points, chunk_size):
+            n = min(chunk_size, points - lo)
+            i = np.arange(lo, lo + n)
+            base = _depeg_shape(i / denom, trough, recovery)
+            shocks = rng.standard_normal((n, len(venues))) * (noise_bps / 1e4)
+            path = np.empty((n, len(venues)))
+            for r in range(n):  # AR(1) noise; n x venues is small
+                noise = 0.9 * noise + shocks[r]
+                path[r] = noise
+            px = np.clip(base[:, None] + offsets[None, :] + path, 0.5, 1.5)
+            ts = np.repeat(start + i * step_seconds, len(venues))
+            key_index = np.tile(np.arange(len(venues), dtype=np.intp), n)
+            yield ReplayChunk(ts, key_index, px.reshape(-1))
+
+    params = {"symbol": symbol, "venues": venues, "points": points, "step_seconds": step_seconds, "seed": seed}
+    return ReplaySource("usdc_2023", keys, chunks, params)
+
+
+def recorded_ticks(
+    store: TickStore,
+    keys: Sequence[Key],
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    window_seconds: float = 3600.0,
+) -> ReplaySource:
+    """
+    Ticks recorded in a TickStore, merged across keys in time order. Reads one
+    `window_seconds` slice of every key at a time, so memory is bounded by the
+    window rather than the range.
+    """
+    keys = list(keys)
+
+    def next_tick(after: Optional[float]) -> Optional[float]:
+        # first recorded timestamp >= after on any key; skips gaps in the recording
+        firsts = [float(recs["t"][0]) for k in keys for recs in itertools.islice(store.iter_range(k, after), 1)]
+        return min(firsts) if firsts else None
+
+    def chunks() -> Iterator[ReplayChunk]:
+        lo = next_tick(since)
+        while lo is not None and (until is None or lo <= until):
+            w_hi = lo + window_seconds
+            last = until is not None and w_hi >= until
+            if last:
+                w_hi = until
+            ts_parts, idx_parts, px_parts = [], [], []
+            for k_i, key in enumerate(keys):
+                for recs in store.iter_range(key, lo, w_hi):
+                    # windows are half-open except the last
+                    n = len(recs) if last else int(np.searchsorted(recs["t"], w_hi, side="left"))
+                    ts_parts.append(np.array(recs["t"][:n]))
+                    idx_parts.append(np.full(n, k_i, dtype=np.intp))
+                    px_parts.append(np.array(recs["p"][:n]))
+            if ts_parts:
+                ts = np.concatenate(ts_parts)
+                if len(ts):
+                    order = np.argsort(ts, kind="stable")
+                    yield ReplayChunk(ts[order], np.concatenate(idx_parts)[order], np.concatenate(px_parts)[order])
+            if last:
+                break
+            lo = next_tick(w_hi)
+
+    params = {"keys": [list(k) for k in keys], "since": since, "until": until}
+    return ReplaySource("recorded", keys, chunks, params)
+
+
+def collect(source: ReplaySource) -> Dict[Key, Tuple[np.ndarray, np.ndarray]]:
+    """Materialize a (small) source as key -> (ts, prices)."""
+    chunks = list(source.chunks())
+    out: Dict[Key, Tuple[np.ndarray, np.ndarray]] = {}
+    for k_i, key in enumerate(source.keys):
+        ts = [c.ts[c.key_index == k_i] for c in chunks]
+        px = [c.prices[c.key_index == k_i] for c in chunks]
+        out[key] = (np.concatenate(ts) if ts else np.empty(0), np.concatenate(px) if px else np.empty(0))
+    return out
+
+
+# sink(keys, key_index, wall_ts, prices): record one batch of replayed ticks
+ReplaySink = Callable[[List[Key], np.ndarray, np.ndarray, np.ndarray], None]
+
+
+@dataclass(eq=False)
+class ReplaySession:
+    id: int
+    slot: int
+    source: ReplaySource
+    speed: float
+    keys: List[Key]  # source keys renamed onto this session's replay venues
+    status: str = "pending"  # pending | running | finished | stopped | failed
+    ticks: int = 0
+    batches: int = 0
+    scenario_time: Optional[float] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "scenario": self.source.name,
+            "params": self.source.params,
+            "speed": self.speed,
+            "venues": sorted({v for v, _ in self.keys}),
+            "status": self.status,
+            "ticks": self.ticks,
+            "batches": self.batches,
+            "scenario_time": self.scenario_time,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class ReplayManager:
+    """
+    Runs replays as tasks on the event loop, each paced against the wall clock
+    at `speed` times real time.
+
+    A session holds one chunk at a time. Ticks that fall due within the same
+    `frame_seconds` are handed to the sink as one batch, so a 1000x replay
+    costs a few dozen sink calls per second rather than one per tick. Each
+    running session owns a slot, and its venues are renamed "Replay <slot>/<venue>"
+    so concurrent replays never overwrite each other or live prices.
+    """
+
+    VENUE_PREFIX = "Replay "
+
+    def __init__(self, sink: ReplaySink, max_sessions: int = 8, keep_finished: int = 32, frame_seconds: float = 0.05):
+        self.sink = sink
+        self.max_sessions = max_sessions
+        self.keep_finished = keep_finished
+        self.frame_seconds = frame_seconds
+        self._sessions: Dict[int, ReplaySession] = {}
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def is_replay_venue(cls, venue: str) -> bool:
+        return venue.startswith(cls.VENUE_PREFIX)
+
+    def _free_slot(self) -> Optional[int]:
+        busy = {s.slot for s in self._sessions.values() if s.status in ("pending", "running")}
+        return next((i for i in range(1, self.max_sessions + 1) if i not in busy), None)
+
+    def start(self, source: ReplaySource, speed: float = 1.0) -> ReplaySession:
+        if not MIN_SPEED <= speed <= MAX_SPEED:
+            raise ValueError(f"speed must be between {MIN_SPEED:g} and {MAX_SPEED:g}")
+        slot = self._free_slot()
+        if slot is None:
+            raise RuntimeError(f"Already running {self.max_sessions} replays")
+        keys = [(f"{self.VENUE_PREFIX}{slot}/{v}", s) for v, s in source.keys]
+        session = ReplaySession(next(self._ids), slot, source, float(speed), keys)
+        self._sessions[session.id] = session
+        session.task = asyncio.ensure_future(self._run(session))
+        self._prune()
+        return session
+
+    async def stop(self, session_id: int) -> Optional[ReplaySession]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        if session.task is not None and not session.task.done():
+            session.task.cancel()
+            await asyncio.gather(session.task, return_exceptions=True)
+        return session
+
+    async def stop_all(self) -> None:
+        for session_id in list(self._sessions):
+            await self.stop(session_id)
+
+    def sessions(self) -> List[Dict[str, Any]]:
+        return [s.as_dict() for s in self._sessions.values()]
+
+    def get(self, session_id: int) -> Optional[ReplaySession]:
+        return self._sessions.get(session_id)
+
+    def _prune(self) -> None:
+        done = [s for s in self._sessions.values() if s.status not in ("pending", "running")]
+        for s in done[: max(0, len(done) - self.keep_finished)]:
+            del self._sessions[s.id]
+
+    async def _run(self, session: ReplaySession) -> None:
+        session.status = "running"
+        session.started_at = time.time()
+        wall0 = time.monotonic()
+        t0: Optional[float] = None
+        try:
+            for chunk in session.source.chunks():
+                if not len(chunk):
+                    continue
+                if t0 is None:
+                    t0 = float(chunk.ts[0])
+                offsets = (chunk.ts - t0) / session.speed  # wall seconds after start
+                i, n = 0, len(chunk)
+                while i < n:
+                    elapsed = time.monotonic() - wall0
+                    j = int(np.searchsorted(offsets, elapsed, side="right"))
+                    if j > i:
+                        self.sink(session.keys, chunk.key_index[i:j], session.started_at + offsets[i:j], chunk.prices[i:j])
+                        session.ticks += j - i
+                        session.batches += 1
+                        session.scenario_time = float(chunk.ts[j - 1])
+                        i = j
+                    if i < n:
+                        wait = wall0 + offsets[i] - time.monotonic()
+                        await asyncio.sleep(max(wait, self.frame_seconds))
+            session.status = "finished"
+        except asyncio.CancelledError:
+            session.status = "stopped"
+            raise
+        except Exception as exc:
+            session.status = "failed"
+            session.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            session.finished_at = time.time()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import inspect
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from lib.metrics import REGISTRY
+
+_JOB_LAG = REGISTRY.histogram("weal_job_lag_seconds", "Delay between a job's scheduled slot and its start", ["job"])
+_JOB_SECONDS = REGISTRY.histogram("weal_job_duration_seconds", "Periodic job run time", ["job"])
+
+
+@dataclass
+class JobStats:
+    runs: int = 0
+    errors: int = 0
+    last_started_at: float = 0.0
+    last_duration: float = 0.0
+    max_duration: float = 0.0
+    total_duration: float = 0.0
+    last_lag: float = 0.0  # seconds between the scheduled slot and the actual start
+    max_lag: float = 0.0
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        avg = self.total_duration / self.runs if self.runs else 0.0
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_started_at": self.last_started_at,
+            "last_duration_ms": round(self.last_duration * 1000.0, 3),
+            "avg_duration_ms": round(avg * 1000.0, 3),
+            "max_duration_ms": round(self.max_duration * 1000.0, 3),
+            "last_lag_ms": round(self.last_lag * 1000.0, 3),
+            "max_lag_ms": round(self.max_lag * 1000.0, 3),
+            "last_error": self.last_error,
+        }
+
+
+@dataclass
+class Job:
+    name: str
+    interval: float
+    fn: Callable[[], Any]
+    jitter: float = 0.0
+    blocking: bool = False  # run sync fn in a worker thread instead of on the loop
+    run_at_start: bool = False
+    stats: JobStats = field(default_factory=JobStats)
+
+
+class Scheduler:
+    """
+    Runs periodic jobs as tasks on the current event loop.
+
+    Each job fires on wall-clock multiples of its interval (plus an optional
+    random jitter), so jobs sharing an interval stay in phase and a slow run
+    skips missed slots instead of drifting or bunching up. Jobs are cancelled
+    by `stop()`, which the app lifespan awaits on shutdown.
+    """
+
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def add_job(
+        self,
+        name: str,
+        interval: float,
+        fn: Callable[[], Any],
+        jitter: float = 0.0,
+        blocking: bool = False,
+        run_at_start: bool = False,
+    ) -> Job:
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        if name in self._jobs:
+            raise ValueError(f"Job already registered: {name}")
+        job = Job(name, interval, fn, jitter, blocking, run_at_start)
+        self._jobs[name] = job
+        if self._tasks:  # already running: start it right away
+            self._tasks.append(asyncio.ensure_future(self._run(job)))
+        return job
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [asyncio.ensure_future(self._run(job)) for job in self._jobs.values()]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def clear(self) -> None:
+        """Forget all jobs (after stop), e.g. so an app lifespan can re-register them."""
+        if self._tasks:
+            raise RuntimeError("Scheduler is running")
+        self._jobs.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {"interval_s": job.interval, **job.stats.as_dict()} for name, job in self._jobs.items()}
+
+    def job(self, name: str) -> Job:
+        return self._jobs[name]
+
+    async def _run(self, job: Job) -> None:
+        if job.run_at_start:
+            await self._execute(job, time.time())
+        while True:
+            now = time.time()
+            slot = (int(now // job.interval) + 1) * job.interval
+            if job.jitter:
+                slot += random.uniform(0.0, job.jitter)
+            await asyncio.sleep(max(0.0, slot - time.time()))
+            await self._execute(job, slot)
+
+    async def _execute(self, job: Job, slot: float) -> None:
+        stats = job.stats
+        started = time.time()
+        stats.last_started_at = started
+        stats.last_lag = max(0.0, started - slot)
+        stats.max_lag = max(stats.max_lag, stats.last_lag)
+        _JOB_LAG.labels(job.name).observe(stats.last_lag)
+        t0 = time.perf_counter()
+        try:
+            if job.blocking:
+                result = await asyncio.to_thread(job.fn)
+            else:
+                result = job.fn()
+            if inspect.isawaitable(result):
+                await result
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            stats.errors += 1
+            stats.last_error = f"{type(exc).__name__}: {exc}"
+        finally:
+            elapsed = time.perf_counter() - t0
+            stats.runs += 1
+            stats.last_duration = elapsed
+            stats.total_duration += elapsed
+            stats.max_duration = max(stats.max_duration, elapsed)
+            _JOB_SECONDS.labels(job.name).observe(elapsed)
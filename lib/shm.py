@@ -0,0 +1,517 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+import numpy as np
+
+from lib.metrics import REGISTRY
+from lib.peg import Key, PegSnapshot
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+T = TypeVar("T")
+
+_MAGIC = 0x5745414C4D4B5431  # "WEALMKT1"
+_LAYOUT_VERSION = 1
+_HEADER_SLOTS = 32
+_ALIGN = 64
+
+# header slots (int64 unless noted)
+_H_MAGIC, _H_LAYOUT, _H_SEQ = 0, 1, 2
+_H_MAX_VENUES, _H_MAX_SYMBOLS, _H_MAX_SERIES, _H_CAPACITY, _H_AXES_BYTES, _H_SERIES_BYTES = 3, 4, 5, 6, 7, 8
+_H_N_VENUES, _H_N_SYMBOLS, _H_VERSION, _H_UPDATED_AT = 9, 10, 11, 12  # _H_UPDATED_AT is float64
+_H_AXES_LEN, _H_AXES_GEN = 13, 14
+_H_N_SERIES, _H_SERIES_LEN, _H_HISTORY_VERSION = 15, 16, 17
+_H_WRITER_PID = 18
+
+_READ_RETRIES = REGISTRY.counter("weal_shared_read_retries", "Seqlock reads retried because the writer was mid-update")
+
+
+def default_path(tag: str) -> Path:
+    """tmpfs when available, so pages never hit disk; data/ otherwise."""
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK):
+        return shm / f"weal-{tag}.market"
+    return Path("data") / f"weal-{tag}.market"
+
+
+def _layout(
+    max_venues: int, max_symbols: int, max_series: int, capacity: int, axes_bytes: int, series_bytes: int
+) -> Tuple[Dict[str, Tuple[int, np.dtype, Tuple[int, ...]]], int]:
+    regions = [
+        ("header", np.dtype(np.int64), (_HEADER_SLOTS,)),
+        ("axes", np.dtype(np.uint8), (axes_bytes,)),
+        ("series_names", np.dtype(np.uint8), (series_bytes,)),
+        ("prices", np.dtype(np.float64), (max_venues, max_symbols)),
+        ("stamps", np.dtype(np.float64), (max_venues, max_symbols)),
+        ("counts", np.dtype(np.int64), (max_series,)),
+        ("ring_ts", np.dtype(np.float64), (max_series, capacity)),
+        ("ring_px", np.dtype(np.float32), (max_series, capacity)),
+    ]
+    out = {}
+    offset = 0
+    for name, dtype, shape in regions:
+        out[name] = (offset, dtype, shape)
+        offset += int(np.prod(shape)) * dtype.itemsize
+        offset = -(-offset // _ALIGN) * _ALIGN
+    return out, offset
+
+
+class SharedMarket:
+    """
+    Market state in one memory-mapped file, written by a single process and
+    read by any number of others (e.g. uvicorn workers).
+
+    Holds the latest venue × symbol price/timestamp matrices with their axis
+    names, and one fixed-capacity tick ring per (venue, symbol) series. Every
+    write runs inside a seqlock section: the sequence counter is odd while the
+    writer is mid-update, and a reader copies what it needs, then retries if
+    the counter was odd or moved. Readers never block the writer and never
+    take a lock. This relies on the writer's stores becoming visible in
+    program order, which holds on x86-64 (TSO); on weakly-ordered CPUs an
+    occasional torn read is still caught by the validation in most cases.
+
+    The file is sparse: ring pages only take memory once a series reaches them.
+    """
+
+    def __init__(self, path: Path, mm: np.memmap):
+        self.path = Path(path)
+        self._mm = mm
+        header = mm[: _HEADER_SLOTS * 8].view(np.int64)
+        if int(header[_H_MAGIC]) != _MAGIC or int(header[_H_LAYOUT]) != _LAYOUT_VERSION:
+            raise ValueError(f"{path} is not a market state file (or has another layout)")
+        self.max_venues = int(header[_H_MAX_VENUES])
+        self.max_symbols = int(header[_H_MAX_SYMBOLS])
+        self.max_series = int(header[_H_MAX_SERIES])
+        self.capacity = int(header[_H_CAPACITY])
+        regions, _ = _layout(
+            self.max_venues, self.max_symbols, self.max_series, self.capacity,
+            int(header[_H_AXES_BYTES]), int(header[_H_SERIES_BYTES]),
+        )
+        views = {}
+        for name, (offset, dtype, shape) in regions.items():
+            nbytes = int(np.prod(shape)) * dtype.itemsize
+            views[name] = mm[offset:offset + nbytes].view(dtype).reshape(shape)
+        self._hdr = views["header"]
+        self._hdr_f = self._hdr.view(np.float64)
+        self._axes = views["axes"]
+        self._series_names = views["series_names"]
+        self._prices = views["prices"]
+        self._stamps = views["stamps"]
+        self._counts = views["counts"]
+        self._ring_ts = views["ring_ts"]
+        self._ring_px = views["ring_px"]
+        self._write_lock = threading.Lock()
+        self._series_lock = threading.Lock()
+        # writer side: axis positions in the shared matrix
+        self._axes_key: Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]] = None
+        # reader side: last decoded snapshot / axes / series names
+        self._snap: Optional[PegSnapshot] = None
+        self._axes_cache: Tuple[int, Tuple[str, ...], Tuple[str, ...], Dict[str, int], Dict[str, int]] = (-1, (), (), {}, {})
+        self._series: List[Key] = []
+        self._series_index: Dict[Hashable, int] = {}
+        self._series_parsed = 0
+        self.dropped_series = 0
+
+    @classmethod
+    def create(
+        cls,
+        path: Path,
+        max_venues: int = 64,
+        max_symbols: int = 1024,
+        max_series: int = 4096,
+        history_capacity: int = 4800,
+        axes_bytes: int = 256 * 1024,
+        series_bytes: int = 512 * 1024,
+    ) -> "SharedMarket":
+        """Create (or truncate) the file with the given limits; every page starts zeroed."""
+        _, size = _layout(max_venues, max_symbols, max_series, history_capacity, axes_bytes, series_bytes)
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.truncate(size)
+        mm = np.memmap(path, dtype=np.uint8, mode="r+", shape=(size,))
+        header = mm[: _HEADER_SLOTS * 8].view(np.int64)
+        header[_H_MAX_VENUES] = max_venues
+        header[_H_MAX_SYMBOLS] = max_symbols
+        header[_H_MAX_SERIES] = max_series
+        header[_H_CAPACITY] = history_capacity
+        header[_H_AXES_BYTES] = axes_bytes
+        header[_H_SERIES_BYTES] = series_bytes
+        header[_H_LAYOUT] = _LAYOUT_VERSION
+        header[_H_MAGIC] = _MAGIC  # last: attach() only accepts a fully initialized header
+        return cls(path, mm)
+
+    @classmethod
+    def attach(cls, path: Path) -> "SharedMarket":
+        return cls(path, np.memmap(path, dtype=np.uint8, mode="r+"))
+
+    @property
+    def version(self) -> int:
+        return int(self._hdr[_H_VERSION])
+
+    @property
+    def history_version(self) -> int:
+        return int(self._hdr[_H_HISTORY_VERSION])
+
+    @property
+    def writer_pid(self) -> int:
+        return int(self._hdr[_H_WRITER_PID])
+
+    # -- seqlock ---------------------------------------------------------
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        with self._write_lock:
+            self._hdr[_H_SEQ] += 1  # odd: update in progress
+            try:
+                yield
+            finally:
+                self._hdr[_H_SEQ] += 1
+
+    def claim(self) -> None:
+        """Called by a process that just became the writer."""
+        with self._write_lock:
+            if int(self._hdr[_H_SEQ]) & 1:
+                self._hdr[_H_SEQ] += 1  # previous writer died mid-update
+            self._hdr[_H_WRITER_PID] = os.getpid()
+        self._axes_key = None
+        self._sync_series()
+
+    def _read(self, fn: Callable[[], T], timeout: float = 1.0) -> T:
+        deadline = None
+        spins = 0
+        while True:
+            before = int(self._hdr[_H_SEQ])
+            if not before & 1:
+                try:
+                    out = fn()
+                except (ValueError, IndexError, KeyError, UnicodeDecodeError):
+                    out = None  # decoded a half-written region; the check below retries
+                    if int(self._hdr[_H_SEQ]) == before:
+                        raise
+                if int(self._hdr[_H_SEQ]) == before:
+                    return out  # type: ignore[return-value]
+            _READ_RETRIES.inc()
+            spins += 1
+            if spins > 64:
+                now = time.monotonic()
+                if deadline is None:
+                    deadline = now + timeout
+                elif now > deadline:
+                    raise TimeoutError(f"{self.path}: writer stuck mid-update")
+                time.sleep(0.0001)
+
+    # -- peg snapshot ----------------------------------------------------
+
+    def publish(self, snap: PegSnapshot) -> None:
+        """Copy a snapshot in (writer only). Usable as PegDataStore.on_publish."""
+        nv, ns = snap.price_matrix.shape
+        if nv > self.max_venues or ns > self.max_symbols:
+            raise ValueError(f"snapshot {nv}x{ns} exceeds shared limits {self.max_venues}x{self.max_symbols}")
+        axes_key = (snap.venues, snap.symbols)
+        blob = b""
+        if axes_key != self._axes_key:
+            blob = json.dumps({"venues": snap.venues, "symbols": snap.symbols}).encode("utf-8")
+            if len(blob) > len(self._axes):
+                raise ValueError("axis names exceed the shared names region")
+        with self._writing():
+            if blob:
+                self._axes[: len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+                self._hdr[_H_AXES_LEN] = len(blob)
+                self._hdr[_H_AXES_GEN] += 1
+            self._prices[:nv, :ns] = snap.price_matrix
+            self._stamps[:nv, :ns] = snap.ts_matrix
+            self._hdr[_H_N_VENUES] = nv
+            self._hdr[_H_N_SYMBOLS] = ns
+            self._hdr_f[_H_UPDATED_AT] = snap.updated_at
+            self._hdr[_H_VERSION] = snap.version
+        self._axes_key = axes_key
+
+    def snapshot(self) -> Optional[PegSnapshot]:
+        """Latest published snapshot (decoded once per version), or None before the first publish."""
+        if self.version == 0:
+            return None
+        cached = self._snap
+        if cached is not None and cached.version == self.version:
+            return cached
+        gen_seen = self._axes_cache[0]
+
+        def read():
+            version = int(self._hdr[_H_VERSION])
+            nv, ns = int(self._hdr[_H_N_VENUES]), int(self._hdr[_H_N_SYMBOLS])
+            gen = int(self._hdr[_H_AXES_GEN])
+            blob = bytes(self._axes[: int(self._hdr[_H_AXES_LEN])]) if gen != gen_seen else None
+            return (
+                version, float(self._hdr_f[_H_UPDATED_AT]), gen, blob,
+                np.array(self._prices[:nv, :ns]), np.array(self._stamps[:nv, :ns]),
+            )
+
+        version, updated_at, gen, blob, prices, stamps = self._read(read)
+        if blob is not None:
+            names = json.loads(blob)
+            venues, symbols = tuple(names["venues"]), tuple(names["symbols"])
+            self._axes_cache = (
+                gen, venues, symbols,
+                MappingProxyType({v: i for i, v in enumerate(venues)}),
+                MappingProxyType({s: i for i, s in enumerate(symbols)}),
+            )
+        _, venues, symbols, venue_index, symbol_index = self._axes_cache
+        prices.flags.writeable = False
+        stamps.flags.writeable = False
+        snap = PegSnapshot(version, updated_at, venues, symbols, prices, stamps, venue_index, symbol_index)
+        self._snap = snap
+        return snap
+
+    # -- history rings ---------------------------------------------------
+
+    def _sync_series(self) -> None:
+        """Decode series names appended since the last call."""
+        if int(self._hdr[_H_N_SERIES]) == len(self._series):
+            return
+        with self._series_lock:
+            start = self._series_parsed
+
+            def read():
+                return int(self._hdr[_H_N_SERIES]), bytes(self._series_names[start: int(self._hdr[_H_SERIES_LEN])])
+
+            n_series, tail = self._read(read)
+            for line in tail.decode("utf-8").split("\n")[: n_series - len(self._series)]:
+                venue, symbol = line.split("\t")
+                self._series_index[(venue, symbol)] = len(self._series)
+                self._series.append((venue, symbol))
+                self._series_parsed += len(line.encode("utf-8")) + 1
+
+    def _slot(self, key: Hashable, create: bool) -> Optional[int]:
+        slot = self._series_index.get(key)
+        if slot is not None or not create:
+            if slot is None:
+                self._sync_series()
+                slot = self._series_index.get(key)
+            return slot
+        venue, symbol = key  # type: ignore[misc]
+        line = f"{venue}\t{symbol}\n".encode("utf-8")
+        n = len(self._series)
+        used = int(self._hdr[_H_SERIES_LEN])
+        if n >= self.max_series or used + len(line) > len(self._series_names) or "\t" in venue + symbol:
+            self.dropped_series += 1
+            return None
+        # inside the caller's write section
+        self._series_names[used: used + len(line)] = np.frombuffer(line, dtype=np.uint8)
+        self._counts[n] = 0
+        self._hdr[_H_SERIES_LEN] = used + len(line)
+        self._hdr[_H_N_SERIES] = n + 1
+        self._series.append(key)  # type: ignore[arg-type]
+        self._series_index[key] = n
+        self._series_parsed = used + len(line)
+        return n
+
+    def append_many(self, ts: float, items: Iterable[Tuple[Hashable, float]]) -> None:
+        items = list(items)
+        if not items:
+            return
+        with self._writing():
+            pairs = [(self._slot(k, True), p) for k, p in items]
+            pairs = [(s, p) for s, p in pairs if s is not None]
+            if pairs:
+                slots = np.fromiter((s for s, _ in pairs), dtype=np.intp, count=len(pairs))
+                pos = self._counts[slots] % self.capacity
+                self._ring_ts[slots, pos] = ts
+                self._ring_px[slots, pos] = np.fromiter((p for _, p in pairs), dtype=np.float64, count=len(pairs))
+                self._counts[slots] += 1
+            self._hdr[_H_HISTORY_VERSION] += 1
+
+    def extend(self, key: Hashable, ts: np.ndarray, prices: np.ndarray) -> None:
+        ts = np.asarray(ts, dtype=np.float64)[-self.capacity:]
+        prices = np.asarray(prices)[-self.capacity:]
+        if len(ts) == 0:
+            return
+        with self._writing():
+            slot = self._slot(key, True)
+            if slot is not None:
+                n = int(self._counts[slot])
+                pos = (n + np.arange(len(ts))) % self.capacity
+                self._ring_ts[slot, pos] = ts
+                self._ring_px[slot, pos] = prices
+                self._counts[slot] = n + len(ts)
+            self._hdr[_H_HISTORY_VERSION] += 1
+
+    def _segments(self, slot: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        n = int(self._counts[slot])
+        ts, px = self._ring_ts[slot], self._ring_px[slot]
+        if n <= self.capacity:
+            return [(ts[:n], px[:n])]
+        head = n % self.capacity
+        return [(ts[head:], px[head:]), (ts[:head], px[:head])]
+
+    def oldest(self, key: Hashable) -> Optional[float]:
+        slot = self._slot(key, False)
+        if slot is None:
+            return None
+
+        def read():
+            first = self._segments(slot)[0][0]
+            return float(first[0]) if len(first) else None
+
+        return self._read(read)
+
+    def range(self, key: Hashable, since: Optional[float] = None, until: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        slot = self._slot(key, False)
+        if slot is None:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+
+        def read():
+            ts_parts: List[np.ndarray] = []
+            px_parts: List[np.ndarray] = []
+            for ts, px in self._segments(slot):
+                lo = 0 if since is None else int(np.searchsorted(ts, since, side="left"))
+                hi = len(ts) if until is None else int(np.searchsorted(ts, until, side="right"))
+                if hi > lo:
+                    ts_parts.append(ts[lo:hi].copy())
+                    px_parts.append(px[lo:hi].copy())
+            return ts_parts, px_parts
+
+        ts_parts, px_parts = self._read(read)
+        if not ts_parts:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float32)
+        return np.concatenate(ts_parts), np.concatenate(px_parts)
+
+    def series(self) -> List[Key]:
+        self._sync_series()
+        return list(self._series)
+
+    def ticks_since(
+        self,
+        cursor: Dict[Hashable, int],
+        limit: Optional[int] = None,
+        keys: Optional[Iterable[Hashable]] = None,
+    ) -> List[Tuple[Hashable, np.ndarray, np.ndarray]]:
+        """New ticks per series since `cursor` (key -> ticks seen, updated in place), optionally only for `keys`."""
+        if keys is None:
+            series = self.series()
+            slots = np.arange(len(series))
+        else:
+            series, found = [], []
+            for key in keys:
+                slot = self._slot(key, False)
+                if slot is not None:
+                    series.append(key)
+                    found.append(slot)
+            slots = np.array(found, dtype=np.int64)
+        seen = np.fromiter((cursor.get(k, 0) for k in series), dtype=np.int64, count=len(series))
+
+        def read():
+            counts = self._counts[slots]
+            out = []
+            for i in np.flatnonzero(counts != seen).tolist():
+                slot, n = int(slots[i]), int(counts[i])
+                start = max(int(seen[i]), n - self.capacity, 0 if limit is None else n - limit)
+                pos = np.arange(start, n) % self.capacity
+                out.append((i, n, self._ring_ts[slot, pos], self._ring_px[slot, pos]))
+            return out
+
+        result = []
+        for i, n, ts, px in self._read(read):
+            cursor[series[i]] = n
+            result.append((series[i], ts, px))
+        return result
+
+    def fill_levels(self) -> Dict[Hashable, float]:
+        keys = self.series()
+        counts = np.minimum(np.array(self._counts[: len(keys)]), self.capacity) / self.capacity
+        return dict(zip(keys, counts.tolist()))
+
+
+class SharedHistory:
+    """HistoryStore-compatible view of the tick rings in a SharedMarket."""
+
+    def __init__(self, market: SharedMarket):
+        self.market = market
+        self.capacity = market.capacity
+
+    @property
+    def version(self) -> int:
+        return self.market.history_version
+
+    def append(self, key: Hashable, ts: float, price: float) -> None:
+        self.market.append_many(ts, [(key, price)])
+
+    def append_many(self, ts: float, items: Iterable[Tuple[Hashable, float]]) -> None:
+        self.market.append_many(ts, items)
+
+    def extend(self, key: Hashable, ts: np.ndarray, prices: np.ndarray) -> None:
+        self.market.extend(key, ts, prices)
+
+    def oldest(self, key: Hashable) -> Optional[float]:
+        return self.market.oldest(key)
+
+    def query(
+        self,
+        key: Hashable,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        ts, px = self.market.range(key, since, until)
+        if limit is not None:
+            ts, px = ts[-limit:], px[-limit:]
+        return ts, px
+
+    def keys(self) -> List[Hashable]:
+        return list(self.market.series())
+
+    def ticks_since(
+        self,
+        cursor: Dict[Hashable, int],
+        limit: Optional[int] = None,
+        keys: Optional[Iterable[Hashable]] = None,
+    ) -> List[Tuple[Hashable, np.ndarray, np.ndarray]]:
+        return self.market.ticks_since(cursor, limit, keys)
+
+    def fill_levels(self) -> Dict[Hashable, float]:
+        return self.market.fill_levels()
+
+
+class WriterLease:
+    """
+    Advisory file lock naming the one process that ingests and writes. The
+    kernel drops it when the holder exits, so another process can take over.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        if fcntl is None:
+            raise RuntimeError("Shared market state needs fcntl (POSIX)")
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
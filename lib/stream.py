@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+@dataclass(frozen=True)
+class StreamMessage:
+    """One update, encoded once and shared by every subscriber."""
+
+    seq: int
+    kind: str  # "snapshot" | "delta"
+    text: str  # JSON body, for WebSocket text frames
+    sse: bytes  # the same body framed as a server-sent event
+
+
+def _encode(seq: int, kind: str, rows: List[Dict[str, object]]) -> StreamMessage:
+    text = json.dumps({"type": kind, "seq": seq, "data": rows}, separators=(",", ":"))
+    sse = f"id: {seq}\nevent: {kind}\ndata: {text}\n\n".encode("utf-8")
+    return StreamMessage(seq, kind, text, sse)
+
+
+# (symbols, venues) a subscriber wants; None means all
+RowFilter = Tuple[Optional[FrozenSet[str]], Optional[FrozenSet[str]]]
+ALL_ROWS: RowFilter = (None, None)
+
+
+def row_filter(symbols: Optional[Iterable[str]] = None, venues: Optional[Iterable[str]] = None) -> RowFilter:
+    return (
+        None if symbols is None else frozenset(symbols),
+        None if venues is None else frozenset(venues),
+    )
+
+
+def _select(rows: Iterable[Dict[str, object]], flt: RowFilter) -> List[Dict[str, object]]:
+    symbols, venues = flt
+    return [
+        r for r in rows
+        if (symbols is None or r["symbol"] in symbols) and (venues is None or r["venue"] in venues)
+    ]
+
+
+@dataclass(eq=False)
+class Subscription:
+    queue: "asyncio.Queue[StreamMessage]"
+    filter: RowFilter = ALL_ROWS
+    resyncs: int = 0
+    closed: bool = field(default=False)
+
+
+class PegBroadcaster:
+    """
+    Fan-out of peg updates to streaming clients.
+
+    Each published tick is diffed against the previous one per (venue, symbol);
+    only changed rows are encoded, once per distinct (symbols, venues) filter, and
+    the same bytes are queued for every subscriber with that filter; subscribers
+    get no message for ticks that changed nothing they asked for. Queues are bounded: a subscriber that falls `queue_size` messages
+    behind has its backlog dropped and replaced by a single full snapshot, so a
+    slow client costs O(1) memory and catches up in one message.
+
+    All methods except `publish_threadsafe` must run on the event loop.
+    """
+
+    def __init__(self, queue_size: int = 32):
+        self.queue_size = queue_size
+        self._subs: Set[Subscription] = set()
+        self._last: Dict[Tuple[str, str], Dict[str, object]] = {}
+        self._seq = 0
+        self._snapshots: Dict[RowFilter, StreamMessage] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subs)
+
+    def subscribe(self, flt: RowFilter = ALL_ROWS) -> Subscription:
+        sub = Subscription(asyncio.Queue(maxsize=self.queue_size), flt)
+        snap = self._current_snapshot(flt)
+        if snap is not None:
+            sub.queue.put_nowait(snap)
+        self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        sub.closed = True
+        self._subs.discard(sub)
+
+    def publish(self, rows: Sequence[Dict[str, object]]) -> Optional[StreamMessage]:
+        changed: List[Dict[str, object]] = []
+        for r in rows:
+            key = (str(r["venue"]), str(r["symbol"]))
+            prev = self._last.get(key)
+            if prev is None or prev["price"] != r["price"]:
+                changed.append(r)
+                self._last[key] = r
+        if not changed:
+            return None
+        self._seq += 1
+        self._snapshots.clear()  # rebuilt lazily for new or lagging subscribers
+        encoded: Dict[RowFilter, Optional[StreamMessage]] = {ALL_ROWS: _encode(self._seq, "delta", changed)}
+        for sub in list(self._subs):
+            if sub.filter not in encoded:
+                selected = _select(changed, sub.filter)
+                encoded[sub.filter] = _encode(self._seq, "delta", selected) if selected else None
+            msg = encoded[sub.filter]
+            if msg is None:
+                continue
+            try:
+                sub.queue.put_nowait(msg)
+            except asyncio.QueueFull:
+                self._resync(sub)
+        return encoded[ALL_ROWS]
+
+    def publish_threadsafe(self, loop: asyncio.AbstractEventLoop, rows: Sequence[Dict[str, object]]) -> None:
+        loop.call_soon_threadsafe(self.publish, rows)
+
+    def _resync(self, sub: Subscription) -> None:
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.resyncs += 1
+        snap = self._current_snapshot(sub.filter)
+        if snap is not None:
+            sub.queue.put_nowait(snap)
+
+    def _current_snapshot(self, flt: RowFilter = ALL_ROWS) -> Optional[StreamMessage]:
+        snap = self._snapshots.get(flt)
+        if snap is None:
+            rows = _select(self._last.values(), flt)
+            if not rows:
+                return None
+            snap = self._snapshots[flt] = _encode(self._seq, "snapshot", rows)
+        return snap
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+
+# One record per tick: little-endian float64 epoch seconds + float64 price.
+TICK_DTYPE = np.dtype([("t", "<f8"), ("p", "<f8")])
+SEGMENT_SUFFIX = ".ticks"
+
+SeriesKey = Tuple[str, str]
+
+
+def _series_dirname(key: SeriesKey) -> str:
+    # percent-encoding keeps names filesystem-safe and reversible; "@" never survives quote()
+    return "@".join(quote(part, safe="") for part in key)
+
+
+def _drop_torn_tail(path: Path) -> None:
+    """Truncate a segment to whole records (a crash can leave a partial one at the end)."""
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return
+    torn = size % TICK_DTYPE.itemsize
+    if torn:
+        with open(path, "r+b") as f:
+            f.truncate(size - torn)
+
+
+class TickStore:
+    """
+    Append-only on-disk tick log, one directory per (venue, symbol) series.
+
+    Each series is split into time-based segments named by their start epoch
+    (`<start>.ticks`), each covering `segment_seconds`. The sorted segment start
+    times form a sparse index: a range query bisects it to find the segments it
+    overlaps, memory-maps only those files and binary-searches the timestamps
+    inside them, so nothing outside the requested range is read. Segments that
+    end before the retention horizon are deleted by `enforce_retention`.
+
+    Appends are buffered in memory until `flush()`. A torn trailing record from
+    a crash is ignored on read and cut off before this process first appends to
+    that segment, so later records stay aligned.
+    """
+
+    def __init__(self, root: Path, segment_seconds: int = 3600, retention_seconds: int = 7 * 24 * 3600):
+        self.root = Path(root)
+        self.segment_seconds = int(segment_seconds)
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        self._segments: Dict[SeriesKey, List[int]] = {}
+        self._dirs: Dict[SeriesKey, Path] = {}
+        self._pending: Dict[SeriesKey, List[Tuple[float, float]]] = {}
+        self._aligned: Set[Tuple[SeriesKey, int]] = set()  # segments checked for a torn tail
+        self._scan()
+
+    def _scan(self) -> None:
+        if not self.root.exists():
+            return
+        for series_dir in self.root.iterdir():
+            if not series_dir.is_dir() or series_dir.name.count("@") != 1:
+                continue
+            venue, symbol = (unquote(part) for part in series_dir.name.split("@"))
+            starts = sorted(int(p.stem) for p in series_dir.glob(f"*{SEGMENT_SUFFIX}") if p.stem.isdigit())
+            self._segments[(venue, symbol)] = starts
+            self._dirs[(venue, symbol)] = series_dir
+
+    def rescan(self) -> None:
+        """Pick up segments written by another process (read-only followers)."""
+        with self._lock:
+            self._segments.clear()
+            self._dirs.clear()
+            self._scan()
+
+    def _dir(self, key: SeriesKey) -> Path:
+        d = self._dirs.get(key)
+        if d is None:
+            d = self._dirs[key] = self.root / _series_dirname(key)
+        return d
+
+    def _segment_path(self, key: SeriesKey, start: int) -> Path:
+        return self._dir(key) / f"{start}{SEGMENT_SUFFIX}"
+
+    def keys(self) -> List[SeriesKey]:
+        with self._lock:
+            return sorted(set(self._segments) | set(self._pending))
+
+    def append(self, key: SeriesKey, ts: float, price: float) -> None:
+        with self._lock:
+            self._pending.setdefault(key, []).append((ts, price))
+
+    def append_many(self, ts: float, items: Iterable[Tuple[SeriesKey, float]]) -> None:
+        with self._lock:
+            for key, price in items:
+                self._pending.setdefault(key, []).append((ts, price))
+
+    def flush(self) -> None:
+        """Write buffered ticks to their segment files."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            for key, records in pending.items():
+                if not records:
+                    continue
+                arr = np.array(records, dtype=TICK_DTYPE)
+                starts = (arr["t"] // self.segment_seconds).astype(np.int64) * self.segment_seconds
+                series_dir = self._dir(key)
+                series_dir.mkdir(parents=True, exist_ok=True)
+                index = self._segments.setdefault(key, [])
+                for start in np.unique(starts).tolist():
+                    chunk = arr[starts == start]
+                    path = self._segment_path(key, start)
+                    if (key, start) not in self._aligned:
+                        _drop_torn_tail(path)
+                        self._aligned.add((key, start))
+                    with open(path, "ab") as f:
+                        f.write(chunk.tobytes())
+                    pos = bisect.bisect_left(index, start)
+                    if pos == len(index) or index[pos] != start:
+                        index.insert(pos, start)
+
+    def _open_segment(self, key: SeriesKey, start: int) -> Optional[np.ndarray]:
+        path = self._segment_path(key, start)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        count = size // TICK_DTYPE.itemsize
+        if count == 0:
+            return None
+        return np.memmap(path, dtype=TICK_DTYPE, mode="r", shape=(count,))
+
+    def _overlapping(self, key: SeriesKey, since: Optional[float], until: Optional[float]) -> List[int]:
+        starts = self._segments.get(key, [])
+        lo = 0
+        if since is not None:
+            # first segment whose window [start, start + seg) can contain `since`
+            lo = max(0, bisect.bisect_right(starts, since) - 1)
+        hi = len(starts) if until is None else bisect.bisect_right(starts, until)
+        return starts[lo:hi]
+
+    def iter_range(
+        self, key: SeriesKey, since: Optional[float] = None, until: Optional[float] = None
+    ) -> Iterator[np.ndarray]:
+        """
+        Yield record arrays for since <= t <= until, oldest first, one per segment.
+        Flushed data comes back as read-only memmap slices (zero-copy).
+        """
+        with self._lock:
+            segments = self._overlapping(key, since, until)
+            pending = list(self._pending.get(key, ()))
+        for start in segments:
+            recs = self._open_segment(key, start)
+            if recs is None:
+                continue
+            t = recs["t"]
+            lo = 0 if since is None else int(np.searchsorted(t, since, side="left"))
+            hi = len(recs) if until is None else int(np.searchsorted(t, until, side="right"))
+            if hi > lo:
+                yield recs[lo:hi]
+        if pending:
+            arr = np.array(pending, dtype=TICK_DTYPE)
+            mask = np.ones(len(arr), dtype=bool)
+            if since is not None:
+                mask &= arr["t"] >= since
+            if until is not None:
+                mask &= arr["t"] <= until
+            if mask.any():
+                yield arr[mask]
+
+    def query(
+        self, key: SeriesKey, since: Optional[float] = None, until: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, prices) for since <= t <= until, copied out of the segments."""
+        parts = list(self.iter_range(key, since, until))
+        if not parts:
+            return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+        recs = np.concatenate(parts)
+        return recs["t"].copy(), recs["p"].copy()
+
+    def enforce_retention(self, now: Optional[float] = None) -> int:
+        """Delete segments that end before now - retention_seconds. Returns count removed."""
+        horizon = (time.time() if now is None else now) - self.retention_seconds
+        removed = 0
+        with self._lock:
+            for key, starts in self._segments.items():
+                keep = [s for s in starts if s + self.segment_seconds > horizon]
+                for start in starts[: len(starts) - len(keep)]:
+                    self._aligned.discard((key, start))
+                    try:
+                        self._segment_path(key, start).unlink()
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+                starts[:] = keep
+        return removed
@@ -1,4 +1,26 @@
-from typing import Dict, List
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Anchors = Dict[str, Dict[str, List[float]]]
+
+CURVE_MONOTONE_CUBIC = "monotone_cubic"
+CURVE_NELSON_SIEGEL = "nelson_siegel"
+CURVE_METHODS = (CURVE_MONOTONE_CUBIC, CURVE_NELSON_SIEGEL)
+
+DEFAULT_ANCHORS: Anchors = {
+    "Aave": {"days": [1, 7, 30], "rates": [4.1, 4.6, 5.2]},
+    "Binance Earn": {"days": [1, 7, 30], "rates": [3.8, 4.3, 4.9]},
+    "Compound": {"days": [1, 7, 30], "rates": [3.9, 4.4, 5.0]},
+}
+
+# Decay constants (days) tried when fitting Nelson–Siegel
+_NS_TAUS = np.geomspace(0.5, 730.0, 64)
 
 
 def linear_interpolate(xs: List[float], ys: List[float], x_query: float) -> float:
@@ -17,26 +39,177 @@ def linear_interpolate(xs: List[float], ys: List[float], x_query: float) -> floa
     return ys[-1]
 
 
-def build_usdc_yield_curve(anchors: Dict[str, Dict[str, List[float]]] | None = None) -> Dict[str, object]:
+def anchor_points(anchors: Anchors) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pool every (tenor, rate) anchor across platforms and average per distinct
+    tenor. Returns sorted tenors (days) and mean rates.
+    """
+    days: List[float] = []
+    rates: List[float] = []
+    for v in anchors.values():
+        for d, r in zip(v["days"], v["rates"]):
+            if r is not None and np.isfinite(r):
+                days.append(float(d))
+                rates.append(float(r))
+    if not days:
+        raise ValueError("No anchors to fit")
+    x, inverse = np.unique(np.asarray(days), return_inverse=True)
+    y = np.bincount(inverse, weights=np.asarray(rates)) / np.bincount(inverse)
+    return x, y
+
+
+def anchors_fingerprint(anchors: Anchors) -> str:
+    """Stable digest of the anchor set, independent of dict ordering."""
+    raw = json.dumps(anchors, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+
+@dataclass(frozen=True, eq=False)
+class FittedCurve:
+    """
+    A fitted rate curve; call it with an array of tenors (fractional days).
+
+    monotone_cubic: `params` holds knots x, y and Hermite slopes d; flat
+    beyond the first/last anchor.
+    nelson_siegel: `params` holds beta0, beta1, beta2 and tau (days).
+    """
+
+    method: str
+    params: Dict[str, object]
+    fingerprint: str
+
+    def __call__(self, tenors: Sequence[float]) -> np.ndarray:
+        t = np.asarray(tenors, dtype=np.float64)
+        if self.method == CURVE_MONOTONE_CUBIC:
+            return _eval_monotone_cubic(self.params["x"], self.params["y"], self.params["d"], t)
+        p = self.params
+        return _eval_nelson_siegel(p["beta0"], p["beta1"], p["beta2"], p["tau"], t)
+
+    def describe(self) -> Dict[str, object]:
+        if self.method == CURVE_MONOTONE_CUBIC:
+            return {"method": self.method, "fingerprint": self.fingerprint, "knots": self.params["x"].tolist()}
+        return {"method": self.method, "fingerprint": self.fingerprint, **self.params}
+
+
+def _pchip_slopes(x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Fritsch–Carlson derivatives: the interpolant never overshoots the anchors."""
+    n = len(x)
+    if n == 1:
+        return np.zeros(1)
+    h = np.diff(x)
+    delta = np.diff(y) / h
+    if n == 2:
+        return np.array([delta[0], delta[0]])
+    d = np.zeros(n)
+    h0, h1 = h[:-1], h[1:]
+    w1, w2 = 2.0 * h1 + h0, h1 + 2.0 * h0
+    same_sign = delta[:-1] * delta[1:] > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        harmonic = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    d[1:-1] = np.where(same_sign, harmonic, 0.0)
+    d[0] = _pchip_edge(h[0], h[1], delta[0], delta[1])
+    d[-1] = _pchip_edge(h[-1], h[-2], delta[-1], delta[-2])
+    return d
+
+
+def _pchip_edge(h0: float, h1: float, m0: float, m1: float) -> float:
+    d = ((2.0 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+    if np.sign(d) != np.sign(m0):
+        return 0.0
+    if np.sign(m0) != np.sign(m1) and abs(d) > abs(3.0 * m0):
+        return 3.0 * m0
+    return float(d)
+
+
+def _eval_monotone_cubic(x: np.ndarray, y: np.ndarray, d: np.ndarray, t: np.ndarray) -> np.ndarray:
+    if len(x) == 1:
+        return np.full(t.shape, y[0])
+    tc = np.clip(t, x[0], x[-1])
+    i = np.clip(np.searchsorted(x, tc, side="right") - 1, 0, len(x) - 2)
+    h = x[i + 1] - x[i]
+    s = tc - x[i]
+    delta = (y[i + 1] - y[i]) / h
+    c2 = (3.0 * delta - 2.0 * d[i] - d[i + 1]) / h
+    c3 = (d[i] + d[i + 1] - 2.0 * delta) / (h * h)
+    return y[i] + s * (d[i] + s * (c2 + s * c3))
+
+
+def _ns_loadings(t: np.ndarray, tau: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # broadcast over tenors x taus; the t -> 0 limits are 1 and 0
+    u = np.maximum(t, 1e-9) / tau
+    slope = -np.expm1(-u) / u
+    return slope, slope - np.exp(-u)
+
+
+def _eval_nelson_siegel(b0: float, b1: float, b2: float, tau: float, t: np.ndarray) -> np.ndarray:
+    slope, hump = _ns_loadings(t, np.float64(tau))
+    return b0 + b1 * slope + b2 * hump
+
+
+def fit_monotone_cubic(x: np.ndarray, y: np.ndarray, fingerprint: str = "") -> FittedCurve:
+    return FittedCurve(CURVE_MONOTONE_CUBIC, {"x": x, "y": y, "d": _pchip_slopes(x, y)}, fingerprint)
+
+
+def fit_nelson_siegel(x: np.ndarray, y: np.ndarray, fingerprint: str = "") -> FittedCurve:
+    """
+    Least-squares Nelson–Siegel fit. For each candidate tau the betas are
+    linear, so all taus are solved at once and the lowest-error one is kept.
+    """
+    if len(x) < 3:
+        raise ValueError("nelson_siegel needs anchors at 3 or more distinct tenors")
+    slope, hump = _ns_loadings(x[:, None], _NS_TAUS[None, :])  # (tenors, taus)
+    design = np.stack([np.ones_like(slope), slope, hump], axis=-1).transpose(1, 0, 2)  # (taus, tenors, 3)
+    gram = design.transpose(0, 2, 1) @ design
+    rhs = design.transpose(0, 2, 1) @ y
+    betas = np.linalg.solve(gram + 1e-10 * np.eye(3), rhs[:, :, None])[:, :, 0]  # (taus, 3)
+    sse = ((design @ betas[:, :, None])[:, :, 0] - y) ** 2
+    best = int(np.argmin(sse.sum(axis=1)))
+    b0, b1, b2 = betas[best].tolist()
+    return FittedCurve(
+        CURVE_NELSON_SIEGEL,
+        {"beta0": b0, "beta1": b1, "beta2": b2, "tau": float(_NS_TAUS[best])},
+        fingerprint,
+    )
+
+
+_FITTERS = {CURVE_MONOTONE_CUBIC: fit_monotone_cubic, CURVE_NELSON_SIEGEL: fit_nelson_siegel}
+_FITTED: "OrderedDict[Tuple[str, str], FittedCurve]" = OrderedDict()
+_FITTED_MAX = 64
+_FITTED_LOCK = threading.Lock()
+
+
+def fit_curve(anchors: Anchors, method: str = CURVE_MONOTONE_CUBIC) -> FittedCurve:
+    """Fit (or reuse) the curve for an anchor set, memoized by its fingerprint."""
+    fitter = _FITTERS.get(method)
+    if fitter is None:
+        raise ValueError(f"method must be one of {', '.join(CURVE_METHODS)}")
+    key = (anchors_fingerprint(anchors), method)
+    with _FITTED_LOCK:
+        curve = _FITTED.get(key)
+        if curve is not None:
+            _FITTED.move_to_end(key)
+            return curve
+    x, y = anchor_points(anchors)
+    curve = fitter(x, y, key[0])
+    with _FITTED_LOCK:
+        _FITTED[key] = curve
+        while len(_FITTED) > _FITTED_MAX:
+            _FITTED.popitem(last=False)
+    return curve
+
+
+def build_usdc_yield_curve(
+    anchors: Optional[Anchors] = None,
+    method: str = CURVE_MONOTONE_CUBIC,
+    days: Optional[Sequence[float]] = None,
+) -> Dict[str, object]:
     if anchors is None:
-        anchors = {
-            "Aave": {"days": [1, 7, 30], "rates": [4.1, 4.6, 5.2]},
-            "Binance Earn": {"days": [1, 7, 30], "rates": [3.8, 4.3, 4.9]},
-            "Compound": {"days": [1, 7, 30], "rates": [3.9, 4.4, 5.0]},
-        }
-
-    days = [1, 7, 30]
-    avg_rates = []
-    for i, _ in enumerate(days):
-        vals = [v["rates"][i] for v in anchors.values()]
-        avg_rates.append(sum(vals) / len(vals))
-
-    curve_days = list(range(1, 31))
-    curve_rates = [linear_interpolate(days, avg_rates, d) for d in curve_days]
+        anchors = DEFAULT_ANCHORS
+    curve = fit_curve(anchors, method)
+    curve_days = list(range(1, 31)) if days is None else list(days)
     return {
         "symbol": "USDC",
         "anchors": anchors,
-        "curve": {"days": curve_days, "rates": curve_rates},
+        "fit": curve.describe(),
+        "curve": {"days": curve_days, "rates": curve(curve_days).tolist()},
     }
-
-
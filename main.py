@@ -1,87 +1,252 @@
 import argparse
+import asyncio
+import csv
 import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, TextIO
 
-import uvicorn
+import numpy as np
 
-from backend.api import app
-from lib.amm import compute_slippage_summary
-from lib.yield_curve import build_usdc_yield_curve
-from lib.defillama import fetch_current_prices, fetch_usdc_lending_anchors
+# Everything heavier is imported inside the mode that needs it, so `cli` never
+# loads the web stack and `web` starts without the CLI's dependencies
+# (budgets: python -m bench.startup).
 
 
-def print_table(headers: List[str], rows: List[List[object]]):
-    col_widths = [len(h) for h in headers]
-    for row in rows:
-        for i, cell in enumerate(row):
-            col_widths[i] = max(col_widths[i], len(str(cell)))
+CLI_SECTIONS = ("peg", "slippage", "yield", "curve", "grid")
+CLI_DEFAULT_SECTIONS = "peg,slippage,yield,curve"
+CLI_FORMATS = ("table", "csv", "jsonl")
+CLI_CHUNK = 4096  # rows computed and written per step for streamed sections
 
-    def fmt_row(r: List[object]) -> str:
-        return " | ".join(str(c).ljust(col_widths[i]) for i, c in enumerate(r))
 
-    print(fmt_row(headers))
-    print("-+-".join("-" * w for w in col_widths))
-    for r in rows:
-        print(fmt_row(r))
+class RowWriter:
+    """
+    Writes sections of rows as they are produced: aligned text for people, CSV
+    or JSON lines for scripts. Nothing is buffered beyond the current rows.
+    CSV starts each section with its own header line (after a blank line).
+    """
 
+    def __init__(self, fmt: str, out: TextIO):
+        self.fmt = fmt
+        self.out = out
+        self._csv = csv.writer(out, lineterminator="\n")
+        self._section = ""
+        self._columns: List[str] = []
+        self._widths: List[int] = []
+        self._skip = 0
+        self._started = False
 
-def run_cli():
-    # Live Peg snapshot
-    symbols = ["USDC", "USDT", "DAI"]
-    print("\nPeg Stability Snapshot (live)")
-    price_map = fetch_current_prices(symbols)
-    if not price_map:
-        print("Prices unavailable (502)")
-    else:
-        from datetime import datetime, timezone
+    def begin(self, section: str, title: str, columns: List[str]) -> None:
+        self._section, self._columns = section, columns
+        if self.fmt == "table":
+            # one timestamp per section in the title rather than on every row
+            self._skip = 1 if columns[:1] == ["ts"] else 0
+            self._widths = [max(len(c), 12) for c in columns[self._skip:]]
+            self.out.write(f"\n{title}\n")
+            self.out.write(" | ".join(c.ljust(w) for c, w in zip(columns[self._skip:], self._widths)) + "\n")
+            self.out.write("-+-".join("-" * w for w in self._widths) + "\n")
+        elif self.fmt == "csv":
+            if self._started:
+                self.out.write("\n")
+            self._csv.writerow(columns)
+        self._started = True
+
+    def rows(self, rows: Iterable[Sequence[object]]) -> None:
+        if self.fmt == "csv":
+            self._csv.writerows(rows)
+        elif self.fmt == "jsonl":
+            for r in rows:
+                self.out.write(json.dumps({"section": self._section, **dict(zip(self._columns, r))}) + "\n")
+        else:
+            for r in rows:
+                self.out.write(" | ".join(_cell(c).ljust(w) for c, w in zip(r[self._skip:], self._widths)) + "\n")
+
+    def unavailable(self, section: str, title: str, reason: str = "502") -> None:
+        # keep machine-readable streams clean; the exit status tells scripts
+        if self.fmt == "table":
+            self.out.write(f"\n{title}\n{section} unavailable ({reason})\n")
+        else:
+            sys.stderr.write(f"{section} unavailable ({reason})\n")
+
+    def flush(self) -> None:
+        self.out.flush()
+
+
+def _cell(value: object) -> str:
+    if isinstance(value, float):
+        return f"{value:.6f}" if abs(value) < 1e4 else f"{value:.0f}"
+    return str(value)
+
+
+async def _fetch_sources(symbols: List[str], sections: List[str]) -> Dict[str, object]:
+    """Fetch every upstream the sections need at once; failures come back as exceptions."""
+    from lib.defillama import afetch_current_prices, afetch_stablecoin_prices, afetch_usdc_lending_anchors
+
+    calls = {}
+    if "peg" in sections:
+        calls["DefiLlama"] = afetch_current_prices(symbols)
+        calls["DefiLlama Stables"] = afetch_stablecoin_prices(symbols)
+    if "yield" in sections or "curve" in sections:
+        calls["anchors"] = afetch_usdc_lending_anchors()
+    results = await asyncio.gather(*calls.values(), return_exceptions=True)
+    return dict(zip(calls, results))
 
-        ts_iso = datetime.now(timezone.utc).isoformat()
+
+def _grid_rows(args: argparse.Namespace, ts: str) -> Iterator[List[List[object]]]:
+    from lib.amm import slippage_grid
+
+    max_size = args.max_size_millions * 1_000_000.0
+    step = max_size / args.grid_points
+    for depth in args.depths:
+        for start in range(0, args.grid_points, CLI_CHUNK):
+            sizes = (np.arange(start, min(start + CLI_CHUNK, args.grid_points)) + 1.0) * step
+            grid = slippage_grid(args.reserve, args.reserve, sizes, [depth], args.fee_bps)
+            yield [
+                [ts, depth, size, out, price, slip]
+                for size, out, price, slip in zip(
+                    sizes.tolist(),
+                    grid["out_amount"][0].tolist(),
+                    grid["execution_price"][0].tolist(),
+                    grid["slippage_bps"][0].tolist(),
+                )
+            ]
+
+
+def _curve_rows(curve: Callable[[np.ndarray], np.ndarray], args: argparse.Namespace, ts: str) -> Iterator[List[List[object]]]:
+    points = args.curve_points
+    for start in range(0, points, CLI_CHUNK):
+        tenors = 1.0 + (args.curve_days - 1.0) * np.arange(start, min(start + CLI_CHUNK, points)) / max(points - 1, 1)
+        yield [[ts, t, r] for t, r in zip(tenors.tolist(), curve(tenors).tolist())]
+
+
+async def _cli_snapshot(args: argparse.Namespace, writer: RowWriter) -> bool:
+    """One pass over the requested sections; False if any section was unavailable."""
+    from lib.amm import compute_slippage_summary
+    from lib.yield_curve import fit_curve
+
+    sections = args.what
+    fetched = await _fetch_sources(args.symbols, sections)
+    ts = datetime.now(timezone.utc).isoformat()
+    if writer.fmt == "table":
+        writer.out.write(f"\n== {ts} ==\n")
+    ok = True
+
+    if "peg" in sections:
         rows = []
-        for venue in ["Binance", "Curve"]:
-            for s in symbols:
-                meta = price_map.get(s)
-                if not meta:
-                    continue
-                rows.append([venue, s, f"{meta['price']:.6f}", ts_iso])
-        print_table(["Venue", "Symbol", "Price", "Timestamp"], rows)
-
-    # Slippage
-    print("\nLiquidity Simulator (Constant Product)")
-    reserve_x = 50_000_000.0
-    reserve_y = 50_000_000.0
-    sizes = [1_000_000.0, 5_000_000.0, 10_000_000.0]
-    slip_rows_dicts = compute_slippage_summary(reserve_x, reserve_y, sizes)
-    slip_rows = [
-        [
-            f"{d['size']:.0f}",
-            f"{d['out_amount']:.0f}",
-            f"{d['execution_price']:.6f}",
-            f"{d['slippage_bps']:.2f}",
-        ]
-        for d in slip_rows_dicts
-    ]
-    print_table(["Trade Size (in)", "Out Amount", "Exec Price (y/x)", "Slippage (bps)"], slip_rows)
-
-    # Yield curve
-    print("\nYield Curve (USDC, live)")
-    live = fetch_usdc_lending_anchors()
-    if not live:
-        print("Yields unavailable (502)")
-        return
-    y = build_usdc_yield_curve(live)
-    anchor_rows: List[List[object]] = []
-    for platform, data in y["anchors"].items():
-        d = ", ".join(f"{day}d" for day in data["days"])
-        r = ", ".join(f"{rate:.2f}%" for rate in data["rates"])
-        anchor_rows.append([platform, d, r])
-    print_table(["Platform", "Terms", "Rates (APY)"], anchor_rows)
-    curve_days = y["curve"]["days"]
-    curve_rates = y["curve"]["rates"]
-    sample = list(zip(curve_days[::6], curve_rates[::6]))
-    sample_rows = [[f"{d}d", f"{r:.2f}%"] for d, r in sample]
-    print("\nInterpolated (sampled):")
-    print_table(["Day", "APY"], sample_rows)
+        for venue in ("DefiLlama", "DefiLlama Stables"):
+            prices = fetched[venue]
+            if isinstance(prices, BaseException) or not prices:
+                continue
+            for s in args.symbols:
+                quote = prices.get(s)
+                price = quote.get("price") if isinstance(quote, dict) else quote
+                if price is not None:
+                    rows.append([ts, venue, s, float(price)])
+        if rows:
+            writer.begin("peg", "Peg Stability Snapshot (live)", ["ts", "venue", "symbol", "price"])
+            writer.rows(rows)
+        else:
+            ok = False
+            writer.unavailable("Prices", "Peg Stability Snapshot (live)")
+
+    if "slippage" in sections:
+        writer.begin(
+            "slippage", f"Liquidity Simulator (Constant Product, {args.reserve / 1e6:.0f}m/{args.reserve / 1e6:.0f}m)",
+            ["ts", "size", "out_amount", "execution_price", "slippage_bps"],
+        )
+        summary = compute_slippage_summary(args.reserve, args.reserve, [1e6, 5e6, 10e6], args.fee_bps)
+        writer.rows([ts, d["size"], d["out_amount"], d["execution_price"], d["slippage_bps"]] for d in summary)
+
+    if "grid" in sections:
+        writer.begin(
+            "grid", "Slippage Grid (size x depth)",
+            ["ts", "depth_multiplier", "size", "out_amount", "execution_price", "slippage_bps"],
+        )
+        for chunk in _grid_rows(args, ts):
+            writer.rows(chunk)
+
+    anchors = fetched.get("anchors")
+    if anchors is not None and (isinstance(anchors, BaseException) or not anchors):
+        ok = False
+        writer.unavailable("Yields", "Yield Curve (USDC, live)")
+    elif anchors is not None:
+        if "yield" in sections:
+            writer.begin("yield", "Yield Curve (USDC, live)", ["ts", "platform", "tenor_days", "apy"])
+            writer.rows(
+                [ts, platform, day, rate]
+                for platform, data in anchors.items()
+                for day, rate in zip(data["days"], data["rates"])
+            )
+        if "curve" in sections:
+            title = f"Fitted USDC curve ({args.curve_method})"
+            try:
+                curve = fit_curve(anchors, args.curve_method)
+            except ValueError as exc:  # e.g. too few tenors for nelson_siegel; keep watching
+                ok = False
+                writer.unavailable("Curve", title, str(exc))
+            else:
+                writer.begin("curve", title, ["ts", "tenor_days", "apy"])
+                for chunk in _curve_rows(curve, args, ts):
+                    writer.rows(chunk)
+    writer.flush()
+    return ok
+
+
+async def _run_cli(args: argparse.Namespace) -> int:
+    from lib.defillama import aclose_clients
+
+    writer = RowWriter(args.format, sys.stdout)
+    ok = True
+    try:
+        n = 0
+        while True:
+            started = time.monotonic()
+            ok = await _cli_snapshot(args, writer)
+            n += 1
+            if not args.watch or (args.count and n >= args.count):
+                break
+            # fixed cadence; the shared connection pool stays open between rounds
+            await asyncio.sleep(max(0.0, args.watch - (time.monotonic() - started)))
+    finally:
+        await aclose_clients()
+    return 0 if ok else 1
+
+
+def run_cli(args: argparse.Namespace) -> int:
+    try:
+        return asyncio.run(_run_cli(args))
+    except KeyboardInterrupt:
+        return 0
+    except BrokenPipeError:  # e.g. piped into head
+        sys.stderr.close()
+        return 0
+
+
+def run_workers(host: str, port: int, workers: int, history_capacity: int):
+    import uvicorn
+
+    from lib.shm import SharedMarket, default_path
+
+    # One shared market state for all workers; the first to take the lease ingests.
+    path = default_path(str(port))
+    SharedMarket.create(path, history_capacity=history_capacity)
+    os.environ["WEAL_SHARED_STATE"] = str(path)
+    try:
+        uvicorn.run("backend.api:app", host=host, port=port, workers=workers, reload=False)
+    finally:
+        for p in (path, Path(f"{path}.lock")):
+            p.unlink(missing_ok=True)
+
+
+def _sections(value: str) -> List[str]:
+    names = [v.strip().lower() for v in value.split(",") if v.strip()]
+    unknown = [n for n in names if n not in CLI_SECTIONS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"sections must be from {', '.join(CLI_SECTIONS)}")
+    return names
 
 
 def main():
@@ -89,15 +254,38 @@ def main():
     parser.add_argument("mode", choices=["web", "cli"], nargs="?", default="web")
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="web: worker processes sharing one market state")
+    parser.add_argument(
+        "--shared-history", type=int, default=4800, help="web, --workers > 1: ticks kept per series in shared memory"
+    )
+    cli = parser.add_argument_group("cli")
+    cli.add_argument(
+        "--what", type=_sections, default=CLI_DEFAULT_SECTIONS,
+        help=f"comma-separated sections from {', '.join(CLI_SECTIONS)} (default: {CLI_DEFAULT_SECTIONS})",
+    )
+    cli.add_argument("--format", choices=CLI_FORMATS, default="table", help="table for people, csv/jsonl to pipe")
+    cli.add_argument("--watch", type=float, default=0.0, metavar="SECONDS", help="refresh every SECONDS until stopped")
+    cli.add_argument("--count", type=int, default=0, help="with --watch: stop after this many refreshes")
+    cli.add_argument("--symbols", type=lambda v: [s.strip().upper() for s in v.split(",") if s.strip()], default="USDC,USDT,DAI")
+    cli.add_argument("--reserve", type=float, default=50_000_000.0, help="pool reserves per side for slippage/grid")
+    cli.add_argument("--fee-bps", type=float, default=0.0)
+    cli.add_argument("--depths", type=lambda v: [float(x) for x in v.split(",") if x.strip()], default="0.5,1,1.5,2")
+    cli.add_argument("--max-size-millions", type=float, default=20.0)
+    cli.add_argument("--grid-points", type=int, default=20, help="trade sizes per depth in the grid section")
+    cli.add_argument("--curve-days", type=float, default=30.0)
+    cli.add_argument("--curve-points", type=int, default=30, help="tenors in the curve section, 1..--curve-days")
+    cli.add_argument("--curve-method", choices=("monotone_cubic", "nelson_siegel"), default="monotone_cubic")
     args = parser.parse_args()
 
     if args.mode == "cli":
-        run_cli()
-    else:
+        sys.exit(run_cli(args))
+    elif args.workers <= 1:
+        import uvicorn
+
         uvicorn.run("backend.api:app", host=args.host, port=args.port, reload=False)
+    else:
+        run_workers(args.host, args.port, args.workers, args.shared_history)
 
 
 if __name__ == "__main__":
     main()
-
-
@@ -0,0 +1,39 @@
+import threading
+import time
+
+from lib.profiler import OTHER_STACK, SamplingProfiler
+
+
+def _park(depth: int, ready: threading.Event, release: threading.Event) -> None:
+    if depth:
+        _park(depth - 1, ready, release)
+        return
+    ready.set()
+    release.wait()
+
+
+def test_distinct_stacks_stay_within_max_stacks():
+    release = threading.Event()
+    threads = []
+    for depth in range(6):  # each thread parks at a different depth: distinct stacks
+        ready = threading.Event()
+        t = threading.Thread(target=_park, args=(depth, ready, release), daemon=True)
+        t.start()
+        ready.wait()
+        threads.append(t)
+
+    profiler = SamplingProfiler(max_stacks=3)
+    try:
+        profiler.start(interval=0.001)
+        time.sleep(0.1)
+    finally:
+        profiler.stop()
+        release.set()
+        for t in threads:
+            t.join()
+
+    status = profiler.status()
+    assert status["samples"] > 0
+    assert len(profiler._stacks) <= profiler.max_stacks
+    assert status["distinct_stacks"] <= 3
+    assert OTHER_STACK in profiler._stacks
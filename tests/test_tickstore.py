@@ -0,0 +1,30 @@
+import numpy as np
+
+from lib.tickstore import TICK_DTYPE, TickStore
+
+KEY = ("Curve", "USDC")
+
+
+def test_flush_after_torn_tail_keeps_records_aligned(tmp_path):
+    store = TickStore(tmp_path, segment_seconds=3600)
+    store.append_many(7200.0, [(KEY, 1.0)])
+    store.append_many(7201.0, [(KEY, 0.999)])
+    store.flush()
+
+    # a crash mid-write leaves part of a record at the end of the segment
+    segment = next(tmp_path.rglob("*.ticks"))
+    with open(segment, "ab") as f:
+        f.write(b"\x01\x02\x03\x04\x05")
+
+    reopened = TickStore(tmp_path, segment_seconds=3600)
+    ts, px = reopened.query(KEY)
+    assert ts.tolist() == [7200.0, 7201.0]
+
+    for i, price in enumerate((0.998, 0.997, 0.996)):
+        reopened.append_many(7202.0 + i, [(KEY, price)])
+    reopened.flush()
+
+    assert segment.stat().st_size % TICK_DTYPE.itemsize == 0
+    ts, px = TickStore(tmp_path, segment_seconds=3600).query(KEY)
+    assert ts.tolist() == [7200.0, 7201.0, 7202.0, 7203.0, 7204.0]
+    np.testing.assert_allclose(px, [1.0, 0.999, 0.998, 0.997, 0.996])